@@ -0,0 +1,78 @@
+"""Module for streaming the input table from BigQuery page by page."""
+from google.cloud import bigquery
+from source import Source
+
+
+class BigQueryReader(Source):
+  """Source reading the projected BigQuery input table one page at a time."""
+
+  def __init__(self, client, big_query_config, config):
+    """Initializes the table and the columns to read.
+
+    Args:
+      client: bigquery.Client (or a client with the same get_table and list_rows API)
+
+      big_query_config: big_query_config_pb2 proto specified by the configuration file
+
+      config: config_pb2 proto specified by the configuration file
+    """
+    super(BigQueryReader, self).__init__(config,
+                                         big_query_config.summary_column)
+    self.client = client
+    self.table_path = '{}.{}.{}'.format(big_query_config.project_id,
+                                        big_query_config.dataset_id,
+                                        big_query_config.input_table_id)
+    self.page_size = big_query_config.page_size or None
+
+  def selected_fields(self, table):
+    """Chooses the schema fields of the table to request.
+
+    Args:
+      table: bigquery.Table being read
+
+    Returns:
+      List[bigquery.SchemaField] of the requested columns in table order
+
+    Raises:
+      ValueError: if a requested column is not in the table
+    """
+    self.check_columns([field.name for field in table.schema], self.table_path)
+    return [field for field in table.schema if field.name in self.columns]
+
+  def watermark_query(self, table):
+    """Builds the query of the requested columns of the rows after the watermark.
+
+    The watermark is passed as a query parameter typed like the watermark column instead
+    of being formatted into the SQL.
+
+    Args:
+      table: bigquery.Table being read
+
+    Returns:
+      tuple of (str, bigquery.QueryJobConfig) standard SQL query and the job config
+        holding its @watermark parameter
+    """
+    field_types = {field.name: field.field_type for field in table.schema}
+    query = 'SELECT {} FROM `{}` WHERE `{}` > @watermark'.format(
+        ', '.join('`{}`'.format(column) for column in self.columns),
+        self.table_path, self.watermark_column)
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter('watermark',
+                                      field_types[self.watermark_column],
+                                      self.watermark)
+    ])
+    return query, job_config
+
+  def iterate_raw_batches(self):
+    table = self.client.get_table(self.table_path)
+    selected_fields = self.selected_fields(table)
+    if self.watermark is not None:
+      # only the new rows are scanned and downloaded
+      query, job_config = self.watermark_query(table)
+      rows = self.client.query(
+          query, job_config=job_config).result(page_size=self.page_size)
+    else:
+      rows = self.client.list_rows(table,
+                                   selected_fields=selected_fields,
+                                   page_size=self.page_size)
+    return rows.to_dataframe_iterable()
@@ -0,0 +1,80 @@
+"""Unittest module for the BigQueryReader."""
+import unittest
+
+from big_query_reader import BigQueryReader
+from error_code_matcher import ErrorCodeMatcher
+from fake_big_query_client import FakeBigQueryClient
+import pandas as pd
+from preprocessor import Preprocessor
+import proto.big_query_config_pb2 as big_query_config_pb2
+import proto.config_pb2 as config_pb2
+
+
+class BigQueryReaderTest(unittest.TestCase):
+  """Unittest class for BigQueryReader."""
+
+  def setUp(self):
+    """Set up of a fake table holding an extra unused column."""
+    self.config = config_pb2.Config()
+    self.config.informative_column.extend(
+        ['exception', 'remoteException', 'errorMessage'])
+    self.config.error_code_matcher.output_column_name = 'ERRCODE'
+
+    self.big_query_config = big_query_config_pb2.BigQueryConfig()
+    self.big_query_config.project_id = 'project'
+    self.big_query_config.dataset_id = 'dataset'
+    self.big_query_config.input_table_id = 'input'
+    self.big_query_config.summary_column.append('name')
+
+    self.table = pd.read_json('testdata/error_code_matcher/simple_data.json',
+                              orient='columns')
+    self.table['unused'] = 'x' * 100
+    self.client = FakeBigQueryClient({'project.dataset.input': self.table})
+    super(BigQueryReaderTest, self).setUp()
+
+  def test_read(self):
+    """Tests that paged reading matches processing the whole projected table."""
+    reader = BigQueryReader(self.client, self.big_query_config, self.config)
+    pages = list(reader.iterate_batches())
+    self.assertEqual([len(page) for page in pages], [2, 1])
+    self.assertEqual(self.client.requested_fields[-1],
+                     ['name', 'exception', 'remoteException', 'errorMessage'])
+
+    df = reader.read()
+    expected_df = self.table.drop(columns=['unused'])
+    Preprocessor(expected_df, self.config, reader.INTERNAL_COLUMN_NAME,
+                 reader.INTERNAL_PARSED_COLUMN_NAME).process_dataframe()
+    ErrorCodeMatcher(expected_df, self.config).match_informative_errors()
+    self.assertNotIn('unused', df.columns)
+    self.assertEqual(list(df[reader.INTERNAL_COLUMN_NAME]),
+                     list(expected_df[reader.INTERNAL_COLUMN_NAME]))
+    self.assertEqual(list(df['ERRCODE']), list(expected_df['ERRCODE']))
+
+  def test_read_after_watermark(self):
+    """Tests that only the rows after the watermark are queried."""
+    self.table['rowKey'] = range(len(self.table))
+    self.config.clusterer.incremental.watermark_column = 'rowKey'
+    reader = BigQueryReader(self.client, self.big_query_config, self.config)
+    reader.watermark = 0
+    df = reader.read()
+    self.assertEqual(list(df['rowKey']), list(range(1, len(self.table))))
+    self.assertEqual(self.client.queries, [
+        'SELECT `exception`, `remoteException`, `errorMessage`, `name`, `rowKey` '
+        'FROM `project.dataset.input` WHERE `rowKey` > @watermark'
+    ])
+    # the watermark is a query parameter typed like its column
+    self.assertEqual(self.client.query_parameters,
+                     [{
+                         'watermark': ('INTEGER', 0)
+                     }])
+
+  def test_missing_column(self):
+    """Tests that requesting a column missing from the table fails early."""
+    self.big_query_config.summary_column.append('missing')
+    reader = BigQueryReader(self.client, self.big_query_config, self.config)
+    with self.assertRaises(ValueError):
+      reader.read()
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,45 @@
+"""Module for writing the summary to BigQuery with a Parquet load job."""
+import io
+
+from google.cloud import bigquery
+import pyarrow.parquet as pq
+from sink import Sink
+
+
+class BigQuerySink(Sink):
+  """Sink loading the summary into the BigQuery output table as a single Parquet file.
+
+  Unlike streaming the rows through pandas_gbq, the typed columns are loaded in one batch
+  load job, and list inference turns the list columns into REPEATED fields.
+  """
+
+  def __init__(self, client, big_query_config):
+    """Initializes the output table.
+
+    Args:
+      client: bigquery.Client (or a client with the same load_table_from_file API)
+
+      big_query_config: big_query_config_pb2 proto specified by the configuration file
+    """
+    self.client = client
+    self.table_path = '{}.{}.{}'.format(big_query_config.project_id,
+                                        big_query_config.dataset_id,
+                                        big_query_config.output_table_id)
+
+  def write_table(self, table):
+    parquet_buffer = io.BytesIO()
+    pq.write_table(table, parquet_buffer)
+    parquet_buffer.seek(0)
+    job_config = bigquery.LoadJobConfig.from_api_repr({
+        'load': {
+            'sourceFormat': 'PARQUET',
+            # like pandas_gbq.to_gbq, never overwrite an existing table
+            'writeDisposition': 'WRITE_EMPTY',
+            'parquetOptions': {
+                'enableListInference': True
+            },
+        }
+    })
+    self.client.load_table_from_file(parquet_buffer,
+                                     self.table_path,
+                                     job_config=job_config).result()
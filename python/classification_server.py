@@ -0,0 +1,318 @@
+"""Module for the local HTTP service classifying traces as they are logged."""
+import collections
+import concurrent.futures
+import http.server
+import json
+import queue
+import threading
+import time
+
+from cluster_assigner import ClusterAssigner
+from error_code_matcher import ErrorCodeMatcher
+import numpy as np
+import pandas as pd
+from preprocessor import Preprocessor
+
+
+class LatencyStats:
+  """Thread safe latency and throughput statistics of the served requests.
+
+  Percentiles are computed over the latencies of the last window_size requests, the
+  throughput over the whole lifetime of the server.
+  """
+
+  def __init__(self, window_size=10000):
+    """Starts the clock of the statistics.
+
+    Args:
+      window_size: int number of most recent request latencies kept for the percentiles
+    """
+    self.lock = threading.Lock()
+    self.latencies = collections.deque(maxlen=window_size)
+    self.start = time.perf_counter()
+    self.requests = 0
+    self.batches = 0
+
+  def record_batch(self, latencies):
+    """Records one served micro-batch.
+
+    Args:
+      latencies: List[float] seconds every request of the batch waited for its result
+    """
+    with self.lock:
+      self.latencies.extend(latencies)
+      self.requests += len(latencies)
+      self.batches += 1
+
+  def stats(self):
+    """Returns the statistics.
+
+    Returns:
+      Dict[str, float] of the number of requests and batches, the mean batch size, the
+        p50 and p99 latencies in milliseconds and the throughput in requests per second
+    """
+    with self.lock:
+      latencies = np.array(self.latencies)
+      requests, batches = self.requests, self.batches
+    elapsed = time.perf_counter() - self.start
+    p50, p99 = (np.percentile(latencies, [50, 99]) * 1000 if len(latencies) else
+                (0.0, 0.0))
+    return {
+        'requests': requests,
+        'batches': batches,
+        'mean_batch_size': requests / batches if batches else 0.0,
+        'p50_ms': float(p50),
+        'p99_ms': float(p99),
+        'throughput_per_second': requests / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+class MicroBatcher:
+  """Groups concurrently submitted items into batches processed by one worker thread.
+
+  The worker waits for a first item, then gathers the items arriving within
+  max_wait_seconds up to max_batch_size items, and processes them in a single call. If
+  that call raises, the items are processed one by one so only the failing items fail.
+  """
+
+  def __init__(self, process_batch, max_batch_size, max_wait_seconds,
+               latency_stats):
+    """Starts the worker thread.
+
+    Args:
+      process_batch: function mapping a List of items to the List of their results
+
+      max_batch_size: int maximum number of items per batch
+
+      max_wait_seconds: float maximum time the first item of a batch waits for others
+
+      latency_stats: LatencyStats recording every processed batch
+    """
+    self.process_batch = process_batch
+    self.max_batch_size = max(1, max_batch_size)
+    self.max_wait_seconds = max_wait_seconds
+    self.latency_stats = latency_stats
+    self.pending = queue.Queue()
+    self.worker = threading.Thread(target=self.run, daemon=True)
+    self.worker.start()
+
+  def submit(self, item):
+    """Queues an item for the next batch.
+
+    Args:
+      item: item passed to process_batch
+
+    Returns:
+      concurrent.futures.Future of the result of the item
+    """
+    future = concurrent.futures.Future()
+    self.pending.put((item, future, time.perf_counter()))
+    return future
+
+  def close(self):
+    """Stops the worker once the queued items are processed."""
+    self.pending.put(None)
+    self.worker.join()
+
+  def next_batch(self):
+    """Blocks for the next batch of queued entries, None once closed."""
+    entry = self.pending.get()
+    if entry is None:
+      return None
+    batch = [entry]
+    deadline = time.perf_counter() + self.max_wait_seconds
+    while len(batch) < self.max_batch_size:
+      remaining = deadline - time.perf_counter()
+      try:
+        entry = (self.pending.get(timeout=remaining)
+                 if remaining > 0 else self.pending.get_nowait())
+      except queue.Empty:
+        break
+      if entry is None:
+        # process what was gathered, then stop
+        self.pending.put(None)
+        break
+      batch.append(entry)
+    return batch
+
+  def run(self):
+    """Processes batches until closed."""
+    while True:
+      batch = self.next_batch()
+      if batch is None:
+        return
+      outcomes = self.process([item for item, _, _ in batch])
+      end = time.perf_counter()
+      for (_, future, _), (result, error) in zip(batch, outcomes):
+        if error is None:
+          future.set_result(result)
+        else:
+          future.set_exception(error)
+      self.latency_stats.record_batch([end - start for _, _, start in batch])
+
+  def process(self, items):
+    """Processes a batch of items, isolating the items that fail.
+
+    Args:
+      items: List of items passed to process_batch
+
+    Returns:
+      List of (result, error) tuples of every item, error being the exception raised by
+        processing the item on its own or None
+    """
+    try:
+      return [(result, None) for result in self.process_batch(items)]
+    except Exception as error:  # pylint: disable=broad-except
+      if len(items) == 1:
+        return [(None, error)]
+    # one bad item must not fail the others of its batch
+    return [outcome for item in items for outcome in self.process([item])]
+
+
+class TraceClassifier:
+  """Classifies batches of traces with a model artifact and the ErrorCodeMatcher.
+
+  The informative errors regex and the vocabulary are compiled once, every batch is then
+  preprocessed, matched and assigned to its nearest centroids in vectorized passes.
+  """
+
+  def __init__(self, artifact):
+    """Loads the model.
+
+    Args:
+      artifact: ModelArtifact labelling the traces, its config is used throughout
+    """
+    self.config = artifact.config
+    self.informative_columns = list(self.config.informative_column)
+    empty_df = pd.DataFrame(columns=self.informative_columns)
+    self.assigner = ClusterAssigner(empty_df, artifact)
+    self.error_code_matcher = None
+    if self.config.HasField('error_code_matcher'):
+      self.error_code_matcher = ErrorCodeMatcher(empty_df, self.config)
+
+  def validate(self, trace):
+    """Checks that a trace can be classified.
+
+    Args:
+      trace: decoded JSON body of a request
+
+    Raises:
+      ValueError: if trace is not a JSON object of informative columns holding strings,
+        lists of strings or null
+    """
+    if not isinstance(trace, dict):
+      raise ValueError('Body is not a JSON object')
+    for column in self.informative_columns:
+      value = trace.get(column)
+      if value is None or isinstance(value, str):
+        continue
+      if not (isinstance(value, list) and
+              all(isinstance(message, str) for message in value)):
+        raise ValueError(
+            'Column {} is not a string or a list of strings'.format(column))
+
+  def classify(self, traces):
+    """Classifies a batch of traces.
+
+    Args:
+      traces: List[Dict[str, object]] informative column values of every trace, missing
+        columns are empty
+
+    Returns:
+      List[Dict[str, str]] holding the 'cluster' and, if the ErrorCodeMatcher is
+        configured, the 'error_code' of every trace
+    """
+    df = pd.DataFrame(traces).reindex(columns=self.informative_columns)
+    Preprocessor(df, self.config, self.assigner.internal_column_name,
+                 self.assigner.internal_parsed_column_name).process_dataframe()
+    self.assigner.df = df
+    self.assigner.assign_clusters()
+    results = [{
+        'cluster': cluster
+    } for cluster in df[self.assigner.output_column_name]]
+    if self.error_code_matcher is not None:
+      self.error_code_matcher.df = df
+      self.error_code_matcher.match_informative_errors()
+      for result, error_code in zip(
+          results, df[self.error_code_matcher.output_column_name]):
+        result['error_code'] = error_code
+    return results
+
+
+class ClassificationRequestHandler(http.server.BaseHTTPRequestHandler):
+  """Handles POST /classify with a JSON trace and GET /stats."""
+
+  def do_POST(self):  # pylint: disable=invalid-name
+    if self.path != '/classify':
+      self.send_error(404)
+      return
+    content_length = self.headers.get('Content-Length')
+    if content_length is None:
+      self.send_json({'error': 'Content-Length header is required'}, 411)
+      return
+    try:
+      content_length = int(content_length)
+      if content_length < 0:
+        raise ValueError('Content-Length is negative')
+      trace = json.loads(self.rfile.read(content_length))
+      self.server.classifier.validate(trace)
+    except ValueError as error:
+      self.send_json({'error': str(error)}, 400)
+      return
+    try:
+      result = self.server.batcher.submit(trace).result()
+    except Exception as error:  # pylint: disable=broad-except
+      self.send_json({'error': 'Classification failed: {}'.format(error)}, 500)
+      return
+    self.send_json(result)
+
+  def do_GET(self):  # pylint: disable=invalid-name
+    if self.path != '/stats':
+      self.send_error(404)
+      return
+    self.send_json(self.server.latency_stats.stats())
+
+  def send_json(self, content, status=200):
+    """Responds with content encoded as JSON."""
+    body = json.dumps(content).encode()
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+    # one line per request would dominate the cost of serving
+    pass
+
+
+class ClassificationServer(http.server.ThreadingHTTPServer):
+  """HTTP server grouping the concurrent classification requests into micro-batches.
+
+  Every connection is handled in its own thread that waits for the result of its trace,
+  while a single MicroBatcher worker classifies the traces in batches.
+  """
+  daemon_threads = True
+
+  def __init__(self, address, artifact, max_batch_size, max_wait_seconds):
+    """Loads the model and binds the server.
+
+    Args:
+      address: (str, int) host and port to bind, port 0 picks a free port
+
+      artifact: ModelArtifact labelling the traces
+
+      max_batch_size: int maximum number of traces classified together
+
+      max_wait_seconds: float maximum time a trace waits for others to batch with
+    """
+    self.latency_stats = LatencyStats()
+    self.classifier = TraceClassifier(artifact)
+    self.batcher = MicroBatcher(self.classifier.classify, max_batch_size,
+                                max_wait_seconds, self.latency_stats)
+    super(ClassificationServer, self).__init__(address,
+                                               ClassificationRequestHandler)
+
+  def server_close(self):
+    super(ClassificationServer, self).server_close()
+    self.batcher.close()
@@ -0,0 +1,165 @@
+"""Unittest module for the classification server."""
+import concurrent.futures
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+
+from classification_server import ClassificationServer
+from classification_server import LatencyStats
+from classification_server import MicroBatcher
+from cluster_assigner import ClusterAssigner
+from k_means_clusterer import KMeansClusterer
+from model_artifact import ModelArtifact
+import pandas as pd
+import proto.config_pb2 as config_pb2
+
+
+class MicroBatcherTest(unittest.TestCase):
+  """Unittest class for MicroBatcher."""
+
+  def test_batches(self):
+    """Tests that concurrent items are processed together and in order."""
+    batch_sizes = []
+
+    def process_batch(items):
+      batch_sizes.append(len(items))
+      return [item * 2 for item in items]
+
+    latency_stats = LatencyStats()
+    batcher = MicroBatcher(process_batch, 4, 0.2, latency_stats)
+    futures = [batcher.submit(item) for item in range(6)]
+    self.assertEqual([future.result() for future in futures],
+                     [0, 2, 4, 6, 8, 10])
+    batcher.close()
+    self.assertEqual(batch_sizes, [4, 2])
+    stats = latency_stats.stats()
+    self.assertEqual(stats['requests'], 6)
+    self.assertEqual(stats['batches'], 2)
+    self.assertGreater(stats['throughput_per_second'], 0)
+    self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+
+  def test_errors(self):
+    """Tests that a failing batch fails the futures of its items."""
+
+    def process_batch(items):
+      raise ValueError('bad batch')
+
+    batcher = MicroBatcher(process_batch, 4, 0, LatencyStats())
+    with self.assertRaises(ValueError):
+      batcher.submit(1).result()
+    batcher.close()
+
+  def test_isolated_errors(self):
+    """Tests that a failing item only fails its own future, not its whole batch."""
+
+    def process_batch(items):
+      if 'bad' in items:
+        raise ValueError('bad item')
+      return [item.upper() for item in items]
+
+    batcher = MicroBatcher(process_batch, 4, 0.2, LatencyStats())
+    futures = [batcher.submit(item) for item in ['a', 'bad', 'c']]
+    self.assertEqual(futures[0].result(), 'A')
+    with self.assertRaises(ValueError):
+      futures[1].result()
+    self.assertEqual(futures[2].result(), 'C')
+    batcher.close()
+
+
+class ClassificationServerTest(unittest.TestCase):
+  """Unittest class for ClassificationServer."""
+
+  def setUp(self):
+    """Set up of a model artifact served on a free localhost port."""
+    self.directory = tempfile.TemporaryDirectory()
+    config = config_pb2.Config()
+    config.informative_column.extend(
+        ["exception", "remoteException", "errorMessage"])
+    config.error_code_matcher.output_column_name = 'error_code'
+    config.clusterer.tokenizer.token_min_length = 2
+    config.clusterer.tokenizer.mode = config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE
+    config.clusterer.min_cluster = 2
+    config.clusterer.max_cluster = 5
+    config.clusterer.output_column_name = 'clusterer_output'
+    config.clusterer.artifact_path = os.path.join(self.directory.name,
+                                                  'artifact')
+    self.dataframe = pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                                  orient='columns')
+    KMeansClusterer(self.dataframe.copy(),
+                    config).cluster_errors().save(config.clusterer.artifact_path)
+    self.artifact = ModelArtifact.load(config.clusterer.artifact_path)
+
+    self.server = ClassificationServer(('localhost', 0), self.artifact, 8, 0.05)
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.start()
+    self.url = 'http://localhost:{}'.format(self.server.server_address[1])
+    super(ClassificationServerTest, self).setUp()
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    self.thread.join()
+    self.directory.cleanup()
+    super(ClassificationServerTest, self).tearDown()
+
+  def classify(self, trace):
+    """Posts a trace to the server and returns its decoded classification."""
+    request = urllib.request.Request(self.url + '/classify',
+                                     data=json.dumps(trace).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+      return json.loads(response.read())
+
+  def test_classify(self):
+    """Tests that concurrent requests get the clusters of a batch assignment."""
+    expected_dataframe = self.dataframe.copy()
+    ClusterAssigner(expected_dataframe, self.artifact).assign_clusters()
+    traces = json.loads(self.dataframe.to_json(orient='records'))
+    with concurrent.futures.ThreadPoolExecutor(len(traces)) as executor:
+      results = list(executor.map(self.classify, traces))
+    self.assertEqual([result['cluster'] for result in results],
+                     list(expected_dataframe['clusterer_output']))
+    self.assertTrue(all('error_code' in result for result in results))
+
+    with urllib.request.urlopen(self.url + '/stats') as response:
+      stats = json.loads(response.read())
+    self.assertEqual(stats['requests'], len(traces))
+    self.assertLessEqual(stats['batches'], len(traces))
+
+  def test_bad_request(self):
+    """Tests that bodies that are not JSON objects are refused."""
+    request = urllib.request.Request(self.url + '/classify', data=b'[1, 2]')
+    with self.assertRaises(urllib.error.HTTPError) as context:
+      urllib.request.urlopen(request)
+    self.assertEqual(context.exception.code, 400)
+    self.assertIn('error', json.loads(context.exception.read()))
+    context.exception.close()
+
+    # informative columns must hold strings or lists of strings
+    request = urllib.request.Request(self.url + '/classify',
+                                     data=json.dumps({
+                                         'exception': {'nested': 1}
+                                     }).encode())
+    with self.assertRaises(urllib.error.HTTPError) as context:
+      urllib.request.urlopen(request)
+    self.assertEqual(context.exception.code, 400)
+    context.exception.close()
+
+  def test_missing_content_length(self):
+    """Tests that requests without a Content-Length are refused."""
+    connection = http.client.HTTPConnection('localhost',
+                                            self.server.server_address[1])
+    connection.putrequest('POST', '/classify')
+    connection.endheaders()
+    response = connection.getresponse()
+    self.assertEqual(response.status, 411)
+    self.assertIn('error', json.loads(response.read()))
+    connection.close()
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,124 @@
+"""Module for labelling errors with the clusters of a persisted model."""
+import collections
+import math
+
+import numpy as np
+from preprocessor import Preprocessor
+import scipy.sparse
+from sklearn import preprocessing
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.metrics import pairwise_distances_argmin
+from token_hasher import token_hasher_of
+from tokenizer import Tokenizer
+
+
+class ArtifactVectorizer:
+  """Class vectorizing errors over the features of a ModelArtifact.
+
+  Serving and incremental runs share it, so an error always gets the same nearest
+  centroid. Errors are counted over the vocabulary of the artifact, or hashed like the
+  clustered errors if the artifact config uses the HASHING vectorizer, then divided by the
+  l2 norm of all their tokens, known or not. Errors made of the clustered tokens are thus
+  normalized exactly like the clustered errors, while unknown tokens pull an error away
+  from every centroid.
+  """
+
+  def __init__(self, artifact, tokenization_method):
+    """Initializes the vectorizer of an artifact.
+
+    Args:
+      artifact: ModelArtifact saved by a KMeansClusterer
+
+      tokenization_method: function mapping a document to its List[str] tokens
+    """
+    self.artifact = artifact
+    self.tokenization_method = tokenization_method
+    self.token_hasher = token_hasher_of(artifact.config)
+
+  def transform(self, documents):
+    """Vectorizes documents over the features of the artifact.
+
+    Args:
+      documents: pandas series of the ParsedTrace of every error
+
+    Returns:
+      sparse matrix of shape (n_documents, n_features) of the term frequencies divided by
+        the l2 norm of all the tokens of the document
+    """
+    if not len(documents):
+      return scipy.sparse.csr_matrix((0, len(self.artifact.vocabulary)))
+    if self.token_hasher is not None:
+      # colliding tokens share their feature, normalized like the clustered errors
+      return self.artifact.select_hashed_features(
+          preprocessing.normalize(
+              self.token_hasher.transform(documents,
+                                          self.tokenization_method))).tocsr()
+    norms = []
+
+    def analyze(document):
+      tokens = self.tokenization_method(document)
+      norms.append(
+          math.sqrt(
+              sum(count * count
+                  for count in collections.Counter(tokens).values())) or 1.0)
+      return tokens
+
+    term_freq_matrix = CountVectorizer(
+        analyzer=analyze,
+        vocabulary=self.artifact.vocabulary).transform(documents)
+    return term_freq_matrix.multiply(1 / np.array(norms)[:, np.newaxis]).tocsr()
+
+
+class ClusterAssigner:
+  """Class labelling errors with the nearest centroid of a ModelArtifact.
+
+  The errors are preprocessed and tokenized with the config stored in the artifact and
+  vectorized by the ArtifactVectorizer of the artifact, then every error gets the cluster
+  code of its nearest centroid in O(n_rows * n_clusters). Nothing is fitted, so there is no
+  sweep over k.
+  """
+
+  def __init__(self, df, artifact):
+    """Initializes the information needed to assign clusters.
+
+    Args:
+      df: pandas dataframe consisting of the informative columns of the artifact config
+
+      artifact: ModelArtifact saved by a KMeansClusterer
+    """
+    self.df = df
+    self.artifact = artifact
+    config = artifact.config
+
+    # internal column names for our Preprocessor
+    self.internal_column_name = '_internal_preprocessor_output_col_'
+    self.internal_parsed_column_name = '_internal_parsed_trace_col_'
+
+    # run the preprocessor unless the rows were already preprocessed while read
+    if self.internal_parsed_column_name not in df.columns:
+      preprocessor = Preprocessor(df, config, self.internal_column_name,
+                                  self.internal_parsed_column_name)
+      preprocessor.process_dataframe()
+
+    self.tokenizer = Tokenizer(config)
+    self.tokenization_method = self.tokenizer.tokenization_method(
+        config.clusterer.tokenizer.mode)
+    self.vectorizer = ArtifactVectorizer(artifact, self.tokenization_method)
+    self.output_column_name = config.clusterer.output_column_name
+
+  def assign_clusters(self):
+    """Labels every error with the cluster of its nearest centroid.
+
+    On Return:
+      Adds the clusterer output column holding the cluster code of every error.
+    """
+    documents = self.df[self.internal_parsed_column_name]
+    if not len(documents):
+      self.df[self.output_column_name] = []
+      return
+    normalized_matrix = self.vectorizer.transform(documents)
+    nearest_centroids = pairwise_distances_argmin(normalized_matrix,
+                                                  self.artifact.centroids)
+    self.df[self.output_column_name] = [
+        self.artifact.cluster_ids[centroid] for centroid in nearest_centroids
+    ]
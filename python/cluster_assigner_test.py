@@ -0,0 +1,99 @@
+"""Unittest module for the ClusterAssigner."""
+import os
+import tempfile
+import unittest
+
+from cluster_assigner import ArtifactVectorizer
+from cluster_assigner import ClusterAssigner
+from k_means_clusterer import KMeansClusterer
+from model_artifact import ModelArtifact
+import numpy as np
+import pandas as pd
+import proto.config_pb2 as config_pb2
+from tokenizer import Tokenizer
+
+
+class ClusterAssignerTest(unittest.TestCase):
+  """Unittest class for ClusterAssigner."""
+
+  def setUp(self):
+    """Set up of a clustering saved as an artifact."""
+    self.directory = tempfile.TemporaryDirectory()
+    self.config = config_pb2.Config()
+    self.config.informative_column.extend(
+        ["exception", "remoteException", "errorMessage"])
+    self.config.clusterer.tokenizer.token_min_length = 2
+    self.config.clusterer.tokenizer.mode = config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE
+    self.config.clusterer.mini_batch = False
+    self.config.clusterer.min_cluster = 2
+    self.config.clusterer.max_cluster = 5
+    self.config.clusterer.output_column_name = 'clusterer_output'
+    self.config.clusterer.artifact_path = os.path.join(self.directory.name,
+                                                       'artifact')
+    self.clusterer = KMeansClusterer(
+        pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                     orient='columns'), self.config)
+    self.clusterer.cluster_errors().save(self.config.clusterer.artifact_path)
+    super(ClusterAssignerTest, self).setUp()
+
+  def tearDown(self):
+    self.directory.cleanup()
+    super(ClusterAssignerTest, self).tearDown()
+
+  def test_assign_clusters(self):
+    """Tests that new copies of the clustered errors get their original clusters."""
+    artifact = ModelArtifact.load(self.config.clusterer.artifact_path)
+    self.assertEqual(artifact.cluster_ids, ['0', '1'])
+    new_dataframe = pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                                 orient='columns')
+    ClusterAssigner(new_dataframe, artifact).assign_clusters()
+    self.assertEqual(list(new_dataframe['clusterer_output']),
+                     list(self.clusterer.df['clusterer_output']))
+
+  def test_artifact_vectorizer(self):
+    """Tests that errors are normalized by the norm of all their tokens, known or not."""
+    artifact = ModelArtifact.load(self.config.clusterer.artifact_path)
+    vectorizer = ArtifactVectorizer(
+        artifact,
+        Tokenizer(artifact.config).tokenization_method(
+            artifact.config.clusterer.tokenizer.mode))
+    known_token = artifact.vocabulary[0]
+    matrix = vectorizer.transform(
+        pd.Series(['{0} {0} zzunknown'.format(known_token), '']))
+    self.assertEqual(matrix.shape, (2, len(artifact.vocabulary)))
+    self.assertAlmostEqual(matrix[0, 0], 2 / np.sqrt(5))
+    self.assertEqual(matrix[0].nnz, 1)
+    self.assertEqual(matrix[1].nnz, 0)
+    self.assertEqual(vectorizer.transform(pd.Series([], dtype=object)).shape,
+                     (0, len(artifact.vocabulary)))
+
+  def test_assign_clusters_empty(self):
+    """Tests that an empty dataframe gets an empty output column."""
+    artifact = ModelArtifact.load(self.config.clusterer.artifact_path)
+    empty_dataframe = pd.DataFrame(
+        columns=["exception", "remoteException", "errorMessage"])
+    ClusterAssigner(empty_dataframe, artifact).assign_clusters()
+    self.assertEqual(len(empty_dataframe['clusterer_output']), 0)
+
+  def test_assign_clusters_hashing(self):
+    """Tests that errors are hashed like the clustered errors of a hashing artifact."""
+    self.config.clusterer.vectorizer = config_pb2.Clusterer.VectorizerMode.HASHING
+    self.config.clusterer.n_hashed_features = 256
+    clusterer = KMeansClusterer(
+        pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                     orient='columns'), self.config)
+    clusterer.cluster_errors().save(self.config.clusterer.artifact_path)
+    artifact = ModelArtifact.load(self.config.clusterer.artifact_path)
+    self.assertEqual(len(artifact.vocabulary),
+                     clusterer.vectorizer_stats['used_features'])
+    self.assertEqual(artifact.hashed_features,
+                     list(clusterer.hashed_features))
+    new_dataframe = pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                                 orient='columns')
+    ClusterAssigner(new_dataframe, artifact).assign_clusters()
+    self.assertEqual(list(new_dataframe['clusterer_output']),
+                     list(clusterer.df['clusterer_output']))
+
+
+if __name__ == "__main__":
+  unittest.main()
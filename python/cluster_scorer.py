@@ -0,0 +1,211 @@
+"""Module for scoring the quality of a clustering of the vectorized errors."""
+import numpy as np
+import proto.config_pb2 as config_pb2
+from sklearn.metrics import pairwise_distances_chunked
+from sklearn.metrics import silhouette_score
+from sklearn.metrics.pairwise import euclidean_distances
+
+
+class ClusterScorer:
+  """Class scoring a clustering with the cluster quality score chosen in the config.
+
+  The score is used by the Clusterer to choose the best number of clusters k, the higher
+  the better. Available scores are:
+    SILHOUETTE: the exact silhouette over all samples, O(n^2)
+    SAMPLED_SILHOUETTE: the exact silhouette of a fixed-size reproducible sample
+    SIMPLIFIED_SILHOUETTE: silhouette using distances to the centroids, O(n k)
+  """
+
+  def __init__(self, config):
+    """Initializes the scorer.
+
+    Args:
+      config: config_pb2 proto specified by the configuration file
+    """
+    self.method = config.clusterer.scorer.method
+    self.sample_size = config.clusterer.scorer.sample_size
+    self.seed = config.clusterer.scorer.seed
+    if self.method not in config_pb2.ClusterScorer.Method.values():
+      raise NotImplementedError('No valid scorer method in configuration file')
+
+  def score(self, matrix, labels, centroids, sample_weight=None):
+    """Scores a clustering of the rows of matrix.
+
+    Args:
+      matrix: (sparse) matrix of shape (n_rows, n_features) that was clustered
+
+      labels: array of shape (n_rows,) holding the cluster index of each row
+
+      centroids: array of shape (n_clusters, n_features) of the cluster centers
+
+      sample_weight: optional array of shape (n_rows,) of duplicate counts of each row
+
+    Returns:
+      float score of the clustering
+
+    Raises:
+      ValueError: if the number of labels is not between 2 and the number of samples - 1
+    """
+    if self.method == config_pb2.ClusterScorer.Method.SAMPLED_SILHOUETTE:
+      return sampled_silhouette_score(matrix, labels, self.sample_size,
+                                      self.seed, sample_weight)
+    if self.method == config_pb2.ClusterScorer.Method.SIMPLIFIED_SILHOUETTE:
+      return simplified_silhouette_score(matrix, labels, centroids,
+                                         sample_weight)
+    if sample_weight is None:
+      return silhouette_score(matrix, labels, metric='euclidean')
+    return weighted_silhouette_score(matrix, labels, sample_weight)
+
+
+def _check_number_of_labels(n_labels, n_samples):
+  """Raises a ValueError like sklearn.metrics.silhouette_score on invalid label counts.
+
+  Args:
+    n_labels: int number of distinct labels
+
+    n_samples: number of (weighted) samples
+  """
+  if not 1 < n_labels < n_samples:
+    raise ValueError(
+        'Number of labels is {}. Valid values are 2 to n_samples - 1 (inclusive)'
+        .format(n_labels))
+
+
+def weighted_silhouette_score(matrix, labels, sample_weight=None):
+  """Computes the mean silhouette coefficient of rows standing for weighted duplicates.
+
+  Row i of matrix stands for sample_weight[i] identical samples, and the score equals the
+  euclidean silhouette_score of the dataset in which every row is repeated that many times,
+  without ever materializing the repeated rows.
+
+  Args:
+    matrix: (sparse) matrix of shape (n_rows, n_features) of the unique samples
+
+    labels: array of shape (n_rows,) holding the cluster label of each row
+
+    sample_weight: optional array of shape (n_rows,) of positive integer duplicate counts,
+      every row counts once if None
+
+  Returns:
+    float mean silhouette coefficient over all (repeated) samples
+
+  Raises:
+    ValueError: if the number of labels is not between 2 and the number of samples - 1,
+      mirroring sklearn.metrics.silhouette_score
+  """
+  labels = np.unique(labels, return_inverse=True)[1]
+  if sample_weight is None:
+    sample_weight = np.ones(len(labels))
+  sample_weight = np.asarray(sample_weight, dtype=np.float64)
+  n_labels = labels.max() + 1 if len(labels) else 0
+  n_samples = sample_weight.sum()
+  _check_number_of_labels(n_labels, n_samples)
+
+  cluster_weights = np.bincount(labels, weights=sample_weight)
+  # weighted membership of every row, so distances @ membership sums distances per cluster
+  membership = np.zeros((len(labels), n_labels))
+  membership[np.arange(len(labels)), labels] = sample_weight
+  cluster_distances = np.vstack([
+      distances @ membership
+      for distances in pairwise_distances_chunked(matrix, metric='euclidean')
+  ])
+
+  own_weights = cluster_weights[labels]
+  rows = np.arange(len(labels))
+  # identical copies of a row are at distance 0, so they only count in the denominator
+  with np.errstate(divide='ignore', invalid='ignore'):
+    intra = cluster_distances[rows, labels] / (own_weights - 1)
+    mean_distances = cluster_distances / cluster_weights
+  mean_distances[rows, labels] = np.inf
+  inter = mean_distances.min(axis=1)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    scores = (inter - intra) / np.maximum(intra, inter)
+  # samples alone in their cluster have a silhouette of 0
+  scores[own_weights == 1] = 0
+  scores = np.nan_to_num(scores)
+  return float(np.sum(scores * sample_weight) / n_samples)
+
+
+def sampled_silhouette_score(matrix, labels, sample_size, seed,
+                             sample_weight=None):
+  """Computes the silhouette coefficient of a reproducible sample of the samples.
+
+  sample_size samples are drawn without replacement from the dataset in which every row is
+  repeated sample_weight times, so the sample is the same as when sampling the repeated
+  dataset, then scored with weighted_silhouette_score.
+
+  Args:
+    matrix: (sparse) matrix of shape (n_rows, n_features) of the unique samples
+
+    labels: array of shape (n_rows,) holding the cluster label of each row
+
+    sample_size: int number of samples to draw, all samples are scored if not positive
+      or not smaller than the number of samples
+
+    seed: int seed of the sample
+
+    sample_weight: optional array of shape (n_rows,) of positive integer duplicate counts
+
+  Returns:
+    float mean silhouette coefficient over the sampled samples
+  """
+  labels = np.asarray(labels)
+  if sample_weight is None:
+    sample_weight = np.ones(len(labels), dtype=np.int64)
+  sample_weight = np.asarray(sample_weight, dtype=np.int64)
+  n_samples = int(sample_weight.sum())
+  if sample_size <= 0 or sample_size >= n_samples:
+    return weighted_silhouette_score(matrix, labels, sample_weight)
+  picks = np.random.default_rng(seed).choice(n_samples,
+                                             size=sample_size,
+                                             replace=False)
+  # map every picked (repeated) sample back to its row
+  rows = np.searchsorted(np.cumsum(sample_weight), picks, side='right')
+  counts = np.bincount(rows, minlength=len(labels))
+  picked_rows = counts.nonzero()[0]
+  return weighted_silhouette_score(matrix[picked_rows], labels[picked_rows],
+                                   counts[picked_rows])
+
+
+def simplified_silhouette_score(matrix, labels, centroids, sample_weight=None):
+  """Computes the simplified silhouette coefficient in O(n_rows * n_clusters).
+
+  The mean distances to the points of a cluster are replaced by the distance to the
+  cluster centroid: a sample scores (b - a) / max(a, b) where a is the distance to its own
+  centroid and b the distance to the nearest other centroid.
+
+  Args:
+    matrix: (sparse) matrix of shape (n_rows, n_features) of the unique samples
+
+    labels: array of shape (n_rows,) holding the index of the centroid of each row
+
+    centroids: array of shape (n_clusters, n_features) of the cluster centers
+
+    sample_weight: optional array of shape (n_rows,) of duplicate counts of each row
+
+  Returns:
+    float mean simplified silhouette coefficient over all (repeated) samples
+  """
+  labels = np.asarray(labels)
+  if sample_weight is None:
+    sample_weight = np.ones(len(labels))
+  sample_weight = np.asarray(sample_weight, dtype=np.float64)
+  n_samples = sample_weight.sum()
+  _check_number_of_labels(len(np.unique(labels)), n_samples)
+
+  cluster_weights = np.bincount(labels,
+                                weights=sample_weight,
+                                minlength=len(centroids))
+  distances = euclidean_distances(matrix, centroids)
+  rows = np.arange(len(labels))
+  intra = distances[rows, labels].copy()
+  # empty clusters have no meaningful centroid
+  distances[:, cluster_weights == 0] = np.inf
+  distances[rows, labels] = np.inf
+  inter = distances.min(axis=1)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    scores = (inter - intra) / np.maximum(intra, inter)
+  # samples alone in their cluster have a silhouette of 0
+  scores[cluster_weights[labels] == 1] = 0
+  scores = np.nan_to_num(scores)
+  return float(np.sum(scores * sample_weight) / n_samples)
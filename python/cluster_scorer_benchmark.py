@@ -0,0 +1,98 @@
+"""Benchmark comparing the cluster quality scores available to the k sweep.
+
+For every k of the sweep K-Means is fitted once, then every score is timed on the same
+clustering. The report shows the time spent scoring, the speed gain over the exact
+silhouette and how far the k chosen by each score is from the k chosen by the exact
+silhouette.
+"""
+import time
+
+from cluster_scorer import sampled_silhouette_score
+from cluster_scorer import simplified_silhouette_score
+from cluster_scorer import weighted_silhouette_score
+import numpy as np
+from sklearn import preprocessing
+from sklearn.cluster import KMeans
+from sklearn.feature_extraction.text import CountVectorizer
+
+from absl import app
+from absl import flags
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer('num_rows', 10000, 'number of synthetic documents')
+flags.DEFINE_integer('true_clusters', 8,
+                     'number of groups the documents are generated from')
+flags.DEFINE_integer('min_cluster', 2, 'minimum number of clusters to test')
+flags.DEFINE_integer('max_cluster', 12, 'maximum number of clusters to test')
+flags.DEFINE_integer('sample_size', 2000,
+                     'number of samples scored by the sampled silhouette')
+flags.DEFINE_integer('seed', 0, 'seed of the data generator, fits and sample')
+
+
+def generate_matrix(num_rows, true_clusters, seed):
+  """Generates normalized term frequency vectors of documents from known groups.
+
+  Every group has its own characteristic tokens, and every document mixes tokens of its
+  group with tokens shared by all groups.
+
+  Args:
+    num_rows: int number of documents
+
+    true_clusters: int number of groups
+
+    seed: int seed of the random generator
+
+  Returns:
+    sparse matrix of shape (num_rows, n_tokens) of l2 normalized term frequencies
+  """
+  rng = np.random.RandomState(seed)
+  shared_tokens = ['shared{}'.format(i) for i in range(50)]
+  documents = []
+  for group in rng.randint(true_clusters, size=num_rows):
+    group_tokens = ['group{}_token{}'.format(group, i) for i in range(30)]
+    documents.append(
+        list(rng.choice(group_tokens, 15)) + list(rng.choice(shared_tokens, 5)))
+  term_freq_matrix = CountVectorizer(
+      analyzer=lambda document: document).fit_transform(documents)
+  return preprocessing.normalize(term_freq_matrix)
+
+
+def main(argv):
+  del argv  # Unused.
+  matrix = generate_matrix(FLAGS.num_rows, FLAGS.true_clusters, FLAGS.seed)
+  scorers = {
+      'silhouette':
+          lambda labels, centroids: weighted_silhouette_score(matrix, labels),
+      'sampled_silhouette':
+          lambda labels, centroids: sampled_silhouette_score(
+              matrix, labels, FLAGS.sample_size, FLAGS.seed),
+      'simplified_silhouette':
+          lambda labels, centroids: simplified_silhouette_score(
+              matrix, labels, centroids),
+  }
+  scores = {name: [] for name in scorers}
+  seconds = {name: 0.0 for name in scorers}
+  ks = list(range(FLAGS.min_cluster, FLAGS.max_cluster))
+  for k in ks:
+    k_cluster = KMeans(n_clusters=k, n_init=10,
+                       random_state=FLAGS.seed).fit(matrix)
+    for name, scorer in scorers.items():
+      start = time.perf_counter()
+      scores[name].append(scorer(k_cluster.labels_, k_cluster.cluster_centers_))
+      seconds[name] += time.perf_counter() - start
+
+  exact_k = ks[int(np.argmax(scores['silhouette']))]
+  print('rows: {}, true clusters: {}, k tested: {}-{}'.format(
+      FLAGS.num_rows, FLAGS.true_clusters, ks[0], ks[-1]))
+  print('{:<22} {:>10} {:>9} {:>9} {:>9}'.format('scorer', 'seconds',
+                                                  'speedup', 'chosen k',
+                                                  'k diff'))
+  for name in scorers:
+    chosen_k = ks[int(np.argmax(scores[name]))]
+    print('{:<22} {:>10.3f} {:>8.1f}x {:>9} {:>9}'.format(
+        name, seconds[name], seconds['silhouette'] / seconds[name], chosen_k,
+        abs(chosen_k - exact_k)))
+
+
+if __name__ == '__main__':
+  app.run(main)
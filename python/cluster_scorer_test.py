@@ -0,0 +1,72 @@
+"""Unittest module for the cluster scorers."""
+import unittest
+
+from cluster_scorer import ClusterScorer
+from cluster_scorer import sampled_silhouette_score
+from cluster_scorer import simplified_silhouette_score
+from cluster_scorer import weighted_silhouette_score
+import numpy as np
+import proto.config_pb2 as config_pb2
+import scipy.sparse
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+
+class ClusterScorerTest(unittest.TestCase):
+  """Unittest class for the cluster scorers."""
+
+  def setUp(self):
+    """Set up of a small random sparse matrix with labels and duplicate counts."""
+    random_state = np.random.RandomState(0)
+    self.matrix = scipy.sparse.csr_matrix(
+        random_state.rand(30, 8) * (random_state.rand(30, 8) > 0.5))
+    self.labels = random_state.randint(0, 4, 30)
+    self.sample_weight = random_state.randint(1, 5, 30)
+    super(ClusterScorerTest, self).setUp()
+
+  def test_weighted_silhouette_score(self):
+    """Tests that weighted rows score like the dataset with repeated rows."""
+    repeats = np.repeat(np.arange(30), self.sample_weight)
+    self.assertAlmostEqual(
+        weighted_silhouette_score(self.matrix, self.labels,
+                                  self.sample_weight),
+        silhouette_score(self.matrix[repeats], self.labels[repeats]))
+    self.assertAlmostEqual(
+        weighted_silhouette_score(self.matrix, self.labels),
+        silhouette_score(self.matrix, self.labels))
+
+  def test_weighted_silhouette_score_invalid_labels(self):
+    """Tests that a single label raises like silhouette_score."""
+    with self.assertRaises(ValueError):
+      weighted_silhouette_score(self.matrix, np.zeros(30), self.sample_weight)
+
+  def test_sampled_silhouette_score(self):
+    """Tests that the sample is reproducible and degrades to the exact score."""
+    first_score = sampled_silhouette_score(self.matrix, self.labels, 40, 7,
+                                           self.sample_weight)
+    second_score = sampled_silhouette_score(self.matrix, self.labels, 40, 7,
+                                            self.sample_weight)
+    self.assertEqual(first_score, second_score)
+    self.assertAlmostEqual(
+        sampled_silhouette_score(self.matrix, self.labels, 0, 7,
+                                 self.sample_weight),
+        weighted_silhouette_score(self.matrix, self.labels, self.sample_weight))
+
+  def test_simplified_silhouette_score(self):
+    """Tests that well separated clusters score close to 1 and match the config dispatch."""
+    blobs = np.vstack([np.zeros((10, 2)), np.full((10, 2), 10.0)])
+    blobs += np.random.RandomState(0).rand(20, 2) * 0.1
+    k_cluster = KMeans(n_clusters=2, n_init=10, random_state=0).fit(blobs)
+    score = simplified_silhouette_score(blobs, k_cluster.labels_,
+                                        k_cluster.cluster_centers_)
+    self.assertGreater(score, 0.95)
+
+    config = config_pb2.Config()
+    config.clusterer.scorer.method = config_pb2.ClusterScorer.Method.SIMPLIFIED_SILHOUETTE
+    self.assertEqual(
+        ClusterScorer(config).score(blobs, k_cluster.labels_,
+                                    k_cluster.cluster_centers_), score)
+
+
+if __name__ == "__main__":
+  unittest.main()
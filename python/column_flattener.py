@@ -0,0 +1,33 @@
+"""Module for flattening the informative columns of a dataframe column at a time."""
+
+
+def flatten_informative_columns(df, informative_columns, sequence_type=list):
+  """Gathers the string messages of every row from the informative columns.
+
+  Unlike walking the dataframe with iterrows, every informative column is read once as a
+  plain list, so no pandas Series is built per row.
+
+  Args:
+    df: pandas dataframe holding the informative columns
+
+    informative_columns: List[str] of columns holding information, i.e. "exception"
+
+    sequence_type: type (or tuple of types) of list-valued cells whose string elements
+      are gathered, i.e. list for columns like "remoteException"
+
+  Returns:
+    List[List[str]] holding for every row, in order, the string messages found in the
+      informative columns
+  """
+  messages = [[] for _ in range(len(df))]
+  for column in informative_columns:
+    for row_messages, value in zip(messages, df[column].tolist()):
+      # columns like "exception" are strings
+      if isinstance(value, str):
+        row_messages.append(value)
+      # columns like "remoteException" are lists of strings
+      elif isinstance(value, sequence_type):
+        for sub_message in value:
+          if isinstance(sub_message, str):
+            row_messages.append(sub_message)
+  return messages
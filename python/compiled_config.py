@@ -0,0 +1,157 @@
+"""Module for the configuration compiled once and shared by every stage of the classifier."""
+import hashlib
+import re
+import string
+
+import proto.config_pb2 as config_pb2
+from google.protobuf import text_format
+
+# name of the Tokenizer method of every tokenization mode
+TOKENIZATION_METHOD_NAMES = {
+    config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE: 'human_readable_tokenizer',
+    config_pb2.Tokenizer.TokenizerMode.STACK_TRACE_LINES: 'stack_trace_line_tokenizer',
+    config_pb2.Tokenizer.TokenizerMode.COMBINED: 'combined_tokenizer',
+}
+
+# compiled configs of this process by config fingerprint
+_COMPILED_CONFIGS = {}
+
+
+def informative_error_names(config):
+  """Lists the informative errors using the informative_errors protobuf.
+
+  Args:
+    config: config_pb2 proto specified by the configuration file
+
+  Returns:
+    List[str] names of every error code enum value not ignored by the config, in priority
+      order
+  """
+  errors = []
+  # find all enum descriptors in error_code_matcher protobuf
+  for field in config.error_code_matcher.DESCRIPTOR.fields:
+    if field.enum_type:
+      # minor gymnastics to find value of attribute without name
+      ignore_errs_attr = getattr(config.error_code_matcher, field.name)
+      ignore_errs = [
+          field.enum_type.values[enum].name for enum in ignore_errs_attr
+      ]
+
+      for err_name in field.enum_type.values_by_name:
+        if err_name not in ignore_errs:
+          errors.append(err_name)
+  return errors
+
+
+def compile_informative_errors(informative_errors):
+  """Compiles the informative errors into a single multi-pattern regular expression.
+
+  The errors are literal names joined into one alternation ordered like
+  informative_errors, so at any position the regex reports the first error (in
+  informative_errors order) that starts there. The alternation is deliberately kept free of
+  capturing groups so the regex engine can still skip ahead using the possible first
+  characters of the errors; the matched text identifies the error instead.
+
+  Args:
+    informative_errors: List[str] error names in priority order
+
+  Returns:
+    compiled regular expression matching any of the errors, None if there is no error
+  """
+  if not informative_errors:
+    return None
+  return re.compile('|'.join(re.escape(err) for err in informative_errors))
+
+
+class CompiledConfig:
+  """Class holding everything the stages derive from a config, built once per config.
+
+  The preprocessor line and word regexes, the tokenizer split regexes, strip characters
+  and ignored tokens and the informative errors automaton are compiled here instead of by
+  every stage, so stages built from the same config share them. CompiledConfig.of returns
+  the one compiled config of this process for a config.
+  """
+
+  def __init__(self, config):
+    """Compiles a config.
+
+    Args:
+      config: config_pb2 proto specified by the configuration file
+    """
+    # a copy, so later changes to the caller's proto never desynchronize the compilation
+    self.config = config_pb2.Config()
+    self.config.CopyFrom(config)
+    self.fingerprint = self.fingerprint_of(self.config)
+
+    preprocessor = self.config.clusterer.tokenizer.preprocessor
+    self.ignore_line_regexes = [
+        re.compile(regex) for regex in preprocessor.ignore_line_regex_matcher
+    ]
+    self.search_line_regexes = [
+        re.compile(regex) for regex in preprocessor.search_line_regex_matcher
+    ]
+    self.ignore_word_regexes = [
+        re.compile(regex) for regex in preprocessor.ignore_word_regex_matcher
+    ]
+
+    tokenizer = self.config.clusterer.tokenizer
+    self.split_regexes = [re.compile(split_on) for split_on in tokenizer.split_on]
+    self.strip_characters = string.punctuation + ''.join(tokenizer.punctuation)
+    self.ignore_tokens = [
+        token.lower() for token in tokenizer.ignore_token_matcher
+    ]
+    self.ignore_token_set = frozenset(self.ignore_tokens)
+
+    self.informative_errors = informative_error_names(self.config)
+    # position of every error in the priority order
+    self.informative_error_priority = {
+        err: index for index, err in enumerate(self.informative_errors)
+    }
+    self.informative_errors_regex = compile_informative_errors(
+        self.informative_errors)
+
+  @staticmethod
+  def fingerprint_of(config):
+    """Computes the fingerprint identifying the contents of a config.
+
+    Args:
+      config: config_pb2 proto
+
+    Returns:
+      str hex digest of the deterministic serialization of config
+    """
+    return hashlib.sha256(
+        config.SerializeToString(deterministic=True)).hexdigest()
+
+  @classmethod
+  def of(cls, config):
+    """Returns the compiled config of a config, compiling it on its first use.
+
+    Args:
+      config: config_pb2 proto or CompiledConfig, which is returned as is
+
+    Returns:
+      CompiledConfig shared by every call with an equal config in this process
+    """
+    if isinstance(config, CompiledConfig):
+      return config
+    fingerprint = cls.fingerprint_of(config)
+    compiled_config = _COMPILED_CONFIGS.get(fingerprint)
+    if compiled_config is None:
+      compiled_config = cls(config)
+      _COMPILED_CONFIGS[fingerprint] = compiled_config
+    return compiled_config
+
+  @classmethod
+  def load(cls, path):
+    """Reads and compiles a text format config.
+
+    Args:
+      path: str file path of the text format config_pb2 proto
+
+    Returns:
+      CompiledConfig of the config, also returned by later CompiledConfig.of calls
+    """
+    with open(path) as config_file:
+      config = text_format.Parse(config_file.read(), config_pb2.Config())
+    return cls.of(config)
@@ -0,0 +1,93 @@
+"""Unittest module for the CompiledConfig."""
+import os
+import tempfile
+import unittest
+
+from compiled_config import CompiledConfig
+from error_code_matcher import ErrorCodeMatcher
+import pandas as pd
+import proto.config_pb2 as config_pb2
+import proto.server_error_reason_pb2 as server_error_reason_pb2
+from google.protobuf import text_format
+
+
+class CompiledConfigTest(unittest.TestCase):
+  """Unittest class for CompiledConfig."""
+
+  def setUp(self):
+    """Setup a config using every compiled field."""
+    self.config = config_pb2.Config()
+    self.config.informative_column.extend(['exception'])
+    self.config.error_code_matcher.ignore_server_error_reason.append(
+        server_error_reason_pb2.SERVER_ERROR_REASON_UNKNOWN)
+    tokenizer = self.config.clusterer.tokenizer
+    tokenizer.mode = config_pb2.Tokenizer.TokenizerMode.COMBINED
+    tokenizer.split_on.extend(['=', r'\['])
+    tokenizer.punctuation.extend([':'])
+    tokenizer.ignore_token_matcher.extend(['UselessInfo'])
+    tokenizer.preprocessor.ignore_line_regex_matcher.append('Suppressed')
+    tokenizer.preprocessor.search_line_regex_matcher.append('at')
+    tokenizer.preprocessor.ignore_word_regex_matcher.append('eye3')
+    super(CompiledConfigTest, self).setUp()
+
+  def test_compiled_fields(self):
+    """Tests the patterns, tokens, errors and tokenization method of the config."""
+    compiled_config = CompiledConfig(self.config)
+    self.assertEqual(
+        [regex.pattern for regex in compiled_config.ignore_line_regexes],
+        ['Suppressed'])
+    self.assertEqual(
+        [regex.pattern for regex in compiled_config.search_line_regexes],
+        ['at'])
+    self.assertEqual(
+        [regex.pattern for regex in compiled_config.ignore_word_regexes],
+        ['eye3'])
+    self.assertEqual(
+        [regex.pattern for regex in compiled_config.split_regexes],
+        ['=', r'\['])
+    self.assertTrue(compiled_config.strip_characters.endswith(':'))
+    self.assertEqual(compiled_config.ignore_token_set,
+                     frozenset(['uselessinfo']))
+    self.assertNotIn('SERVER_ERROR_REASON_UNKNOWN',
+                     compiled_config.informative_errors)
+    self.assertIn('SERVER_UNEXPECTED_EXCEPTION',
+                  compiled_config.informative_errors)
+    self.assertEqual(
+        compiled_config.informative_errors_regex.search(
+            'failed with SERVER_UNEXPECTED_EXCEPTION').group(),
+        'SERVER_UNEXPECTED_EXCEPTION')
+    self.assertEqual(
+        ErrorCodeMatcher(pd.DataFrame(), self.config).informative_errors,
+        compiled_config.informative_errors)
+
+  def test_of_shares_compilation(self):
+    """Tests that equal configs share one compilation and changed ones do not."""
+    compiled_config = CompiledConfig.of(self.config)
+    equal_config = config_pb2.Config()
+    equal_config.CopyFrom(self.config)
+    self.assertIs(CompiledConfig.of(equal_config), compiled_config)
+    self.assertIs(CompiledConfig.of(compiled_config), compiled_config)
+
+    self.config.clusterer.tokenizer.split_on.append(r'\]')
+    changed_config = CompiledConfig.of(self.config)
+    self.assertIsNot(changed_config, compiled_config)
+    # the earlier compilation keeps the config it was compiled from
+    self.assertEqual(len(compiled_config.config.clusterer.tokenizer.split_on),
+                     2)
+    self.assertEqual(len(changed_config.split_regexes), 3)
+
+  def test_load(self):
+    """Tests that a loaded config is shared with the stages built from an equal config."""
+    with tempfile.TemporaryDirectory() as directory:
+      config_path = os.path.join(directory, 'config.textproto')
+      with open(config_path, 'w') as config_file:
+        config_file.write(text_format.MessageToString(self.config))
+
+      compiled_config = CompiledConfig.load(config_path)
+      self.assertEqual(compiled_config.config, self.config)
+      self.assertIs(CompiledConfig.load(config_path), compiled_config)
+      self.assertIs(CompiledConfig.of(self.config), compiled_config)
+
+
+if __name__ == "__main__":
+  unittest.main()
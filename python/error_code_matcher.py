@@ -1,5 +1,7 @@
 """Module for Pattern Matching To Error Codes phase of the Stack Trace Classifier."""
-import re
+from column_flattener import flatten_informative_columns
+from compiled_config import CompiledConfig
+import pandas as pd
 
 
 class ErrorCodeMatcher:
@@ -15,33 +17,48 @@ class ErrorCodeMatcher:
         column, an errorMessage column and optionally a remoteException
         column
 
-      config: config_pb2 proto specified by the configuration file
+      config: config_pb2 proto specified by the configuration file or its CompiledConfig
     """
+    compiled_config = CompiledConfig.of(config)
+    config = compiled_config.config
     self.df = df
     self.informative_columns = config.informative_column
-    self.initialize_informative_errors(config)
+    # the informative errors and their automaton are shared by every matcher of the config
+    self.informative_errors = compiled_config.informative_errors
+    self.informative_error_priority = compiled_config.informative_error_priority
+    self.informative_errors_regex = compiled_config.informative_errors_regex
     self.output_column_name = config.error_code_matcher.output_column_name
+    self.columnar = config.execution.columnar
 
-  def initialize_informative_errors(self, config):
-    """Populates the default informative errors using the informative_errors protobuf.
+  def match_messages(self, messages):
+    """Finds the informative error that best matches a list of messages.
+
+    Each message is scanned exactly once by the compiled informative errors regex.
 
     Args:
-      config: config_pb2 proto specified by the configuration file
+      messages: List[str] of messages belonging to a single error
+
+    Returns:
+      str of the first error in self.informative_errors found in any of the messages,
+        None if no error matches
     """
-    errors = []
-    # find all enum descriptors in error_code_matcher protobuf
-    for field in config.error_code_matcher.DESCRIPTOR.fields:
-      if field.enum_type:
-        # minor gymnastics to find value of attribute without name
-        ignore_errs_attr = getattr(config.error_code_matcher, field.name)
-        ignore_errs = [
-            field.enum_type.values[enum].name for enum in ignore_errs_attr
-        ]
-
-        for err_name in field.enum_type.values_by_name:
-          if err_name not in ignore_errs:
-            errors.append(err_name)
-    self.informative_errors = errors
+    if self.informative_errors_regex is None:
+      return None
+    # anything past the last error is no match
+    best_index = len(self.informative_errors)
+    for message in messages:
+      match = self.informative_errors_regex.search(message)
+      while match:
+        best_index = min(best_index,
+                         self.informative_error_priority[match.group()])
+        # the first error in order can not be beaten
+        if best_index == 0:
+          return self.informative_errors[0]
+        # resume right after the match start so overlapping errors are still found
+        match = self.informative_errors_regex.search(message, match.start() + 1)
+    if best_index == len(self.informative_errors):
+      return None
+    return self.informative_errors[best_index]
 
   def match_informative_errors(self):
     """Main heavy lifting to find specific ERRORs to match to.
@@ -54,6 +71,10 @@ class ErrorCodeMatcher:
       Updates the dataframe such that a new column, 'ERRCODE' denotes
         the error code of the exception, if one such exists.
     """
+    if self.columnar:
+      self.match_informative_errors_columnar()
+      return
+
     col = []
 
     for _, row in self.df.iterrows():
@@ -69,16 +90,30 @@ class ErrorCodeMatcher:
             if isinstance(sub_message, str):
               messages.append(sub_message)
 
-      no_error_matched = True
-      # Check if any of the columns have a match for any of the errors
-      for err in self.informative_errors:
-        if any([re.search(err, message) for message in messages]):
-          col.append(err)
-          no_error_matched = False
-          break
+      # None is appended in the case no match has been made
+      col.append(self.match_messages(messages))
+
+    self.df[self.output_column_name] = col
+
+  def match_informative_errors_columnar(self):
+    """Columnar variant of match_informative_errors producing an identical output column.
 
-      # In the case no match has been made, append a None
-      if no_error_matched:
-        col.append(None)
+    The informative columns are flattened once into one string per row, and a single
+    vectorized pass of the compiled informative errors regex over that column finds the
+    rows containing any informative error. Only those rows are then resolved to their
+    highest priority error, which is usually a small fraction of the table.
 
+    On Return:
+      Updates the dataframe such that a new column, 'ERRCODE' denotes
+        the error code of the exception, if one such exists.
+    """
+    messages = flatten_informative_columns(self.df, self.informative_columns)
+    col = [None] * len(messages)
+    if self.informative_errors_regex is not None and messages:
+      # error names never contain new lines, so joining keeps matches intact
+      texts = pd.Series(['\n'.join(row_messages) for row_messages in messages],
+                        dtype=object)
+      has_error = texts.str.contains(self.informative_errors_regex)
+      for position in has_error.to_numpy().nonzero()[0]:
+        col[position] = self.match_messages([texts.iat[position]])
     self.df[self.output_column_name] = col
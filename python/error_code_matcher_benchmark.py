@@ -0,0 +1,145 @@
+"""Benchmark comparing the compiled ErrorCodeMatcher against the original per-error loop."""
+import random
+import re
+import timeit
+
+from error_code_matcher import ErrorCodeMatcher
+import pandas as pd
+import proto.config_pb2 as config_pb2
+import proto.server_error_reason_pb2 as server_error_reason_pb2
+import proto.storage_error_reason_pb2 as storage_error_reason_pb2
+
+from absl import app
+from absl import flags
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer('num_rows', 20000, 'number of synthetic rows to match')
+flags.DEFINE_integer('repeats', 3, 'number of timed repetitions, the best is reported')
+flags.DEFINE_float('match_ratio', 0.3,
+                   'fraction of rows that embed an informative error code')
+flags.DEFINE_integer('seed', 0, 'seed of the synthetic data generator')
+
+
+def legacy_match_informative_errors(df, informative_columns, informative_errors):
+  """Reference implementation of the original per-error, per-message search loop.
+
+  Args:
+    df: pandas dataframe holding the informative columns
+
+    informative_columns: List[str] columns to gather messages from
+
+    informative_errors: List[str] error names in priority order
+
+  Returns:
+    List[str] of matched error codes (None where no error code matched)
+  """
+  col = []
+  for _, row in df.iterrows():
+    messages = []
+    for column in informative_columns:
+      if isinstance(row[column], str):
+        messages.append(row[column])
+      elif isinstance(row[column], list):
+        for sub_message in row[column]:
+          if isinstance(sub_message, str):
+            messages.append(sub_message)
+    matched = None
+    for err in informative_errors:
+      if any([re.search(err, message) for message in messages]):
+        matched = err
+        break
+    col.append(matched)
+  return col
+
+
+def generate_dataframe(num_rows, match_ratio, error_names, seed):
+  """Generates a dataframe of stack-trace like messages.
+
+  Args:
+    num_rows: int number of rows to generate
+
+    match_ratio: float fraction of rows that embed an error name
+
+    error_names: List[str] error names to embed
+
+    seed: int seed for the random generator
+
+  Returns:
+    pandas dataframe with exception, remoteException and errorMessage columns
+  """
+  rng = random.Random(seed)
+  frame = '\tat com.google.payments.service.Handler{0}.handle(Handler{0}.java:{1})'
+  exceptions, remote_exceptions, error_messages = [], [], []
+  for _ in range(num_rows):
+    lines = ['com.google.net.rpc3.RpcException: request failed id={}'.format(
+        rng.randrange(10**9))]
+    lines.extend(
+        frame.format(rng.randrange(50), rng.randrange(1000)) for _ in range(20))
+    remote = []
+    if rng.random() < match_ratio:
+      remote.append('remote failure code {}'.format(rng.choice(error_names)))
+    exceptions.append('\n'.join(lines))
+    remote_exceptions.append(remote)
+    error_messages.append(None)
+  return pd.DataFrame({
+      'exception': exceptions,
+      'remoteException': remote_exceptions,
+      'errorMessage': error_messages,
+  })
+
+
+def main(argv):
+  del argv  # Unused.
+  config = config_pb2.Config()
+  config.informative_column.extend(
+      ['exception', 'remoteException', 'errorMessage'])
+  config.error_code_matcher.ignore_server_error_reason.extend([
+      server_error_reason_pb2.SERVER_ERROR_REASON_UNKNOWN,
+      server_error_reason_pb2.SERVER_UNEXPECTED_EXCEPTION
+  ])
+  config.error_code_matcher.ignore_storage_error_reason.append(
+      storage_error_reason_pb2.STORAGE_ERROR_REASON_UNKNOWN)
+  config.error_code_matcher.output_column_name = 'ErrorCode'
+
+  matcher = ErrorCodeMatcher(pd.DataFrame(), config)
+  df = generate_dataframe(FLAGS.num_rows, FLAGS.match_ratio,
+                          matcher.informative_errors, FLAGS.seed)
+  matcher.df = df
+
+  legacy_output = legacy_match_informative_errors(df,
+                                                  matcher.informative_columns,
+                                                  matcher.informative_errors)
+  matcher.match_informative_errors()
+  if legacy_output != list(df['ErrorCode']):
+    raise AssertionError('compiled matcher output differs from the legacy loop')
+  matcher.match_informative_errors_columnar()
+  if legacy_output != list(df['ErrorCode']):
+    raise AssertionError('columnar matcher output differs from the legacy loop')
+
+  legacy_time = min(
+      timeit.repeat(lambda: legacy_match_informative_errors(
+          df, matcher.informative_columns, matcher.informative_errors),
+                    number=1,
+                    repeat=FLAGS.repeats))
+  compiled_time = min(
+      timeit.repeat(matcher.match_informative_errors,
+                    number=1,
+                    repeat=FLAGS.repeats))
+  columnar_time = min(
+      timeit.repeat(matcher.match_informative_errors_columnar,
+                    number=1,
+                    repeat=FLAGS.repeats))
+  print('rows: {}, informative errors: {}'.format(
+      FLAGS.num_rows, len(matcher.informative_errors)))
+  print('legacy loop:      {:.3f}s ({:.0f} rows/s)'.format(
+      legacy_time, FLAGS.num_rows / legacy_time))
+  print('compiled matcher: {:.3f}s ({:.0f} rows/s)'.format(
+      compiled_time, FLAGS.num_rows / compiled_time))
+  print('columnar matcher: {:.3f}s ({:.0f} rows/s)'.format(
+      columnar_time, FLAGS.num_rows / columnar_time))
+  print('speedup: {:.1f}x compiled, {:.1f}x columnar'.format(
+      legacy_time / compiled_time, legacy_time / columnar_time))
+
+
+if __name__ == '__main__':
+  app.run(main)
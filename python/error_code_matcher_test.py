@@ -82,6 +82,36 @@ class ErrorCodeMatcherTest(unittest.TestCase):
     self.assertIsNone(error_code_matcher_default.df['ERRCODE'][1])
     self.assertIsNone(error_code_matcher_default.df['ERRCODE'][2])
 
+  def test_columnar(self):
+    """Tests that the columnar mode produces the same column as the row-wise mode."""
+    self.config_default.execution.columnar = True
+    for dataframe in [
+        self.simple_dataframe, self.empty_dataframe,
+        self.uninformative_dataframe
+    ]:
+      error_code_matcher_rows = ErrorCodeMatcher(dataframe.copy(),
+                                                 self.config_default)
+      error_code_matcher_rows.columnar = False
+      error_code_matcher_rows.match_informative_errors()
+      error_code_matcher_columnar = ErrorCodeMatcher(dataframe.copy(),
+                                                     self.config_default)
+      error_code_matcher_columnar.match_informative_errors()
+      self.assertEqual(list(error_code_matcher_columnar.df['ERRCODE']),
+                       list(error_code_matcher_rows.df['ERRCODE']))
+
+  def test_match_priority(self):
+    """Tests that the first error in enum order wins regardless of message position."""
+    error_code_matcher_default = ErrorCodeMatcher(self.empty_dataframe,
+                                                  self.config_default)
+    messages = [
+        'STORAGE_STALE_LOCK_TIMESTAMP then SERVER_TIMEOUT_ERROR',
+        'later SERVER_NOT_IMPLEMENTED_EXCEPTION'
+    ]
+    self.assertEqual(error_code_matcher_default.match_messages(messages),
+                     'SERVER_NOT_IMPLEMENTED_EXCEPTION')
+    self.assertIsNone(error_code_matcher_default.match_messages(['no code']))
+    self.assertIsNone(error_code_matcher_default.match_messages([]))
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,162 @@
+"""Module for an in memory stand-in of the BigQuery client used in offline tests."""
+import collections
+import re
+
+import pandas as pd
+
+# Name and type of a column of a fake table, like bigquery.SchemaField
+FakeSchemaField = collections.namedtuple('FakeSchemaField',
+                                         ['name', 'field_type'])
+
+# The only query understood by the fake client, the one of BigQueryReader.watermark_query
+_WATERMARK_QUERY = re.compile(
+    r'SELECT (.+) FROM `(.+)` WHERE `(.+)` > @watermark')
+
+
+def field_type_of(dtype):
+  """Returns the BigQuery type name of a column of the given pandas dtype."""
+  if pd.api.types.is_bool_dtype(dtype):
+    return 'BOOLEAN'
+  if pd.api.types.is_integer_dtype(dtype):
+    return 'INTEGER'
+  if pd.api.types.is_float_dtype(dtype):
+    return 'FLOAT'
+  if pd.api.types.is_datetime64_any_dtype(dtype):
+    return 'TIMESTAMP'
+  return 'STRING'
+
+
+class FakeTable:
+  """Table held in a pandas dataframe, exposing its schema like bigquery.Table."""
+
+  def __init__(self, table_path, df):
+    """Initializes the table.
+
+    Args:
+      table_path: str 'project.dataset.table' path of the table
+
+      df: pandas dataframe holding the rows of the table
+    """
+    self.table_path = table_path
+    self.df = df
+    self.schema = [
+        FakeSchemaField(column, field_type_of(dtype))
+        for column, dtype in df.dtypes.items()
+    ]
+
+
+class FakeRowIterator:
+  """Pages of the requested columns of a FakeTable, like bigquery.table.RowIterator."""
+
+  def __init__(self, df, page_size):
+    """Initializes the iterator.
+
+    Args:
+      df: pandas dataframe of the requested columns
+
+      page_size: int number of rows per page
+    """
+    self.df = df
+    self.page_size = page_size
+
+  def to_dataframe_iterable(self):
+    """Yields a fresh pandas dataframe for every page of rows."""
+    for start in range(0, len(self.df), self.page_size):
+      yield self.df.iloc[start:start + self.page_size].reset_index(drop=True)
+
+
+class FakeQueryJob:
+  """Finished query job, like bigquery.QueryJob."""
+
+  def __init__(self, df):
+    """Initializes the job.
+
+    Args:
+      df: pandas dataframe of the result of the query
+    """
+    self.df = df
+
+  def result(self, page_size=None):
+    """Returns a FakeRowIterator over the pages of the result."""
+    return FakeRowIterator(self.df, page_size or 2)
+
+
+class FakeBigQueryClient:
+  """Client serving tables from memory with the get_table and list_rows API of BigQuery.
+
+  Attributes:
+    tables: Dict[str, pandas dataframe] rows of every table by 'project.dataset.table' path
+    default_page_size: int page size used when list_rows is not given one
+    requested_fields: List[List[str]] the column names requested by every list_rows call
+    queries: List[str] every query run
+    query_parameters: List[Dict[str, (str, object)]] the type and value of the
+      parameters of every query run by parameter name
+  """
+
+  def __init__(self, tables, default_page_size=2):
+    """Initializes the client.
+
+    Args:
+      tables: Dict[str, pandas dataframe] rows of every table by path
+
+      default_page_size: int page size used when list_rows is not given one
+    """
+    self.tables = tables
+    self.default_page_size = default_page_size
+    self.requested_fields = []
+    self.queries = []
+    self.query_parameters = []
+
+  def get_table(self, table_path):
+    """Returns the FakeTable at table_path, raising KeyError if it does not exist."""
+    return FakeTable(table_path, self.tables[table_path])
+
+  def list_rows(self, table, selected_fields=None, page_size=None):
+    """Lists the rows of the selected fields of table.
+
+    Args:
+      table: FakeTable to read
+
+      selected_fields: optional List[FakeSchemaField] of the columns to read, all if None
+
+      page_size: optional int number of rows per page
+
+    Returns:
+      FakeRowIterator over the pages of the selected columns
+    """
+    if selected_fields is None:
+      selected_fields = table.schema
+    columns = [field.name for field in selected_fields]
+    self.requested_fields.append(columns)
+    return FakeRowIterator(table.df[columns], page_size or
+                           self.default_page_size)
+
+  def query(self, sql, job_config=None):
+    """Runs a query selecting columns of the rows of a table after a watermark.
+
+    Args:
+      sql: str query in the form built by BigQueryReader.watermark_query
+
+      job_config: bigquery.QueryJobConfig holding the @watermark query parameter
+
+    Returns:
+      FakeQueryJob of the result
+
+    Raises:
+      ValueError: if the query is not in the supported form
+    """
+    parameters = {
+        parameter.name: (parameter.type_, parameter.value)
+        for parameter in (job_config.query_parameters if job_config else [])
+    }
+    self.queries.append(sql)
+    self.query_parameters.append(parameters)
+    query_match = _WATERMARK_QUERY.fullmatch(sql)
+    if not query_match or 'watermark' not in parameters:
+      raise ValueError('Unsupported query {}'.format(sql))
+    columns, table_path, watermark_column = query_match.groups()
+    df = self.tables[table_path]
+    rows = df[df[watermark_column] > parameters['watermark'][1]]
+    return FakeQueryJob(rows[[
+        column.strip('`') for column in columns.split(', ')
+    ]].reset_index(drop=True))
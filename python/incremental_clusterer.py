@@ -0,0 +1,177 @@
+"""Module for incremental runs folding new errors into a persisted clustering."""
+import math
+
+from cluster_assigner import ArtifactVectorizer
+import numpy as np
+import pandas as pd
+from preprocessor import Preprocessor
+import scipy.sparse
+from sklearn.metrics.pairwise import euclidean_distances
+from tokenizer import Tokenizer
+
+
+def watermark_of(values):
+  """Computes the watermark of the values of the watermark column.
+
+  Args:
+    values: pandas series of the watermark column
+
+  Returns:
+    JSON scalar maximum of the values (timestamps as ISO 8601 strings), None if there is
+      no value
+  """
+  values = values.dropna()
+  if values.empty:
+    return None
+  maximum = values.max()
+  if isinstance(maximum, pd.Timestamp):
+    return maximum.isoformat()
+  if isinstance(maximum, np.generic):
+    return maximum.item()
+  return maximum
+
+
+def after_watermark(values, watermark):
+  """Selects the values strictly after the watermark.
+
+  Args:
+    values: pandas series of the watermark column
+
+    watermark: JSON scalar returned by watermark_of, None selects every value
+
+  Returns:
+    boolean pandas series, True for the values after the watermark
+  """
+  if watermark is None:
+    return pd.Series(True, index=values.index)
+  if pd.api.types.is_datetime64_any_dtype(values):
+    watermark = pd.Timestamp(watermark)
+  return values > watermark
+
+
+class IncrementalClusterer:
+  """Class folding new errors into the clusters of a ModelArtifact.
+
+  The new errors are vectorized by the ArtifactVectorizer of the artifact, like the errors
+  labelled by a ClusterAssigner, and labelled with their nearest centroid. Every centroid
+  then moves to the mean of its previous members and its new members, the update of a
+  mini-batch K-Means step whose per-center counts are the cluster sizes, so the cost only
+  depends on the number of new errors.
+
+  Tokens missing from the vocabulary can not move the centroids, but they still count in
+  the norm of an error, so errors made of new tokens end up far from every centroid and
+  raise the drift. With the HASHING vectorizer every token has a feature, so new tokens
+  hashed to the features of the artifact raise the drift through them, and the others
+  through the norm like missing tokens.
+  """
+
+  def __init__(self, df, artifact):
+    """Initializes the information needed to update the clusters.
+
+    Args:
+      df: pandas dataframe of the new errors, consisting of the informative columns of the
+        artifact config
+
+      artifact: ModelArtifact saved by a KMeansClusterer, updated in place
+    """
+    self.df = df
+    self.artifact = artifact
+    config = artifact.config
+
+    # internal column names for our Preprocessor
+    self.internal_column_name = '_internal_preprocessor_output_col_'
+    self.internal_parsed_column_name = '_internal_parsed_trace_col_'
+
+    # run the preprocessor unless the rows were already preprocessed while read
+    if self.internal_parsed_column_name not in df.columns:
+      preprocessor = Preprocessor(df, config, self.internal_column_name,
+                                  self.internal_parsed_column_name)
+      preprocessor.process_dataframe()
+
+    self.tokenizer = Tokenizer(config)
+    self.tokenization_method = self.tokenizer.tokenization_method(
+        config.clusterer.tokenizer.mode)
+    self.output_column_name = config.clusterer.output_column_name
+    self.watermark_column = config.clusterer.incremental.watermark_column
+    self.drift_threshold = config.clusterer.incremental.drift_threshold
+
+    # normalized term frequencies and distances to the centroids of the new errors
+    # vectorized like the errors labelled by a ClusterAssigner
+    self.normalized_matrix = ArtifactVectorizer(
+        artifact, self.tokenization_method).transform(
+            self.df[self.internal_parsed_column_name])
+    self.distances = euclidean_distances(self.normalized_matrix,
+                                         artifact.centroids)
+
+  def drift(self):
+    """Measures how far the new errors are from the clusters.
+
+    Returns:
+      float relative increase of the mean distance of the new errors to their nearest
+        centroid over the mean distance at the last refit, None if there is nothing to
+        compare, infinite if the errors at the last refit were on their centroids and the
+        new errors are not
+    """
+    if not len(self.distances) or self.artifact.mean_distance is None:
+      return None
+    mean_distance = float(self.distances.min(axis=1).mean())
+    if np.isclose(mean_distance, self.artifact.mean_distance):
+      return 0.0
+    if not self.artifact.mean_distance:
+      return math.inf
+    return mean_distance / self.artifact.mean_distance - 1
+
+  def needs_refit(self):
+    """Returns whether the drift crosses the configured drift threshold."""
+    drift = self.drift()
+    return (self.drift_threshold > 0 and drift is not None and
+            drift > self.drift_threshold)
+
+  def update_clusters(self):
+    """Labels the new errors and folds them into the clusters of the artifact.
+
+    On Return:
+      Adds the clusterer output column holding the cluster code of every new error.
+      Moves the centroids, grows the cluster sizes and advances the watermark of the
+        artifact in memory. The caller saves it once the summary of the new errors is
+        written, so a failed write never skips the new errors in the next run.
+    """
+    labels = self.distances.argmin(axis=1)
+    n_clusters = len(self.artifact.cluster_ids)
+    new_sizes = np.bincount(labels, minlength=n_clusters)
+    # membership @ matrix sums the new errors of every cluster
+    membership = scipy.sparse.csr_matrix(
+        (np.ones(len(labels)), (labels, np.arange(len(labels)))),
+        shape=(n_clusters, len(labels)))
+    new_sums = np.asarray((membership @ self.normalized_matrix).todense())
+    old_sizes = np.array(self.artifact.cluster_sizes, dtype=np.float64)
+    total_sizes = old_sizes + new_sizes
+    updated = new_sizes > 0
+    self.artifact.centroids[updated] = (
+        (self.artifact.centroids[updated] * old_sizes[updated, np.newaxis] +
+         new_sums[updated]) / total_sizes[updated, np.newaxis])
+    self.artifact.cluster_sizes = [int(size) for size in total_sizes]
+
+    if self.watermark_column:
+      watermark = watermark_of(self.df[self.watermark_column])
+      if watermark is not None:
+        self.artifact.watermark = watermark
+    self.df[self.output_column_name] = [
+        self.artifact.cluster_ids[label] for label in labels
+    ]
+
+  def merge_summary_counts(self, summary):
+    """Merges the summary of the new errors with the cluster sizes of the artifact.
+
+    Args:
+      summary: pandas dataframe generated by the Summarizer over the new errors
+
+    Returns:
+      pandas dataframe of the summary whose 'Size' is the size of every cluster so far,
+        with the number of new errors of every cluster in 'NewErrors'
+    """
+    total_sizes = dict(zip(self.artifact.cluster_ids,
+                           self.artifact.cluster_sizes))
+    summary['NewErrors'] = summary['Size']
+    summary['Size'] = summary[self.output_column_name].map(total_sizes)
+    return summary
@@ -0,0 +1,113 @@
+"""Unittest module for the IncrementalClusterer."""
+import os
+import tempfile
+import unittest
+
+from incremental_clusterer import after_watermark
+from incremental_clusterer import IncrementalClusterer
+from incremental_clusterer import watermark_of
+from k_means_clusterer import KMeansClusterer
+from model_artifact import ModelArtifact
+import numpy as np
+import pandas as pd
+import proto.config_pb2 as config_pb2
+from summarizer import Summarizer
+
+
+class IncrementalClustererTest(unittest.TestCase):
+  """Unittest class for IncrementalClusterer."""
+
+  def setUp(self):
+    """Set up of a clustering of the first rows of a table saved as an artifact."""
+    self.directory = tempfile.TemporaryDirectory()
+    self.config = config_pb2.Config()
+    self.config.informative_column.extend(
+        ["exception", "remoteException", "errorMessage"])
+    self.config.clusterer.tokenizer.token_min_length = 2
+    self.config.clusterer.tokenizer.mode = config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE
+    self.config.clusterer.mini_batch = False
+    self.config.clusterer.min_cluster = 2
+    self.config.clusterer.max_cluster = 5
+    self.config.clusterer.output_column_name = 'clusterer_output'
+    self.config.clusterer.artifact_path = os.path.join(self.directory.name,
+                                                       'artifact')
+    self.config.clusterer.incremental.watermark_column = 'rowKey'
+    self.config.clusterer.incremental.drift_threshold = 0.5
+
+    self.table = pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                              orient='columns')
+    self.table['rowKey'] = np.arange(len(self.table))
+    self.clusterer = KMeansClusterer(self.table.copy(), self.config)
+    self.clusterer.cluster_errors().save(self.config.clusterer.artifact_path)
+    super(IncrementalClustererTest, self).setUp()
+
+  def tearDown(self):
+    self.directory.cleanup()
+    super(IncrementalClustererTest, self).tearDown()
+
+  def new_rows(self):
+    """Returns copies of the clustered rows appended after them."""
+    new_dataframe = self.table.copy()
+    new_dataframe['rowKey'] += len(self.table)
+    return new_dataframe
+
+  def test_watermark(self):
+    """Tests the watermark of integer and timestamp columns."""
+    self.assertEqual(watermark_of(pd.Series([3, 1, None])), 3)
+    self.assertIsNone(watermark_of(pd.Series([], dtype=float)))
+    timestamps = pd.Series(pd.to_datetime(['2020-07-01', '2020-07-03']))
+    watermark = watermark_of(timestamps)
+    self.assertEqual(watermark, '2020-07-03T00:00:00')
+    self.assertEqual(
+        list(after_watermark(timestamps, '2020-07-02T00:00:00')),
+        [False, True])
+    self.assertEqual(list(after_watermark(timestamps, None)), [True, True])
+
+  def test_update_clusters(self):
+    """Tests that new copies of the clustered errors grow their original clusters."""
+    artifact = ModelArtifact.load(self.config.clusterer.artifact_path)
+    self.assertEqual(artifact.watermark, len(self.table) - 1)
+    self.assertEqual(sum(artifact.cluster_sizes), len(self.table))
+    centroids = artifact.centroids.copy()
+
+    new_dataframe = self.new_rows()
+    incremental_clusterer = IncrementalClusterer(new_dataframe, artifact)
+    self.assertAlmostEqual(incremental_clusterer.drift(), 0)
+    self.assertFalse(incremental_clusterer.needs_refit())
+    incremental_clusterer.update_clusters()
+    self.assertEqual(list(new_dataframe['clusterer_output']),
+                     list(self.clusterer.df['clusterer_output']))
+
+    # the artifact is only saved by the caller, once the summary is written
+    self.assertEqual(
+        ModelArtifact.load(self.config.clusterer.artifact_path).watermark,
+        len(self.table) - 1)
+    artifact.save(self.config.clusterer.artifact_path)
+
+    # the centroids of copies do not move, the sizes double
+    updated_artifact = ModelArtifact.load(self.config.clusterer.artifact_path)
+    np.testing.assert_allclose(updated_artifact.centroids, centroids)
+    self.assertEqual(sum(updated_artifact.cluster_sizes), 2 * len(self.table))
+    self.assertEqual(updated_artifact.watermark, 2 * len(self.table) - 1)
+
+    summary = incremental_clusterer.merge_summary_counts(
+        Summarizer(new_dataframe, self.config).generate_summary())
+    self.assertEqual(list(summary['Size']), list(2 * summary['NewErrors']))
+
+  def test_needs_refit(self):
+    """Tests that errors made of unseen tokens drift past the threshold."""
+    artifact = ModelArtifact.load(self.config.clusterer.artifact_path)
+    new_dataframe = self.new_rows()
+    new_dataframe['exception'] = 'quota exceeded for tenant reservation pool'
+    incremental_clusterer = IncrementalClusterer(new_dataframe, artifact)
+    self.assertGreater(incremental_clusterer.drift(), 0.5)
+    self.assertTrue(incremental_clusterer.needs_refit())
+
+    # a threshold of 0 never refits
+    artifact.config.clusterer.incremental.drift_threshold = 0
+    self.assertFalse(
+        IncrementalClusterer(new_dataframe, artifact).needs_refit())
+
+
+if __name__ == "__main__":
+  unittest.main()
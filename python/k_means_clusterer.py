@@ -1,16 +1,39 @@
 """Module for K-Means Clustering of data points."""
+import collections
+
+from cluster_scorer import ClusterScorer
+from incremental_clusterer import watermark_of
+from k_sweep import KSweep
+from model_artifact import ModelArtifact
+import numpy as np
+import pandas as pd
+from partitioned_executor import PartitionedExecutor
 from preprocessor import Preprocessor
 import proto.config_pb2 as config_pb2
 from sklearn import preprocessing
-from sklearn.cluster import KMeans
-from sklearn.cluster import MiniBatchKMeans
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics import silhouette_score
+from sklearn.metrics.pairwise import euclidean_distances
+from token_hasher import token_hasher_of
+from tokenizer import is_stack_frame
 from tokenizer import Tokenizer
 
 
+# Features of the chosen clustering of a KMeansClusterer, one matrix row per (unique) document:
+# matrix: sparse normalized term frequencies, document_rows: positional dataframe row of every
+# document, document_weights: number of rows of every document, labels: cluster of every
+# document, distances: distance of every document to its centroid, vocabulary: token of every
+# feature, is_frame: boolean array, True for the features that are stack frames, centroids:
+# array of shape (n_clusters, n_features)
+ClusterFeatures = collections.namedtuple('ClusterFeatures', [
+    'matrix', 'document_rows', 'document_weights', 'labels', 'distances',
+    'vocabulary', 'is_frame', 'centroids'
+])
+
+
 class KMeansClusterer:
   """Class for K-Means Clustering of input data."""
+  # dataframe attrs key of the summary of the last sweep over k
+  SWEEP_SUMMARY_ATTR = 'k_sweep_summary'
 
   def __init__(self, df, config):
     """Initializes various data required for Clusterer.
@@ -23,35 +46,74 @@ class KMeansClusterer:
       config: config_pb2 proto specified by the configuration file
     """
     self.df = df
+    self.config = config
 
-    # internal column name for our Preprocessor
+    # internal column names for our Preprocessor
     self.internal_column_name = '_internal_preprocessor_output_col_'
+    self.internal_parsed_column_name = '_internal_parsed_trace_col_'
 
-    # run the preprocessor
+    # preprocess and vectorize chunks of rows in a process pool if configured
+    self.executor = None
+    if config.execution.processes > 1:
+      self.executor = PartitionedExecutor(config)
+
+    # run the preprocessor unless the rows were already preprocessed while read
     # (even if no config given preprocessor generates internal column)
-    preprocessor = Preprocessor(df, config, self.internal_column_name)
-    preprocessor.process_dataframe()
+    if self.internal_parsed_column_name not in df.columns:
+      preprocessor = Preprocessor(df, config, self.internal_column_name,
+                                  self.internal_parsed_column_name)
+      if self.executor is not None:
+        # only the texts come back from the workers
+        preprocessor.store_texts(self.executor.preprocess(df))
+      else:
+        preprocessor.process_dataframe()
 
     # get the appropriate tokenization method
     tokenizer = Tokenizer(config)
-    if config.clusterer.tokenizer.mode == config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE:
-      self.tokenization_method = tokenizer.human_readable_tokenizer
-    elif config.clusterer.tokenizer.mode == config_pb2.Tokenizer.TokenizerMode.STACK_TRACE_LINES:
-      self.tokenization_method = tokenizer.stack_trace_line_tokenizer
-    elif config.clusterer.tokenizer.mode == config_pb2.Tokenizer.TokenizerMode.COMBINED:
-      self.tokenization_method = tokenizer.combined_tokenizer
-    # if no valid tokenization mode is chosen, error
-    else:
-      raise NotImplementedError(
-          'No valid tokenization mode in configuration file')
+    self.tokenizer = tokenizer
+    self.tokenization_method = tokenizer.tokenization_method(
+        config.clusterer.tokenizer.mode)
+
+    # number of features of the last vectorization, and their collisions when hashed
+    self.vectorizer_stats = None
 
     # get whether or not to use minibatch
     self.mini_batch = config.clusterer.mini_batch
 
+    # get whether or not to collapse identical preprocessed texts before clustering
+    self.deduplicate = config.clusterer.deduplicate
+
     # get min and max clusters
     self.min_cluster = config.clusterer.min_cluster
     self.max_cluster = config.clusterer.max_cluster
 
+    # get the cluster quality score used to choose k
+    self.scorer = ClusterScorer(config)
+
+    # get the sweep over k, fitting ks in parallel if configured
+    # stopping early on the configured time budget and patience
+    self.sweep = KSweep(
+        self.mini_batch, config.clusterer.random_seed, self.scorer,
+        config.clusterer.parallelism, config.clusterer.sweep_mode ==
+        config_pb2.Clusterer.SweepMode.HIERARCHICAL,
+        config.clusterer.time_budget_seconds,
+        config.clusterer.early_stopping_patience)
+    # List[KResult] of the last sweep
+    self.sweep_results = []
+    # tokens of the features, centroids, cluster sizes and mean distance of the errors
+    # to their centroid of the chosen clustering
+    self.vocabulary = []
+    # hashed feature of every column of the HASHING vectorizer, None otherwise
+    self.hashed_features = None
+    self.centroids = None
+    self.cluster_sizes = []
+    self.mean_distance = None
+    # ClusterFeatures of the chosen clustering
+    self.features = None
+    # maximum of the watermark column of incremental runs
+    self.watermark_column = config.clusterer.incremental.watermark_column
+    self.watermark = None
+
     self.output_column_name = config.clusterer.output_column_name
 
   def cluster_errors(self):
@@ -63,44 +125,125 @@ class KMeansClusterer:
     On Return:
       Adds a column 'CLUSTERCODE' for each exception where clustercode is the cluster in
         which the exception belongs to if applicable.
+      Records the chosen k, the number of ks evaluated and the reason the sweep stopped
+        in the dataframe attrs under SWEEP_SUMMARY_ATTR for the Summarizer.
+      Keeps the ClusterFeatures of the chosen clustering in features for the Summarizer.
+      Keeps the number of features, and their collisions when hashed, in vectorizer_stats.
+
+    Returns:
+      ModelArtifact of the chosen clustering, which the caller saves at artifact_path once
+        the summary of the errors is written, so a failed write never advances the watermark
     """
-    # Vectorize the input using CountVectorizer
-    term_freq_matrix = CountVectorizer(
-        tokenizer=self.tokenization_method).fit_transform(
-            self.df[self.internal_column_name])
+    documents_column = self.internal_parsed_column_name
+    if documents_column not in self.df.columns:
+      # rows preprocessed by the executor only hold their text
+      documents_column = self.internal_column_name
+    documents = self.df[documents_column]
+    document_rows = np.arange(len(documents))
+    # document i stands for sample_weight[i] identical rows
+    sample_weight = None
+    if self.deduplicate:
+      # every row is mapped to its unique preprocessed text (in order of appearance)
+      document_codes, _ = pd.factorize(self.df[self.internal_column_name])
+      sample_weight = np.bincount(document_codes)
+      document_rows = np.unique(document_codes, return_index=True)[1]
+      documents = documents.iloc[document_rows]
+
+    # Vectorize the already parsed traces using CountVectorizer, or hash their tokens into
+    # a fixed number of features if configured
+    # the tokenizers lowercase on their own where it matters
+    token_hasher = token_hasher_of(self.config)
+    if token_hasher is not None:
+      if self.executor is not None:
+        term_freq_matrix = self.executor.hash(documents, token_hasher)
+      else:
+        term_freq_matrix = token_hasher.transform(documents,
+                                                  self.tokenization_method)
+      # only the used features are kept, so the centroids never span every hashed feature
+      # frames are recorded per feature while hashing, its naming token may have collided
+      self.hashed_features, self.vocabulary, is_frame = (
+          token_hasher.used_features())
+      term_freq_matrix = term_freq_matrix[:, self.hashed_features]
+      self.vectorizer_stats = token_hasher.stats()
+    else:
+      if self.executor is not None:
+        # only the unique documents are tokenized when deduplicating
+        term_freq_matrix, self.vocabulary = self.executor.count(documents)
+      else:
+        vectorizer = CountVectorizer(analyzer=self.tokenization_method)
+        term_freq_matrix = vectorizer.fit_transform(documents)
+        self.vocabulary = sorted(vectorizer.vocabulary_,
+                                 key=vectorizer.vocabulary_.get)
+      self.vectorizer_stats = {'n_features': len(self.vocabulary)}
+      is_frame = np.array([is_stack_frame(token) for token in self.vocabulary],
+                          dtype=bool)
     # normalize in case of repeats
     normalized_matrix = preprocessing.normalize(term_freq_matrix)
-
-    silhouette_scores = []
-    labels = []
-    try:
-      # run K-Means for each k between min_cluster and max_cluster
-      # then calculate silhouette score
-      for k in range(self.min_cluster, self.max_cluster):
-        if self.mini_batch:
-          # MiniBatch should only be used on < 1000 sample points
-          # in order to achieve good results for large k,
-          # we need a large batch_size number
-          # 1000 should suffice for all use cases of our current Classifier
-          k_cluster = MiniBatchKMeans(n_clusters=k,
-                                      batch_size=1000).fit(normalized_matrix)
-        else:
-          k_cluster = KMeans(n_clusters=k).fit(normalized_matrix)
-        silhouette_scores.append(
-            silhouette_score(normalized_matrix,
-                             k_cluster.labels_,
-                             metric='euclidean'))
-        labels.append(k_cluster.labels_)
-
-      # label each error using the 'best' silhouette label
-      best_labels = labels[silhouette_scores.index(max(silhouette_scores))]
-      # convert to string for consistency
-      best_labels = list(map(str, best_labels))
-    except ValueError:
-      # If only one cluster exists, silhouette score throws Value Error
+    # K-Means can not find more clusters than there are documents
+    max_cluster = min(self.max_cluster, normalized_matrix.shape[0] + 1)
+
+    # run K-Means for each k between min_cluster and max_cluster
+    # then calculate the cluster quality score
+    self.sweep_results = self.sweep.run(
+        normalized_matrix, list(range(self.min_cluster, max_cluster)),
+        sample_weight)
+    best_result = KSweep.best(self.sweep_results)
+    if best_result is None:
+      # no k could be fitted, i.e. every row deduplicated to a single document and the
+      # range of ks is empty, label all points as one label
+      best_labels = np.zeros(normalized_matrix.shape[0], dtype=int)
+      self.centroids = np.asarray(
+          normalized_matrix.mean(axis=0) if sample_weight is None else
+          sample_weight @ normalized_matrix / sample_weight.sum()).reshape(
+              1, -1)
+    else:
+      # label each error using the 'best' score label
+      # If only one cluster exists no k can be scored
       # Since we explicitly do not allow this in config
-      # we simply label all points as one label
-      best_labels = list(map(str, k_cluster.labels_))
+      # we simply label all points with the first labels
+      best_labels = best_result.labels
+      self.centroids = best_result.centroids
+
+    # baseline of the drift of incremental runs
+    document_distances = euclidean_distances(
+        normalized_matrix,
+        self.centroids)[np.arange(len(best_labels)), best_labels]
+    self.mean_distance = float(
+        np.average(document_distances, weights=sample_weight))
+    self.features = ClusterFeatures(
+        normalized_matrix, document_rows,
+        sample_weight if sample_weight is not None else np.ones(
+            len(best_labels), dtype=int), best_labels, document_distances,
+        self.vocabulary, is_frame, self.centroids)
+
+    if self.deduplicate:
+      # broadcast the labels of the unique documents back to every row
+      best_labels = best_labels[document_codes]
+    self.cluster_sizes = np.bincount(best_labels,
+                                     minlength=len(self.centroids)).tolist()
+    if self.watermark_column:
+      self.watermark = watermark_of(self.df[self.watermark_column])
+    # convert to string for consistency
+    best_labels = list(map(str, best_labels))
+
+    self.df.attrs[self.SWEEP_SUMMARY_ATTR] = {
+        'ChosenK': best_result.k if best_result is not None else 1,
+        'KEvaluated': len(self.sweep_results),
+        'SweepStopReason': self.sweep.stop_reason,
+    }
 
     # Label each exception with a cluster tag
     self.df[self.output_column_name] = best_labels
+
+    return self.to_artifact()
+
+  def to_artifact(self):
+    """Captures the clustering chosen by the last cluster_errors as a ModelArtifact.
+
+    Returns:
+      ModelArtifact whose cluster ids are the codes of the clusterer output column
+    """
+    return ModelArtifact(self.vocabulary, self.centroids,
+                         [str(label) for label in range(len(self.centroids))],
+                         self.config, self.cluster_sizes, self.mean_distance,
+                         self.watermark, self.hashed_features)
@@ -49,6 +49,11 @@ class KMeansClustererTest(unittest.TestCase):
 
     # number of clusters should be 2
     self.assertEqual(len(clusterer.df['clusterer_output'].unique()), 2)
+    sweep_summary = clusterer.df.attrs[KMeansClusterer.SWEEP_SUMMARY_ATTR]
+    self.assertEqual(sweep_summary['ChosenK'], 2)
+    self.assertEqual(sweep_summary['KEvaluated'],
+                     len(clusterer.sweep_results))
+    self.assertEqual(sweep_summary['SweepStopReason'], 'COMPLETED')
 
   def test_cluster_errors_repeated(self):
     """Test with repeated data, should still only be 2 clusters despite repeated data."""
@@ -68,6 +73,86 @@ class KMeansClustererTest(unittest.TestCase):
     # number of clusters should be 2
     self.assertEqual(len(clusterer.df['clusterer_output'].unique()), 2)
 
+  def test_cluster_errors_deduplicate(self):
+    """Test that duplicated rows are clustered once and share their label."""
+    self.config_human_readable.clusterer.deduplicate = True
+    duplicated_dataframe = pd.concat([self.simple_dataframe] * 3,
+                                     ignore_index=True)
+    clusterer = KMeansClusterer(duplicated_dataframe,
+                                self.config_human_readable)
+    clusterer.cluster_errors()
+
+    # number of clusters should still be 2
+    self.assertEqual(len(clusterer.df['clusterer_output'].unique()), 2)
+    # copies of the same row share a label
+    labels = list(clusterer.df['clusterer_output'])
+    self.assertEqual(labels[:5], labels[5:10])
+    self.assertEqual(labels[:5], labels[10:])
+
+  def test_cluster_errors_deduplicate_identical_rows(self):
+    """Test that rows deduplicating to a single document all get the first label."""
+    self.config_human_readable.clusterer.deduplicate = True
+    identical_dataframe = pd.concat([self.simple_dataframe.iloc[[0]]] * 4,
+                                    ignore_index=True)
+    clusterer = KMeansClusterer(identical_dataframe,
+                                self.config_human_readable)
+    clusterer.cluster_errors()
+
+    # no k can be fitted on a single document
+    self.assertEqual(list(clusterer.df['clusterer_output']), ['0'] * 4)
+    sweep_summary = clusterer.df.attrs[KMeansClusterer.SWEEP_SUMMARY_ATTR]
+    self.assertEqual(sweep_summary['ChosenK'], 1)
+    self.assertEqual(sweep_summary['KEvaluated'], 0)
+    self.assertEqual(clusterer.cluster_sizes, [4])
+
+  def test_cluster_errors_processes(self):
+    """Test that preprocessing and tokenizing in processes gives the same clusters."""
+    clusterer = KMeansClusterer(self.simple_dataframe.copy(),
+                                self.config_human_readable)
+    clusterer.cluster_errors()
+    self.config_human_readable.execution.processes = 2
+    self.config_human_readable.execution.chunk_size = 2
+    parallel_clusterer = KMeansClusterer(self.simple_dataframe.copy(),
+                                         self.config_human_readable)
+    parallel_clusterer.cluster_errors()
+
+    self.assertEqual(parallel_clusterer.vocabulary, clusterer.vocabulary)
+    self.assertEqual(list(parallel_clusterer.df['clusterer_output']),
+                     list(clusterer.df['clusterer_output']))
+
+  def test_cluster_errors_hashing(self):
+    """Test that hashed features give the same clusters with a fixed number of features."""
+    clusterer = KMeansClusterer(self.simple_dataframe.copy(),
+                                self.config_human_readable)
+    clusterer.cluster_errors()
+    self.config_human_readable.clusterer.vectorizer = config_pb2.Clusterer.VectorizerMode.HASHING
+    self.config_human_readable.clusterer.n_hashed_features = 256
+    hashing_clusterer = KMeansClusterer(self.simple_dataframe.copy(),
+                                        self.config_human_readable)
+    hashing_clusterer.cluster_errors()
+    self.assertEqual(list(hashing_clusterer.df['clusterer_output']),
+                     list(clusterer.df['clusterer_output']))
+    stats = hashing_clusterer.vectorizer_stats
+    self.assertEqual(stats['n_features'], 256)
+    self.assertLessEqual(stats['used_features'], len(clusterer.vocabulary))
+    # only the used features are kept
+    self.assertEqual(len(hashing_clusterer.vocabulary), stats['used_features'])
+    self.assertEqual(hashing_clusterer.centroids.shape[1],
+                     stats['used_features'])
+    self.assertTrue(all(0 <= feature < 256
+                        for feature in hashing_clusterer.hashed_features))
+    self.assertGreaterEqual(stats['collision_rate'], 0.0)
+
+    # chunks hashed in processes give the same features
+    self.config_human_readable.execution.processes = 2
+    self.config_human_readable.execution.chunk_size = 2
+    parallel_clusterer = KMeansClusterer(self.simple_dataframe.copy(),
+                                         self.config_human_readable)
+    parallel_clusterer.cluster_errors()
+    self.assertEqual(parallel_clusterer.vocabulary,
+                     hashing_clusterer.vocabulary)
+    self.assertEqual(parallel_clusterer.vectorizer_stats, stats)
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,508 @@
+"""Module for sweeping the number of clusters k tested by the K-Means Clusterer."""
+import collections
+import concurrent.futures
+from multiprocessing import shared_memory
+import time
+
+import numpy as np
+import scipy.sparse
+from sklearn.cluster import KMeans
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics.pairwise import euclidean_distances
+from threadpoolctl import threadpool_limits
+
+# Outcome of fitting and scoring a single k, score is None if the clustering can not be
+# scored (i.e. K-Means found a single cluster)
+KResult = collections.namedtuple(
+    'KResult',
+    ['k', 'labels', 'centroids', 'score', 'fit_seconds', 'score_seconds'])
+
+# State of a sweep worker process, set once by _initialize_worker
+_WORKER_STATE = {}
+
+# Reasons a sweep stopped
+STOP_COMPLETED = 'COMPLETED'
+STOP_TIME_BUDGET = 'TIME_BUDGET'
+STOP_NO_IMPROVEMENT = 'NO_IMPROVEMENT'
+
+# Number of initializations of every fit, pinned to the former sklearn defaults since
+# newer sklearn versions default to a single initialization
+K_MEANS_N_INIT = 10
+MINI_BATCH_K_MEANS_N_INIT = 3
+
+
+def k_seed(random_seed, k):
+  """Derives the seed of the K-Means fit of k.
+
+  The seed only depends on random_seed and k, so a sweep gives the same clusters no
+  matter the order or the process in which the ks are fitted.
+
+  Args:
+    random_seed: int seed of the whole sweep
+
+    k: int number of clusters
+
+  Returns:
+    int seed of the fit
+  """
+  return int(np.random.SeedSequence([random_seed, k]).generate_state(1)[0])
+
+
+def fit_k_means(matrix, k, mini_batch, seed, sample_weight=None):
+  """Fits K-Means with k clusters.
+
+  Args:
+    matrix: (sparse) matrix of shape (n_rows, n_features) to cluster
+
+    k: int number of clusters
+
+    mini_batch: bool whether to use mini-batch K-Means
+
+    seed: int seed of the fit
+
+    sample_weight: optional array of shape (n_rows,) of duplicate counts of each row
+
+  Returns:
+    fitted sklearn KMeans or MiniBatchKMeans
+  """
+  if mini_batch:
+    # MiniBatch should only be used on < 1000 sample points
+    # in order to achieve good results for large k,
+    # we need a large batch_size number
+    # 1000 should suffice for all use cases of our current Classifier
+    return MiniBatchKMeans(n_clusters=k,
+                           batch_size=1000,
+                           n_init=MINI_BATCH_K_MEANS_N_INIT,
+                           random_state=seed).fit(matrix,
+                                                  sample_weight=sample_weight)
+  return KMeans(n_clusters=k, n_init=K_MEANS_N_INIT,
+                random_state=seed).fit(matrix, sample_weight=sample_weight)
+
+
+def fit_and_score(matrix, k, mini_batch, random_seed, scorer,
+                  sample_weight=None):
+  """Fits K-Means with k clusters and scores the clustering.
+
+  Args:
+    matrix: (sparse) matrix of shape (n_rows, n_features) to cluster
+
+    k: int number of clusters
+
+    mini_batch: bool whether to use mini-batch K-Means
+
+    random_seed: int seed of the whole sweep
+
+    scorer: ClusterScorer scoring the clustering
+
+    sample_weight: optional array of shape (n_rows,) of duplicate counts of each row
+
+  Returns:
+    KResult of k
+  """
+  start = time.perf_counter()
+  k_cluster = fit_k_means(matrix, k, mini_batch, k_seed(random_seed, k),
+                          sample_weight)
+  fit_seconds = time.perf_counter() - start
+  start = time.perf_counter()
+  try:
+    score = scorer.score(matrix, k_cluster.labels_, k_cluster.cluster_centers_,
+                         sample_weight)
+  except ValueError:
+    # If only one cluster exists, silhouette score throws Value Error
+    score = None
+  return KResult(k, k_cluster.labels_, k_cluster.cluster_centers_, score,
+                 fit_seconds, time.perf_counter() - start)
+
+
+def ward_partitions(centroids, weights):
+  """Agglomerates centroids bottom-up with the weighted Ward criterion.
+
+  Starting from every non-empty centroid as its own group, the two groups whose merge least
+  increases the within-group sum of squares are merged until one group is left.
+
+  Args:
+    centroids: array of shape (n_centroids, n_features) of cluster centers
+
+    weights: array of shape (n_centroids,) of the (weighted) size of each cluster
+
+  Returns:
+    dict mapping every number of groups to a List[List[int]] of the centroid indices in
+      each group
+  """
+  groups = [([index], centroids[index], weights[index])
+            for index in range(len(centroids))
+            if weights[index] > 0]
+  partitions = {len(groups): [members for members, _, _ in groups]}
+  while len(groups) > 1:
+    best_cost, best_pair = None, None
+    for first in range(len(groups)):
+      for second in range(first + 1, len(groups)):
+        _, first_center, first_weight = groups[first]
+        _, second_center, second_weight = groups[second]
+        # increase of the within-group sum of squares when merging the two groups
+        cost = (first_weight * second_weight / (first_weight + second_weight) *
+                np.sum((first_center - second_center)**2))
+        if best_cost is None or cost < best_cost:
+          best_cost, best_pair = cost, (first, second)
+    first, second = best_pair
+    first_members, first_center, first_weight = groups[first]
+    second_members, second_center, second_weight = groups.pop(second)
+    merged_weight = first_weight + second_weight
+    groups[first] = (first_members + second_members,
+                     (first_center * first_weight + second_center * second_weight)
+                     / merged_weight, merged_weight)
+    partitions[len(groups)] = [members for members, _, _ in groups]
+  return partitions
+
+
+def hierarchical_sweep(matrix, ks, mini_batch, random_seed, scorer,
+                       sample_weight=None):
+  """Fits K-Means once at the largest k and derives every smaller k by merging centroids.
+
+  The centroids of the single fit are agglomerated with the weighted Ward criterion. For
+  every k the merged centroids of the k groups are the weighted means of their members,
+  and every row is reassigned to its nearest merged centroid in O(n_rows * k) before the
+  clustering is scored.
+
+  Args:
+    matrix: (sparse) matrix of shape (n_rows, n_features) to cluster
+
+    ks: List[int] numbers of clusters to test
+
+    mini_batch: bool whether to use mini-batch K-Means
+
+    random_seed: int seed of the whole sweep
+
+    scorer: ClusterScorer scoring the clustering
+
+    sample_weight: optional array of shape (n_rows,) of duplicate counts of each row
+
+  Yields:
+    KResult in the order of ks
+  """
+  if not ks:
+    return
+  max_k = max(ks)
+  start = time.perf_counter()
+  k_cluster = fit_k_means(matrix, max_k, mini_batch, k_seed(random_seed, max_k),
+                          sample_weight)
+  max_k_fit_seconds = time.perf_counter() - start
+  weights = np.ones(matrix.shape[0]) if sample_weight is None else sample_weight
+  cluster_weights = np.bincount(k_cluster.labels_,
+                                weights=weights,
+                                minlength=max_k)
+  partitions = ward_partitions(k_cluster.cluster_centers_, cluster_weights)
+
+  for k in ks:
+    start = time.perf_counter()
+    if k == max_k:
+      labels, centroids = k_cluster.labels_, k_cluster.cluster_centers_
+      fit_seconds = max_k_fit_seconds
+    else:
+      # K-Means may leave clusters empty, then fewer groups exist than asked for
+      groups = partitions[min(k, max(partitions))]
+      centroids = np.array([
+          np.average(k_cluster.cluster_centers_[members],
+                     axis=0,
+                     weights=cluster_weights[members]) for members in groups
+      ])
+      labels = euclidean_distances(matrix, centroids).argmin(axis=1)
+      fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    try:
+      score = scorer.score(matrix, labels, centroids, sample_weight)
+    except ValueError:
+      # If only one cluster exists, silhouette score throws Value Error
+      score = None
+    yield KResult(k, labels, centroids, score, fit_seconds,
+                  time.perf_counter() - start)
+
+
+class SharedCsrMatrix:
+  """CSR matrix whose arrays are placed in shared memory.
+
+  Worker processes attach to the shared arrays instead of receiving a pickled copy of the
+  matrix, so the matrix exists once in memory no matter the number of workers.
+  """
+  _ARRAYS = ('data', 'indices', 'indptr')
+
+  def __init__(self, matrix):
+    """Copies matrix into new shared memory segments.
+
+    Args:
+      matrix: sparse matrix to share
+    """
+    matrix = scipy.sparse.csr_matrix(matrix)
+    self.segments = []
+    arrays = {}
+    for name in self._ARRAYS:
+      array = getattr(matrix, name)
+      # empty segments are not allowed
+      segment = shared_memory.SharedMemory(create=True,
+                                           size=max(array.nbytes, 1))
+      np.ndarray(array.shape, array.dtype, buffer=segment.buf)[:] = array
+      self.segments.append(segment)
+      arrays[name] = (segment.name, array.shape, array.dtype.str)
+    # picklable description of the shared matrix handed to the workers
+    self.spec = (arrays, matrix.shape)
+
+  @classmethod
+  def attach(cls, spec):
+    """Maps a shared matrix without copying its arrays.
+
+    Args:
+      spec: SharedCsrMatrix.spec of the matrix
+
+    Returns:
+      tuple of (matrix, segments), the segments must be kept referenced while the
+        matrix is in use
+    """
+    arrays, shape = spec
+    segments = []
+    views = []
+    for name in cls._ARRAYS:
+      segment_name, array_shape, dtype = arrays[name]
+      segment = shared_memory.SharedMemory(name=segment_name)
+      segments.append(segment)
+      views.append(np.ndarray(array_shape, np.dtype(dtype), buffer=segment.buf))
+    matrix = scipy.sparse.csr_matrix(tuple(views), shape=shape, copy=False)
+    return matrix, segments
+
+  def release(self):
+    """Frees the shared memory segments, the workers must have exited."""
+    for segment in self.segments:
+      segment.close()
+      segment.unlink()
+
+
+def _initialize_worker(spec, mini_batch, random_seed, scorer, sample_weight):
+  """Attaches a worker process to the shared matrix and the sweep settings."""
+  matrix, segments = SharedCsrMatrix.attach(spec)
+  _WORKER_STATE.update(matrix=matrix,
+                       segments=segments,
+                       mini_batch=mini_batch,
+                       random_seed=random_seed,
+                       scorer=scorer,
+                       sample_weight=sample_weight)
+
+
+def _fit_and_score_in_worker(k):
+  """Runs fit_and_score of k on the shared matrix of the worker process."""
+  # workers already run in parallel, avoid oversubscribing the cores with threads
+  with threadpool_limits(limits=1):
+    return fit_and_score(_WORKER_STATE['matrix'], k,
+                         _WORKER_STATE['mini_batch'],
+                         _WORKER_STATE['random_seed'], _WORKER_STATE['scorer'],
+                         _WORKER_STATE['sample_weight'])
+
+
+def _terminate_workers(executor):
+  """Stops a process pool without waiting for the ks its workers are still fitting.
+
+  Args:
+    executor: concurrent.futures.ProcessPoolExecutor of the sweep
+  """
+  # ProcessPoolExecutor has no public way to stop running calls, its processes are
+  # taken before shutdown forgets them
+  processes = list((executor._processes or {}).values())  # pylint: disable=protected-access
+  executor.shutdown(wait=False, cancel_futures=True)
+  for process in processes:
+    process.terminate()
+  for process in processes:
+    process.join()
+
+
+class SweepStopper:
+  """Class deciding when an anytime sweep stops before testing every k.
+
+  The budget and patience are only checked once a k finishes, so in the sequential and
+  hierarchical sweeps a single long fit can overrun the time budget. The parallel sweep
+  instead bounds its wait for every result by the remaining budget and terminates the
+  fits still running once the budget is spent.
+  """
+
+  def __init__(self, time_budget_seconds, patience):
+    """Starts the clock of the sweep.
+
+    Args:
+      time_budget_seconds: float wall-clock budget of the sweep, unlimited if not positive
+
+      patience: int number of consecutive ks without a better score after which the
+        sweep stops, unlimited if not positive
+    """
+    self.deadline = None
+    if time_budget_seconds > 0:
+      self.deadline = time.perf_counter() + time_budget_seconds
+    self.patience = patience
+    self.best_score = None
+    self.without_improvement = 0
+
+  def remaining_seconds(self):
+    """Returns the seconds left in the budget, None if the budget is unlimited."""
+    if self.deadline is None:
+      return None
+    return max(0.0, self.deadline - time.perf_counter())
+
+  def update(self, result):
+    """Accounts for the result of one more k.
+
+    Args:
+      result: KResult of the k that just finished
+
+    Returns:
+      str reason to stop the sweep, None to continue
+    """
+    if result.score is not None and (self.best_score is None or
+                                     result.score > self.best_score):
+      self.best_score = result.score
+      self.without_improvement = 0
+    else:
+      self.without_improvement += 1
+    if self.patience > 0 and self.without_improvement >= self.patience:
+      return STOP_NO_IMPROVEMENT
+    if self.deadline is not None and time.perf_counter() >= self.deadline:
+      return STOP_TIME_BUDGET
+    return None
+
+
+class KSweep:
+  """Class fitting and scoring K-Means for every candidate number of clusters k.
+
+  The ks are tested in increasing order and the sweep is anytime: it stops early, keeping
+  the results found so far, once its time budget is spent or once the score has not
+  improved for early_stopping_patience consecutive ks.
+  """
+
+  def __init__(self,
+               mini_batch,
+               random_seed,
+               scorer,
+               parallelism,
+               hierarchical=False,
+               time_budget_seconds=0,
+               early_stopping_patience=0):
+    """Initializes the sweep settings.
+
+    Args:
+      mini_batch: bool whether to use mini-batch K-Means
+
+      random_seed: int seed of the sweep, every k derives its own seed from it
+
+      scorer: ClusterScorer scoring each clustering
+
+      parallelism: int number of processes fitting ks concurrently, 0 or 1 fits them
+        one after another in the current process
+
+      hierarchical: bool whether to fit only the largest k and derive the smaller ks
+        with hierarchical_sweep, parallelism is then unused
+
+      time_budget_seconds: float wall-clock budget of a sweep, unlimited if not positive
+
+      early_stopping_patience: int number of consecutive ks without a better score
+        after which a sweep stops, unlimited if not positive
+    """
+    self.mini_batch = mini_batch
+    self.random_seed = random_seed
+    self.scorer = scorer
+    self.parallelism = parallelism
+    self.hierarchical = hierarchical
+    self.time_budget_seconds = time_budget_seconds
+    self.early_stopping_patience = early_stopping_patience
+    # reason the last sweep stopped
+    self.stop_reason = None
+
+  def run(self, matrix, ks, sample_weight=None):
+    """Fits and scores every k.
+
+    Args:
+      matrix: sparse matrix of shape (n_rows, n_features) to cluster
+
+      ks: List[int] numbers of clusters to test
+
+      sample_weight: optional array of shape (n_rows,) of duplicate counts of each row
+
+    Returns:
+      List[KResult] in the order of ks, only the ks tested before the sweep stopped
+    """
+    stopper = SweepStopper(self.time_budget_seconds,
+                           self.early_stopping_patience)
+    if self.hierarchical:
+      results_iterator = hierarchical_sweep(matrix, ks, self.mini_batch,
+                                            self.random_seed, self.scorer,
+                                            sample_weight)
+    elif self.parallelism > 1 and len(ks) > 1:
+      results_iterator = self.iterate_parallel(matrix, ks, stopper,
+                                               sample_weight)
+    else:
+      results_iterator = (fit_and_score(matrix, k, self.mini_batch,
+                                        self.random_seed, self.scorer,
+                                        sample_weight) for k in ks)
+
+    results = []
+    self.stop_reason = STOP_COMPLETED
+    try:
+      for result in results_iterator:
+        results.append(result)
+        stop_reason = stopper.update(result)
+        if stop_reason:
+          self.stop_reason = stop_reason
+          break
+    except concurrent.futures.TimeoutError:
+      self.stop_reason = STOP_TIME_BUDGET
+    finally:
+      results_iterator.close()
+    return results
+
+  def iterate_parallel(self, matrix, ks, stopper, sample_weight=None):
+    """Fits and scores every k concurrently in a process pool sharing the matrix.
+
+    Args:
+      matrix: sparse matrix of shape (n_rows, n_features) to cluster
+
+      ks: List[int] numbers of clusters to test
+
+      stopper: SweepStopper whose remaining time bounds the wait for each result
+
+      sample_weight: optional array of shape (n_rows,) of duplicate counts of each row
+
+    Yields:
+      KResult in the order of ks, once the sweep stops the pending ks are cancelled and
+        the workers still fitting ks are terminated
+
+    Raises:
+      concurrent.futures.TimeoutError: if the time budget ends while waiting for a result
+    """
+    shared_matrix = SharedCsrMatrix(matrix)
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=min(self.parallelism, len(ks)),
+        initializer=_initialize_worker,
+        initargs=(shared_matrix.spec, self.mini_batch, self.random_seed,
+                  self.scorer, sample_weight))
+    futures = [executor.submit(_fit_and_score_in_worker, k) for k in ks]
+    try:
+      for future in futures:
+        yield future.result(timeout=stopper.remaining_seconds())
+    finally:
+      if all(future.done() for future in futures):
+        executor.shutdown()
+      else:
+        # the sweep stopped early, ks still running must not outlive the budget
+        _terminate_workers(executor)
+      # only unlinked once no worker maps the shared matrix anymore
+      shared_matrix.release()
+
+  @staticmethod
+  def best(results):
+    """Chooses the result with the highest score.
+
+    Args:
+      results: List[KResult] of a sweep
+
+    Returns:
+      KResult with the highest score, if no clustering could be scored (i.e. only one
+        cluster exists) the first result, None if there are no results
+    """
+    scored = [result for result in results if result.score is not None]
+    if scored:
+      return max(scored, key=lambda result: result.score)
+    return results[0] if results else None
@@ -0,0 +1,112 @@
+"""Unittest module for the k sweep."""
+import unittest
+
+from cluster_scorer import ClusterScorer
+from k_sweep import k_seed
+from k_sweep import KSweep
+from k_sweep import SharedCsrMatrix
+from k_sweep import STOP_COMPLETED
+from k_sweep import STOP_NO_IMPROVEMENT
+from k_sweep import STOP_TIME_BUDGET
+from k_sweep import ward_partitions
+import numpy as np
+import proto.config_pb2 as config_pb2
+import scipy.sparse
+
+
+class KSweepTest(unittest.TestCase):
+  """Unittest class for KSweep."""
+
+  def setUp(self):
+    """Set up of a sparse matrix made of three well separated groups."""
+    random_state = np.random.RandomState(0)
+    # 20 rows per group around far apart centers on disjoint features, with small noise
+    # so that k = 3 wins whatever the initialization of K-Means
+    blocks = [
+        np.full((20, 3), 10.0) + random_state.normal(scale=0.1, size=(20, 3))
+        for _ in range(3)
+    ]
+    self.matrix = scipy.sparse.block_diag(blocks, format='csr')
+    self.scorer = ClusterScorer(config_pb2.Config())
+    super(KSweepTest, self).setUp()
+
+  def test_k_seed(self):
+    """Tests that seeds are deterministic and differ between ks."""
+    self.assertEqual(k_seed(0, 3), k_seed(0, 3))
+    self.assertNotEqual(k_seed(0, 3), k_seed(0, 4))
+    self.assertNotEqual(k_seed(0, 3), k_seed(1, 3))
+
+  def test_shared_csr_matrix(self):
+    """Tests that an attached shared matrix equals the original matrix."""
+    shared_matrix = SharedCsrMatrix(self.matrix)
+    attached_matrix, segments = SharedCsrMatrix.attach(shared_matrix.spec)
+    self.assertEqual((attached_matrix != self.matrix).nnz, 0)
+    del attached_matrix
+    for segment in segments:
+      segment.close()
+    shared_matrix.release()
+
+  def test_parallel_matches_serial(self):
+    """Tests that the parallel sweep reproduces the serial sweep."""
+    ks = [2, 3, 4]
+    serial_results = KSweep(False, 5, self.scorer, 1).run(self.matrix, ks)
+    parallel_results = KSweep(False, 5, self.scorer, 2).run(self.matrix, ks)
+    self.assertEqual([result.k for result in parallel_results], ks)
+    for serial_result, parallel_result in zip(serial_results, parallel_results):
+      np.testing.assert_array_equal(serial_result.labels,
+                                    parallel_result.labels)
+      self.assertAlmostEqual(serial_result.score, parallel_result.score)
+    self.assertEqual(KSweep.best(parallel_results).k, 3)
+
+  def test_ward_partitions(self):
+    """Tests that the closest centroids are merged first and empty ones dropped."""
+    centroids = np.array([[0.0], [1.0], [10.0], [11.0], [50.0]])
+    weights = np.array([1, 1, 1, 1, 0])
+    partitions = ward_partitions(centroids, weights)
+    self.assertEqual(sorted(partitions), [1, 2, 3, 4])
+    self.assertEqual(sorted(map(sorted, partitions[2])), [[0, 1], [2, 3]])
+
+  def test_hierarchical(self):
+    """Tests that the hierarchical sweep derives every k from a single fit."""
+    ks = [2, 3, 4, 5]
+    results = KSweep(False, 5, self.scorer, 1, True).run(self.matrix, ks)
+    self.assertEqual([result.k for result in results], ks)
+    for result in results:
+      self.assertEqual(len(result.labels), self.matrix.shape[0])
+      self.assertLessEqual(len(np.unique(result.labels)), result.k)
+    self.assertEqual(KSweep.best(results).k, 3)
+
+  def test_early_stopping(self):
+    """Tests that the sweep stops once the score stops improving."""
+    ks = [2, 3, 4, 5, 6, 7]
+    sweep = KSweep(False, 5, self.scorer, 1, early_stopping_patience=2)
+    results = sweep.run(self.matrix, ks)
+    self.assertEqual([result.k for result in results], [2, 3, 4, 5])
+    self.assertEqual(sweep.stop_reason, STOP_NO_IMPROVEMENT)
+    self.assertEqual(KSweep.best(results).k, 3)
+
+    sweep = KSweep(False, 5, self.scorer, 2, early_stopping_patience=2)
+    results = sweep.run(self.matrix, ks)
+    self.assertEqual([result.k for result in results], [2, 3, 4, 5])
+    self.assertEqual(sweep.stop_reason, STOP_NO_IMPROVEMENT)
+
+    sweep = KSweep(False, 5, self.scorer, 1, True, early_stopping_patience=2)
+    results = sweep.run(self.matrix, ks)
+    self.assertEqual([result.k for result in results], [2, 3, 4, 5])
+    self.assertEqual(sweep.stop_reason, STOP_NO_IMPROVEMENT)
+
+  def test_time_budget(self):
+    """Tests that a spent time budget keeps the results found so far."""
+    ks = [2, 3, 4]
+    sweep = KSweep(False, 5, self.scorer, 1, time_budget_seconds=1e-9)
+    results = sweep.run(self.matrix, ks)
+    self.assertEqual([result.k for result in results], [2])
+    self.assertEqual(sweep.stop_reason, STOP_TIME_BUDGET)
+
+    sweep = KSweep(False, 5, self.scorer, 1, time_budget_seconds=600)
+    self.assertEqual(len(sweep.run(self.matrix, ks)), 3)
+    self.assertEqual(sweep.stop_reason, STOP_COMPLETED)
+
+
+if __name__ == "__main__":
+  unittest.main()
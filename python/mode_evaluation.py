@@ -0,0 +1,201 @@
+"""Tool evaluating the clustering quality and cost of a config variant against a baseline.
+
+Both configs cluster the same inputs: synthetic traces with known ground truth clusters and
+optionally testdata files. For every input the report holds the adjusted Rand index between
+the two clusterings (and of each against the ground truth when known), whether they chose
+the same k, the runtime and traced memory of the variant relative to the baseline, and the
+features of both, i.e. the collision rate of a HASHING vectorizer.
+"""
+import concurrent.futures
+import json
+import multiprocessing
+import resource
+
+from k_means_clusterer import KMeansClusterer
+import pandas as pd
+from pipeline_metrics import peak_rss_bytes
+from pipeline_metrics import PipelineMetrics
+import proto.config_pb2 as config_pb2
+from sklearn.metrics import adjusted_rand_score
+from synthetic_traces import generate_traces
+from synthetic_traces import TRUE_CLUSTER_COLUMN
+
+from absl import app
+from absl import flags
+from google.protobuf import text_format
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string('baseline_config', None,
+                    'configuration file path of the reference clustering')
+flags.DEFINE_string(
+    'candidate_config', None,
+    'configuration file path of the variant evaluated, i.e. an approximate mode')
+flags.DEFINE_list('sizes', ['10000'],
+                  'numbers of synthetic rows to evaluate on, none if empty')
+flags.DEFINE_integer('true_clusters', 8,
+                     'number of clusters the synthetic traces are generated from')
+flags.DEFINE_float('duplicate_ratio', 0.5,
+                   'probability of a synthetic trace repeating a previous one')
+flags.DEFINE_integer('seed', 0, 'seed of the trace generator')
+flags.DEFINE_list(
+    'input_paths', [],
+    'JSON dataframe files (i.e. testdata/k_means_clusterer/*.json) to evaluate on')
+flags.DEFINE_string('output_path', None,
+                    'JSON file path the report is written to')
+flags.mark_flag_as_required('baseline_config')
+flags.mark_flag_as_required('candidate_config')
+
+
+def run_clustering(df, config, trace_memory=False):
+  """Clusters a copy of the input, measuring its time and memory.
+
+  Args:
+    df: pandas dataframe of the raw input rows
+
+    config: config_pb2 proto the rows are preprocessed and clustered with
+
+    trace_memory: bool whether to trace the allocations of the clustering, which slows
+      it down, so its time is not comparable to an untraced run
+
+  Returns:
+    tuple of (labels, chosen_k, stage, vectorizer) List[str] cluster code of every row, int
+      chosen number of clusters, dict PipelineMetrics stage of the clustering and dict
+      vectorizer_stats of the clusterer
+  """
+  df = df.copy()
+  metrics = PipelineMetrics(trace_memory)
+  metrics.start()
+  try:
+    with metrics.stage('k_means_clusterer', len(df)):
+      clusterer = KMeansClusterer(df, config)
+      clusterer.cluster_errors()
+  finally:
+    metrics.stop()
+  return (list(df[config.clusterer.output_column_name]),
+          df.attrs[KMeansClusterer.SWEEP_SUMMARY_ATTR]['ChosenK'],
+          metrics.stages[0], clusterer.vectorizer_stats)
+
+
+def _measure_memory_in_process(df, config):
+  """Clusters the input with memory tracing in a fresh worker process of measure_memory."""
+  _, _, stage, _ = run_clustering(df, config, trace_memory=True)
+  return {
+      'traced_peak_delta_bytes': stage['traced_peak_delta_bytes'],
+      'peak_rss_delta_bytes': stage['peak_rss_delta_bytes'],
+      'worker_peak_rss_bytes': peak_rss_bytes(resource.RUSAGE_CHILDREN),
+  }
+
+
+def measure_memory(df, config):
+  """Measures the memory of clustering the input in a fresh process, apart from its timing.
+
+  tracemalloc only sees the allocations of its own process and slows the run down, so the
+  memory is measured by a separate run in a spawned process. Its peak RSS is not inflated
+  by earlier runs, and the pool workers it starts (i.e. with parallelism) are its children.
+
+  Args:
+    df: pandas dataframe of the raw input rows
+
+    config: config_pb2 proto the rows are preprocessed and clustered with
+
+  Returns:
+    dict of the 'traced_peak_delta_bytes' allocated by the clustering, the
+      'peak_rss_delta_bytes' of the process while clustering and the
+      'worker_peak_rss_bytes' of its largest pool worker, 0 without workers
+  """
+  with concurrent.futures.ProcessPoolExecutor(
+      max_workers=1,
+      mp_context=multiprocessing.get_context('spawn')) as executor:
+    return executor.submit(_measure_memory_in_process, df, config).result()
+
+
+def memory_bytes(memory):
+  """Returns the peak RSS delta of a clustering and its largest pool worker combined.
+
+  Args:
+    memory: dict returned by measure_memory
+  """
+  return memory['peak_rss_delta_bytes'] + memory['worker_peak_rss_bytes']
+
+
+def evaluate(df, baseline_config, candidate_config):
+  """Compares the clusterings of the input by the baseline and the candidate configs.
+
+  Args:
+    df: pandas dataframe of the raw input rows, with the ground truth cluster of every
+      row in TRUE_CLUSTER_COLUMN if known
+
+    baseline_config: config_pb2 proto of the reference clustering
+
+    candidate_config: config_pb2 proto of the evaluated variant
+
+  Returns:
+    dict of the 'adjusted_rand_index' between the two clusterings, the 'chosen_k' of both
+      and whether they 'agree', the candidate over baseline 'runtime_ratio' of untraced
+      runs, the 'baseline_memory' and 'candidate_memory' measured by measure_memory and
+      the candidate over baseline 'memory_ratio' of their peak RSS deltas including the
+      largest pool worker, the features of the 'baseline_vectorizer' and
+      'candidate_vectorizer' (i.e. the collision rate of a hashing vectorizer), and the
+      'baseline_true_ari' and 'candidate_true_ari' against the ground truth if known
+  """
+  baseline_labels, baseline_k, baseline_stage, baseline_vectorizer = (
+      run_clustering(df, baseline_config))
+  candidate_labels, candidate_k, candidate_stage, candidate_vectorizer = (
+      run_clustering(df, candidate_config))
+  baseline_memory = measure_memory(df, baseline_config)
+  candidate_memory = measure_memory(df, candidate_config)
+  report = {
+      'rows': len(df),
+      'adjusted_rand_index': adjusted_rand_score(baseline_labels,
+                                                 candidate_labels),
+      'baseline_k': baseline_k,
+      'candidate_k': candidate_k,
+      'k_agrees': baseline_k == candidate_k,
+      'baseline_seconds': baseline_stage['wall_seconds'],
+      'candidate_seconds': candidate_stage['wall_seconds'],
+      'runtime_ratio': (candidate_stage['wall_seconds'] /
+                        baseline_stage['wall_seconds']),
+      'baseline_memory': baseline_memory,
+      'candidate_memory': candidate_memory,
+      'memory_ratio': (memory_bytes(candidate_memory) /
+                       max(memory_bytes(baseline_memory), 1)),
+      'baseline_vectorizer': baseline_vectorizer,
+      'candidate_vectorizer': candidate_vectorizer,
+  }
+  if TRUE_CLUSTER_COLUMN in df.columns:
+    report['baseline_true_ari'] = adjusted_rand_score(df[TRUE_CLUSTER_COLUMN],
+                                                      baseline_labels)
+    report['candidate_true_ari'] = adjusted_rand_score(
+        df[TRUE_CLUSTER_COLUMN], candidate_labels)
+  return report
+
+
+def read_config(path):
+  """Reads a text format config_pb2 proto from path."""
+  with open(path) as config_file:
+    return text_format.Parse(config_file.read(), config_pb2.Config())
+
+
+def main(argv):
+  del argv  # Unused.
+  baseline_config = read_config(FLAGS.baseline_config)
+  candidate_config = read_config(FLAGS.candidate_config)
+
+  inputs = {}
+  for size in FLAGS.sizes:
+    inputs['synthetic_{}'.format(size)] = generate_traces(
+        int(size), FLAGS.true_clusters, FLAGS.duplicate_ratio, seed=FLAGS.seed)
+  for path in FLAGS.input_paths:
+    inputs[path] = pd.read_json(path, orient='columns')
+
+  reports = {}
+  for name, df in inputs.items():
+    reports[name] = evaluate(df, baseline_config, candidate_config)
+    print('{}: {}'.format(name, json.dumps(reports[name])))
+  if FLAGS.output_path:
+    with open(FLAGS.output_path, 'w') as output_file:
+      json.dump(reports, output_file, indent=2)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,70 @@
+"""Unittest module for the mode evaluation tool."""
+import unittest
+
+from mode_evaluation import evaluate
+import pandas as pd
+import proto.config_pb2 as config_pb2
+from synthetic_traces import generate_traces
+
+
+class ModeEvaluationTest(unittest.TestCase):
+  """Unittest class for evaluate."""
+
+  def setUp(self):
+    """Set up of a baseline config and its deduplicated variant."""
+    self.baseline_config = config_pb2.Config()
+    self.baseline_config.informative_column.extend(
+        ["exception", "remoteException", "errorMessage"])
+    self.baseline_config.clusterer.tokenizer.token_min_length = 2
+    self.baseline_config.clusterer.tokenizer.mode = (
+        config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE)
+    self.baseline_config.clusterer.min_cluster = 2
+    self.baseline_config.clusterer.max_cluster = 5
+    self.baseline_config.clusterer.output_column_name = 'clusterer_output'
+    self.candidate_config = config_pb2.Config()
+    self.candidate_config.CopyFrom(self.baseline_config)
+    self.candidate_config.clusterer.deduplicate = True
+    super(ModeEvaluationTest, self).setUp()
+
+  def test_evaluate_testdata(self):
+    """Tests that deduplication keeps the clusters of the testdata."""
+    df = pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                      orient='columns')
+    report = evaluate(df, self.baseline_config, self.candidate_config)
+    self.assertEqual(report['rows'], len(df))
+    self.assertAlmostEqual(report['adjusted_rand_index'], 1.0)
+    self.assertTrue(report['k_agrees'])
+    self.assertGreater(report['runtime_ratio'], 0)
+    self.assertGreaterEqual(report['memory_ratio'], 0)
+    # memory is measured by separate traced runs
+    self.assertGreater(
+        report['baseline_memory']['traced_peak_delta_bytes'], 0)
+    self.assertNotIn('baseline_true_ari', report)
+    # the input is left as is
+    self.assertNotIn('clusterer_output', df.columns)
+
+  def test_evaluate_ground_truth(self):
+    """Tests the agreement with the ground truth clusters of synthetic traces."""
+    df = generate_traces(300, true_clusters=3, seed=1)
+    report = evaluate(df, self.baseline_config, self.baseline_config)
+    self.assertAlmostEqual(report['adjusted_rand_index'], 1.0)
+    self.assertAlmostEqual(report['baseline_true_ari'],
+                           report['candidate_true_ari'])
+    self.assertLessEqual(report['baseline_true_ari'], 1.0)
+
+  def test_evaluate_hashing(self):
+    """Tests that the hashing vectorizer reports its collisions and keeps the clusters."""
+    df = pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                      orient='columns')
+    self.candidate_config.clusterer.vectorizer = config_pb2.Clusterer.VectorizerMode.HASHING
+    self.candidate_config.clusterer.n_hashed_features = 1024
+    report = evaluate(df, self.baseline_config, self.candidate_config)
+    self.assertAlmostEqual(report['adjusted_rand_index'], 1.0)
+    self.assertNotIn('collision_rate', report['baseline_vectorizer'])
+    self.assertEqual(report['candidate_vectorizer']['n_features'], 1024)
+    self.assertLessEqual(report['candidate_vectorizer']['used_features'],
+                         report['baseline_vectorizer']['n_features'])
+
+
+if __name__ == "__main__":
+  unittest.main()
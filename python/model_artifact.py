@@ -0,0 +1,154 @@
+"""Module for the persisted model of a clustering, reused to label new errors."""
+import json
+import os
+
+import numpy as np
+import proto.config_pb2 as config_pb2
+
+from google.protobuf import text_format
+
+
+class ModelArtifact:
+  """Everything needed to label new errors with the clusters of a past run.
+
+  An artifact is a directory holding metadata.json (format version, vocabulary, cluster ids,
+  the config the errors were preprocessed and tokenized with and the incremental state) and
+  centroids.npz. Both files are plain data, nothing is pickled.
+
+  Attributes:
+    vocabulary: List[str] tokens in the order of the features of the centroids
+    centroids: array of shape (n_clusters, n_features) of the cluster centers
+    cluster_ids: List[str] cluster code of every centroid
+    config: config_pb2 proto the clusters were found with
+    cluster_sizes: List[int] number of errors in every cluster so far
+    mean_distance: float mean distance of the errors to their centroid when last refitted,
+      the baseline of the drift of incremental runs
+    watermark: JSON scalar (str timestamp or number) of the last row clustered so far,
+      None if no watermark column is configured
+    hashed_features: List[int] hashed feature of every feature of the centroids if the
+      config uses the HASHING vectorizer, only the features used by the clustered errors
+      are kept; None if every hashed feature is kept or the vocabulary is not hashed
+  """
+  FORMAT_VERSION = 1
+  METADATA_FILE_NAME = 'metadata.json'
+  CENTROIDS_FILE_NAME = 'centroids.npz'
+
+  def __init__(self,
+               vocabulary,
+               centroids,
+               cluster_ids,
+               config,
+               cluster_sizes=None,
+               mean_distance=None,
+               watermark=None,
+               hashed_features=None):
+    """Initializes the artifact.
+
+    Args:
+      vocabulary: List[str] tokens in the order of the features of the centroids
+
+      centroids: array of shape (n_clusters, n_features) of the cluster centers
+
+      cluster_ids: List[str] cluster code of every centroid
+
+      config: config_pb2 proto the clusters were found with
+
+      cluster_sizes: optional List[int] number of errors in every cluster, 0 if None
+
+      mean_distance: optional float mean distance of the errors to their centroid
+
+      watermark: optional JSON scalar of the last row clustered so far
+
+      hashed_features: optional List[int] hashed feature of every feature of the centroids
+
+    Raises:
+      ValueError: if the shapes of the vocabulary, centroids, cluster ids and hashed
+        features disagree
+    """
+    centroids = np.asarray(centroids, dtype=np.float64)
+    if centroids.shape != (len(cluster_ids), len(vocabulary)):
+      raise ValueError(
+          'Centroids of shape {} do not match {} cluster ids and {} tokens'.format(
+              centroids.shape, len(cluster_ids), len(vocabulary)))
+    if hashed_features is not None and len(hashed_features) != len(vocabulary):
+      raise ValueError('{} hashed features do not match {} tokens'.format(
+          len(hashed_features), len(vocabulary)))
+    self.vocabulary = list(vocabulary)
+    self.centroids = centroids
+    self.cluster_ids = list(cluster_ids)
+    self.config = config
+    if cluster_sizes is None:
+      cluster_sizes = [0] * len(cluster_ids)
+    self.cluster_sizes = [int(size) for size in cluster_sizes]
+    self.mean_distance = mean_distance
+    self.watermark = watermark
+    self.hashed_features = (None if hashed_features is None else
+                            [int(feature) for feature in hashed_features])
+
+  def select_hashed_features(self, matrix):
+    """Keeps the columns of the features of the centroids of a matrix of hashed features.
+
+    Args:
+      matrix: sparse matrix of shape (n_documents, n_hashed_features)
+
+    Returns:
+      sparse matrix of shape (n_documents, n_features) over the features of the centroids
+    """
+    if self.hashed_features is None:
+      return matrix
+    return matrix[:, self.hashed_features]
+
+  def save(self, path):
+    """Saves the artifact, overwriting any artifact already at path.
+
+    Args:
+      path: str directory of the artifact, created if needed
+    """
+    os.makedirs(path, exist_ok=True)
+    np.savez_compressed(os.path.join(path, self.CENTROIDS_FILE_NAME),
+                        centroids=self.centroids)
+    metadata = {
+        'format_version': self.FORMAT_VERSION,
+        'vocabulary': self.vocabulary,
+        'cluster_ids': self.cluster_ids,
+        'config': text_format.MessageToString(self.config),
+        'cluster_sizes': self.cluster_sizes,
+        'mean_distance': self.mean_distance,
+        'watermark': self.watermark,
+        'hashed_features': self.hashed_features,
+    }
+    with open(os.path.join(path, self.METADATA_FILE_NAME), 'w') as metadata_file:
+      json.dump(metadata, metadata_file)
+
+  @classmethod
+  def exists(cls, path):
+    """Returns whether an artifact was saved at path."""
+    return bool(path) and os.path.exists(
+        os.path.join(path, cls.METADATA_FILE_NAME))
+
+  @classmethod
+  def load(cls, path):
+    """Loads an artifact saved by save.
+
+    Args:
+      path: str directory of the artifact
+
+    Returns:
+      ModelArtifact stored at path
+
+    Raises:
+      ValueError: if the artifact was saved in an unsupported format version
+    """
+    with open(os.path.join(path, cls.METADATA_FILE_NAME)) as metadata_file:
+      metadata = json.load(metadata_file)
+    if metadata.get('format_version') != cls.FORMAT_VERSION:
+      raise ValueError('Unsupported model artifact format version {}'.format(
+          metadata.get('format_version')))
+    with np.load(os.path.join(path, cls.CENTROIDS_FILE_NAME),
+                 allow_pickle=False) as arrays:
+      centroids = arrays['centroids']
+    config = text_format.Parse(metadata['config'], config_pb2.Config())
+    return cls(metadata['vocabulary'], centroids, metadata['cluster_ids'],
+               config, metadata.get('cluster_sizes'),
+               metadata.get('mean_distance'), metadata.get('watermark'),
+               metadata.get('hashed_features'))
@@ -0,0 +1,94 @@
+"""Unittest module for the ModelArtifact."""
+import json
+import os
+import tempfile
+import unittest
+
+from model_artifact import ModelArtifact
+import numpy as np
+import proto.config_pb2 as config_pb2
+import scipy.sparse
+
+
+class ModelArtifactTest(unittest.TestCase):
+  """Unittest class for ModelArtifact."""
+
+  def setUp(self):
+    """Set up of a small artifact and a temporary directory to save it to."""
+    config = config_pb2.Config()
+    config.informative_column.append('exception')
+    config.clusterer.output_column_name = 'clusterer_output'
+    self.artifact = ModelArtifact(['a', 'b', 'c'],
+                                  np.arange(6).reshape(2, 3), ['0', '1'],
+                                  config)
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, 'artifact')
+    super(ModelArtifactTest, self).setUp()
+
+  def tearDown(self):
+    self.directory.cleanup()
+    super(ModelArtifactTest, self).tearDown()
+
+  def test_save_load(self):
+    """Tests that a saved artifact loads back identical."""
+    self.artifact.save(self.path)
+    loaded_artifact = ModelArtifact.load(self.path)
+    self.assertEqual(loaded_artifact.vocabulary, self.artifact.vocabulary)
+    np.testing.assert_array_equal(loaded_artifact.centroids,
+                                  self.artifact.centroids)
+    self.assertEqual(loaded_artifact.cluster_ids, self.artifact.cluster_ids)
+    self.assertEqual(loaded_artifact.config, self.artifact.config)
+    self.assertEqual(loaded_artifact.cluster_sizes, [0, 0])
+    self.assertIsNone(loaded_artifact.watermark)
+    self.assertIsNone(loaded_artifact.hashed_features)
+
+  def test_save_load_incremental_state(self):
+    """Tests that the state of incremental runs survives a save."""
+    self.assertFalse(ModelArtifact.exists(self.path))
+    ModelArtifact(self.artifact.vocabulary, self.artifact.centroids,
+                  self.artifact.cluster_ids, self.artifact.config, [3, 4], 0.25,
+                  '2020-07-03T00:00:00').save(self.path)
+    self.assertTrue(ModelArtifact.exists(self.path))
+    loaded_artifact = ModelArtifact.load(self.path)
+    self.assertEqual(loaded_artifact.cluster_sizes, [3, 4])
+    self.assertEqual(loaded_artifact.mean_distance, 0.25)
+    self.assertEqual(loaded_artifact.watermark, '2020-07-03T00:00:00')
+
+  def test_hashed_features(self):
+    """Tests that only the hashed features of the centroids are kept and selected."""
+    artifact = ModelArtifact(self.artifact.vocabulary, self.artifact.centroids,
+                             self.artifact.cluster_ids, self.artifact.config,
+                             hashed_features=np.array([1, 4, 6]))
+    artifact.save(self.path)
+    loaded_artifact = ModelArtifact.load(self.path)
+    self.assertEqual(loaded_artifact.hashed_features, [1, 4, 6])
+    matrix = scipy.sparse.csr_matrix(np.arange(16).reshape(2, 8))
+    np.testing.assert_array_equal(
+        loaded_artifact.select_hashed_features(matrix).toarray(),
+        [[1, 4, 6], [9, 12, 14]])
+    self.assertIs(self.artifact.select_hashed_features(matrix), matrix)
+
+  def test_format_version(self):
+    """Tests that artifacts of an unknown format version are refused."""
+    self.artifact.save(self.path)
+    metadata_path = os.path.join(self.path, ModelArtifact.METADATA_FILE_NAME)
+    with open(metadata_path) as metadata_file:
+      metadata = json.load(metadata_file)
+    metadata['format_version'] = ModelArtifact.FORMAT_VERSION + 1
+    with open(metadata_path, 'w') as metadata_file:
+      json.dump(metadata, metadata_file)
+    with self.assertRaises(ValueError):
+      ModelArtifact.load(self.path)
+
+  def test_shape_mismatch(self):
+    """Tests that centroids must match the vocabulary and cluster ids."""
+    with self.assertRaises(ValueError):
+      ModelArtifact(['a', 'b'], np.zeros((2, 3)), ['0', '1'],
+                    config_pb2.Config())
+    with self.assertRaises(ValueError):
+      ModelArtifact(['a', 'b', 'c'], np.zeros((2, 3)), ['0', '1'],
+                    config_pb2.Config(), hashed_features=[1, 2])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,122 @@
+"""Module for the parsed representation of a stack trace shared by the pipeline stages."""
+import collections
+import re
+
+# A single java stack trace class line, i.e.
+# '\tat com.google.Foo.bar(Foo.java:12)' has name 'com.google.Foo.bar',
+# class_name 'com.google.Foo' and method_name 'bar'
+StackFrame = collections.namedtuple(
+    'StackFrame', ['line_index', 'name', 'class_name', 'method_name'])
+
+
+class ParsedTrace:
+  """A stack trace split into lines and scanned for java class lines exactly once.
+
+  The Preprocessor builds one ParsedTrace per row, which the Tokenizer modes and the
+  Summarizer then consume instead of splitting and regex scanning the raw text again.
+
+  Attributes:
+    lines: List[str] lines of the trace
+    text: str the lines joined with new lines
+    human_readable_lines: List[str] lines that are not java class lines
+    stack_frames: List[StackFrame] the java class lines of the trace in order
+    cause_boundaries: List[int] indices of the lines starting a nested
+      'Caused by:' or 'Suppressed:' block
+  """
+  _JAVA_CLASS_LINE_PREFIX = re.compile(r'\s+at')
+  _CAUSE_BOUNDARY_PREFIX = re.compile(r'\s*(Caused by|Suppressed):')
+
+  def __init__(self, lines):
+    """Parses the given lines of a stack trace.
+
+    Args:
+      lines: List[str] lines of the trace, none containing a line break
+    """
+    self.lines = lines
+    self.text = '\n'.join(lines)
+    self.human_readable_lines = []
+    self.stack_frames = []
+    self.cause_boundaries = []
+    # lowercase copy of this trace, derived on its first use by lowercased
+    self._lowercased = None
+    for line_index, line in enumerate(lines):
+      prefix_search = self._JAVA_CLASS_LINE_PREFIX.search(line)
+      if prefix_search:
+        # we only care about the "class" or anything after the
+        # \tat and before line number
+        end = line.find('(')
+        if end == -1:
+          end = len(line)
+        name = line[prefix_search.end() + 1:end]
+        class_name, _, method_name = name.rpartition('.')
+        self.stack_frames.append(
+            StackFrame(line_index, name, class_name, method_name))
+      else:
+        self.human_readable_lines.append(line)
+      if self._CAUSE_BOUNDARY_PREFIX.match(line):
+        self.cause_boundaries.append(line_index)
+
+  @classmethod
+  def from_text(cls, text):
+    """Parses a raw stack trace.
+
+    Args:
+      text: stack trace to parse, non string values are converted with str
+
+    Returns:
+      ParsedTrace of the text, whose text attribute is the text exactly as given
+    """
+    text = str(text)
+    parsed_trace = cls(text.splitlines())
+    parsed_trace.text = text
+    return parsed_trace
+
+  @classmethod
+  def of(cls, trace):
+    """Returns trace as a ParsedTrace, parsing it only if it is not one already.
+
+    Args:
+      trace: ParsedTrace or raw stack trace
+
+    Returns:
+      ParsedTrace of the trace
+    """
+    if isinstance(trace, cls):
+      return trace
+    return cls.from_text(trace)
+
+  def lowercased(self):
+    """Returns this trace lowercased, derived from this parse rather than parsing again.
+
+    Lines are classified by the case they were parsed with, so only the text, the lines
+    and the frame names are lowercased.
+
+    Returns:
+      ParsedTrace of the lowercased lines, this trace itself if it is already lowercase
+    """
+    if self._lowercased is None:
+      lowercase_text = self.text.lower()
+      if lowercase_text == self.text:
+        self._lowercased = self
+      else:
+        lowercased = ParsedTrace.__new__(ParsedTrace)
+        lowercased.lines = [line.lower() for line in self.lines]
+        lowercased.text = lowercase_text
+        lowercased.human_readable_lines = [
+            line.lower() for line in self.human_readable_lines
+        ]
+        lowercased.stack_frames = [
+            StackFrame(frame.line_index, frame.name.lower(),
+                       frame.class_name.lower(), frame.method_name.lower())
+            for frame in self.stack_frames
+        ]
+        lowercased.cause_boundaries = self.cause_boundaries
+        lowercased._lowercased = lowercased
+        self._lowercased = lowercased
+    return self._lowercased
+
+  def __str__(self):
+    return self.text
+
+  def __repr__(self):
+    return 'ParsedTrace({!r})'.format(self.text)
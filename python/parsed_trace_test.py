@@ -0,0 +1,71 @@
+"""Unittest module for ParsedTrace."""
+import unittest
+
+from parsed_trace import ParsedTrace
+
+
+class ParsedTraceTest(unittest.TestCase):
+  """Unit test case suite for our ParsedTrace class."""
+
+  def setUp(self):
+    """General setup of the sample stack traces."""
+    self.sample_stack_trace = open(
+        'testdata/tokenizer/sample_stack_trace.txt').read()
+    self.cause_trace = '\n'.join([
+        'java.lang.IllegalStateException: outer failure',
+        '\tat com.google.Outer.run(Outer.java:10)',
+        'Caused by: java.io.IOException: inner failure',
+        '\tat com.google.Inner.read(Inner.java:20)',
+        '\tSuppressed: java.lang.Exception: suppressed failure',
+    ])
+    super(ParsedTraceTest, self).setUp()
+
+  def test_stack_frames(self):
+    """Tests that class lines are split into class and method names."""
+    parsed_trace = ParsedTrace.from_text(self.sample_stack_trace)
+    self.assertEqual(len(parsed_trace.stack_frames), 7)
+    frame = parsed_trace.stack_frames[1]
+    self.assertEqual(frame.line_index, 2)
+    self.assertEqual(frame.name, 'java.util.Optional.orElseThrow')
+    self.assertEqual(frame.class_name, 'java.util.Optional')
+    self.assertEqual(frame.method_name, 'orElseThrow')
+    self.assertEqual(len(parsed_trace.human_readable_lines), 1)
+    self.assertEqual(parsed_trace.lines, self.sample_stack_trace.splitlines())
+    self.assertEqual(parsed_trace.text, self.sample_stack_trace)
+
+  def test_cause_boundaries(self):
+    """Tests that nested cause and suppressed blocks are found."""
+    parsed_trace = ParsedTrace.from_text(self.cause_trace)
+    self.assertEqual(parsed_trace.cause_boundaries, [2, 4])
+    self.assertEqual(
+        [frame.method_name for frame in parsed_trace.stack_frames],
+        ['run', 'read'])
+
+  def test_lowercased(self):
+    """Tests that a trace is lowercased without changing its parse."""
+    parsed_trace = ParsedTrace.from_text(self.cause_trace)
+    lowercased = parsed_trace.lowercased()
+    self.assertEqual(lowercased.text, self.cause_trace.lower())
+    self.assertEqual(lowercased.lines, self.cause_trace.lower().splitlines())
+    self.assertEqual([frame.name for frame in lowercased.stack_frames],
+                     ['com.google.outer.run', 'com.google.inner.read'])
+    self.assertEqual(
+        [frame.line_index for frame in lowercased.stack_frames],
+        [frame.line_index for frame in parsed_trace.stack_frames])
+    self.assertEqual(lowercased.cause_boundaries, parsed_trace.cause_boundaries)
+    # the lowercase copy is derived once, and is its own lowercase copy
+    self.assertIs(parsed_trace.lowercased(), lowercased)
+    self.assertIs(lowercased.lowercased(), lowercased)
+    # the original case is kept for the Summarizer
+    self.assertEqual(parsed_trace.text, self.cause_trace)
+
+  def test_of(self):
+    """Tests that ParsedTrace.of only parses raw input."""
+    parsed_trace = ParsedTrace.from_text(self.cause_trace)
+    self.assertIs(ParsedTrace.of(parsed_trace), parsed_trace)
+    self.assertEqual(ParsedTrace.of(None).lines, ['None'])
+    self.assertEqual(ParsedTrace.of('').lines, [])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,247 @@
+"""Module for preprocessing and tokenizing chunks of rows concurrently in a process pool."""
+import concurrent.futures
+import os
+
+import numpy as np
+from preprocessor import merge_line_cache_stats
+from preprocessor import Preprocessor
+import scipy.sparse
+from token_hasher import token_hasher_of
+from tokenizer import Tokenizer
+
+# State of an executor worker process, set once by _initialize_worker
+_WORKER_STATE = {}
+
+# internal column name of the Preprocessor run by the workers
+_INTERNAL_COLUMN_NAME = '_internal_preprocessor_output_col_'
+
+
+def _texts_of(documents):
+  """Returns the texts of documents, which are cheaper to send to the workers than traces."""
+  return [str(document) for document in documents]
+
+
+def _initialize_worker(config):
+  """Builds the tokenizer of a worker process once for all its chunks."""
+  tokenizer = Tokenizer(config)
+  _WORKER_STATE.update(config=config,
+                       tokenization_method=tokenizer.tokenization_method(
+                           config.clusterer.tokenizer.mode))
+
+
+def _preprocess_chunk(chunk):
+  """Preprocesses a chunk of rows in a worker process.
+
+  Only the texts are sent back, the parent parses the few traces it needs again.
+
+  Args:
+    chunk: pandas dataframe of the informative columns of consecutive rows
+
+  Returns:
+    tuple of (texts, pid, line_cache_stats) List[str] preprocessed text of every row of
+      the chunk, int process id of the worker and dict LineCache.stats of the worker so
+      far, None if the line cache is disabled
+  """
+  chunk = chunk.copy()
+  preprocessor = Preprocessor(chunk, _WORKER_STATE['config'],
+                              _INTERNAL_COLUMN_NAME)
+  preprocessor.process_dataframe()
+  return (list(chunk[_INTERNAL_COLUMN_NAME]), os.getpid(),
+          preprocessor.line_cache_stats())
+
+
+def _count_chunk(documents):
+  """Tokenizes a chunk of documents and counts their tokens in a worker process.
+
+  Args:
+    documents: List[str] consecutive documents
+
+  Returns:
+    tuple of (matrix, vocabulary) of build_term_freq_matrix over the chunk, so every
+      distinct token of the chunk crosses process boundaries once
+  """
+  tokenization_method = _WORKER_STATE['tokenization_method']
+  return build_term_freq_matrix(
+      tokenization_method(document) for document in documents)
+
+
+def _hash_chunk(documents):
+  """Tokenizes and hashes a chunk of documents in a worker process.
+
+  Args:
+    documents: List[str] consecutive documents
+
+  Returns:
+    tuple of (matrix, token_hasher) sparse matrix of the hashed token counts of every
+      document of the chunk and TokenHasher of the features seen in the chunk
+  """
+  token_hasher = token_hasher_of(_WORKER_STATE['config'])
+  matrix = token_hasher.transform(documents,
+                                  _WORKER_STATE['tokenization_method'])
+  return matrix, token_hasher
+
+
+def build_term_freq_matrix(token_lists):
+  """Builds the term frequency matrix of tokenized documents.
+
+  The features are the sorted tokens, like the features of a CountVectorizer, so the matrix
+  is the one CountVectorizer(analyzer=tokenizer).fit_transform would build.
+
+  Args:
+    token_lists: iterable of the List[str] tokens of every document
+
+  Returns:
+    tuple of (matrix, vocabulary) sparse matrix of shape (n_documents, n_features) of the
+      token counts and List[str] token of every feature
+  """
+  token_ids = {}
+  indices, indptr = [], [0]
+  for tokens in token_lists:
+    for token in tokens:
+      indices.append(token_ids.setdefault(token, len(token_ids)))
+    indptr.append(len(indices))
+  vocabulary = sorted(token_ids)
+  # map the ids in order of appearance to the sorted feature order
+  feature_of_id = np.empty(len(token_ids), dtype=np.int64)
+  feature_of_id[[token_ids[token] for token in vocabulary]] = np.arange(
+      len(vocabulary))
+  matrix = scipy.sparse.csr_matrix(
+      (np.ones(len(indices), dtype=np.int64),
+       feature_of_id[np.array(indices, dtype=np.int64)], np.array(indptr)),
+      shape=(len(indptr) - 1, len(vocabulary)))
+  # repeated tokens of a document are summed into their count
+  matrix.sum_duplicates()
+  return matrix, vocabulary
+
+
+def merge_term_freq_matrices(chunk_results):
+  """Stacks the term frequency matrices of consecutive chunks over their merged vocabulary.
+
+  Args:
+    chunk_results: List of the (matrix, vocabulary) of build_term_freq_matrix of every
+      chunk in order
+
+  Returns:
+    tuple of (matrix, vocabulary) equal to build_term_freq_matrix over the documents of
+      every chunk
+  """
+  vocabulary = sorted(
+      set().union(*[chunk_vocabulary for _, chunk_vocabulary in chunk_results]))
+  feature_of_token = {token: feature for feature, token in enumerate(vocabulary)}
+  matrices = []
+  for chunk_matrix, chunk_vocabulary in chunk_results:
+    features = np.array(
+        [feature_of_token[token] for token in chunk_vocabulary], dtype=np.int64)
+    matrices.append(
+        scipy.sparse.csr_matrix(
+            (chunk_matrix.data, features[chunk_matrix.indices],
+             chunk_matrix.indptr),
+            shape=(chunk_matrix.shape[0], len(vocabulary))))
+  if not matrices:
+    return scipy.sparse.csr_matrix((0, 0), dtype=np.int64), vocabulary
+  matrix = scipy.sparse.vstack(matrices, format='csr')
+  matrix.sort_indices()
+  return matrix, vocabulary
+
+
+class PartitionedExecutor:
+  """Class splitting rows into chunks preprocessed or vectorized by a process pool.
+
+  Every worker builds its Tokenizer once, then processes whole chunks so only the texts of
+  the chunk and its results cross process boundaries: the preprocessed texts of its rows,
+  or the counts of its tokens. Results are returned in the original row order.
+  """
+
+  def __init__(self, config):
+    """Initializes the executor settings.
+
+    Args:
+      config: config_pb2 proto specified by the configuration file, its execution
+        processes and chunk_size size the pool and the chunks
+    """
+    self.config = config
+    self.processes = config.execution.processes
+    self.chunk_size = config.execution.chunk_size or 10000
+    # LineCache.stats of the workers of the last preprocess, merged
+    self.line_cache_stats = None
+
+  def map_chunks(self, function, items):
+    """Runs function on the consecutive chunks of items in the process pool.
+
+    Args:
+      function: module level function of a chunk run by the workers
+
+      items: sliceable sequence, i.e. a dataframe or a list
+
+    Returns:
+      List of the results of every chunk in order
+    """
+    chunks = [
+        items[start:start + self.chunk_size]
+        for start in range(0, len(items), self.chunk_size)
+    ]
+    if not chunks:
+      return []
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=min(self.processes, len(chunks)),
+        initializer=_initialize_worker,
+        initargs=(self.config,)) as executor:
+      return list(executor.map(function, chunks))
+
+  def preprocess(self, df):
+    """Preprocesses every row, merging the line cache statistics of the workers.
+
+    Args:
+      df: pandas dataframe holding the informative columns
+
+    Returns:
+      List[str] preprocessed text of every row in order
+    """
+    texts = []
+    # the statistics of a worker are cumulative, its last chunk has the most lookups
+    worker_stats = {}
+    for chunk_texts, pid, stats in self.map_chunks(
+        _preprocess_chunk,
+        df[list(self.config.informative_column)].reset_index(drop=True)):
+      texts.extend(chunk_texts)
+      if stats is not None and (
+          pid not in worker_stats or stats['hits'] + stats['misses'] >
+          worker_stats[pid]['hits'] + worker_stats[pid]['misses']):
+        worker_stats[pid] = stats
+    self.line_cache_stats = merge_line_cache_stats(worker_stats.values())
+    return texts
+
+  def count(self, documents):
+    """Tokenizes every document and counts its tokens, every chunk on its own.
+
+    Args:
+      documents: iterable of the str or ParsedTrace of every document
+
+    Returns:
+      tuple of (matrix, vocabulary) of build_term_freq_matrix over every document in order
+    """
+    return merge_term_freq_matrices(
+        self.map_chunks(_count_chunk, _texts_of(documents)))
+
+  def hash(self, documents, token_hasher):
+    """Tokenizes and hashes every document, every chunk on its own.
+
+    Args:
+      documents: iterable of the str or ParsedTrace of every document
+
+      token_hasher: TokenHasher of the configured vectorizer, the features seen in every
+        chunk are merged into it
+
+    Returns:
+      sparse matrix of shape (n_documents, n_features) of the hashed token counts of every
+        document in order
+    """
+    matrices = []
+    for matrix, chunk_token_hasher in self.map_chunks(_hash_chunk,
+                                                      _texts_of(documents)):
+      matrices.append(matrix)
+      token_hasher.merge(chunk_token_hasher)
+    if not matrices:
+      return scipy.sparse.csr_matrix((0, token_hasher.n_features),
+                                     dtype=np.int64)
+    return scipy.sparse.vstack(matrices, format='csr')
@@ -0,0 +1,91 @@
+"""Unittest module for the PartitionedExecutor."""
+import unittest
+
+import pandas as pd
+from partitioned_executor import build_term_freq_matrix
+from partitioned_executor import merge_term_freq_matrices
+from partitioned_executor import PartitionedExecutor
+from preprocessor import Preprocessor
+import proto.config_pb2 as config_pb2
+from sklearn.feature_extraction.text import CountVectorizer
+from tokenizer import Tokenizer
+
+
+class PartitionedExecutorTest(unittest.TestCase):
+  """Unittest class for PartitionedExecutor."""
+
+  def setUp(self):
+    """Set up of a config running two processes on chunks of two rows."""
+    self.config = config_pb2.Config()
+    self.config.informative_column.extend(
+        ["exception", "remoteException", "errorMessage"])
+    self.config.clusterer.tokenizer.token_min_length = 2
+    self.config.clusterer.tokenizer.mode = config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE
+    self.config.execution.processes = 2
+    self.config.execution.chunk_size = 2
+    self.dataframe = pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                                  orient='columns')
+    self.tokenization_method = Tokenizer(self.config).tokenization_method(
+        self.config.clusterer.tokenizer.mode)
+    super(PartitionedExecutorTest, self).setUp()
+
+  def test_preprocess_and_count(self):
+    """Tests that chunks processed in the pool match the serial processing in order."""
+    expected_df = self.dataframe.copy()
+    Preprocessor(expected_df, self.config, 'text', 'parsed').process_dataframe()
+    executor = PartitionedExecutor(self.config)
+    self.assertEqual(executor.preprocess(self.dataframe),
+                     list(expected_df['text']))
+
+    matrix, vocabulary = executor.count(expected_df['parsed'])
+    expected_matrix, expected_vocabulary = build_term_freq_matrix(
+        self.tokenization_method(parsed_trace)
+        for parsed_trace in expected_df['parsed'])
+    self.assertEqual(vocabulary, expected_vocabulary)
+    self.assertEqual((matrix != expected_matrix).nnz, 0)
+
+  def test_line_cache_stats(self):
+    """Tests that the line cache statistics of the workers are merged."""
+    self.config.clusterer.tokenizer.preprocessor.line_cache_max_bytes = 1 << 20
+    executor = PartitionedExecutor(self.config)
+    executor.preprocess(pd.concat([self.dataframe] * 2, ignore_index=True))
+    stats = executor.line_cache_stats
+    self.assertGreater(stats['hits'] + stats['misses'], 0)
+    self.assertAlmostEqual(stats['hit_rate'],
+                           stats['hits'] / (stats['hits'] + stats['misses']))
+
+  def test_empty(self):
+    """Tests that an empty dataframe has no chunks."""
+    executor = PartitionedExecutor(self.config)
+    self.assertEqual(executor.preprocess(self.dataframe.iloc[:0]), [])
+    self.assertIsNone(executor.line_cache_stats)
+    matrix, vocabulary = executor.count([])
+    self.assertEqual(matrix.shape[0], 0)
+    self.assertEqual(vocabulary, [])
+
+  def test_merge_term_freq_matrices(self):
+    """Tests that chunk matrices merge into the matrix of all their documents."""
+    token_lists = [['b', 'a', 'b'], [], ['c', 'a'], ['d', 'b']]
+    matrix, vocabulary = merge_term_freq_matrices([
+        build_term_freq_matrix(token_lists[:2]),
+        build_term_freq_matrix(token_lists[2:])
+    ])
+    expected_matrix, expected_vocabulary = build_term_freq_matrix(token_lists)
+    self.assertEqual(vocabulary, expected_vocabulary)
+    self.assertEqual((matrix != expected_matrix).nnz, 0)
+
+  def test_build_term_freq_matrix(self):
+    """Tests that the matrix is the one CountVectorizer builds."""
+    token_lists = [['b', 'a', 'b'], [], ['c', 'a']]
+    matrix, vocabulary = build_term_freq_matrix(token_lists)
+    vectorizer = CountVectorizer(analyzer=lambda tokens: tokens)
+    expected_matrix = vectorizer.fit_transform(token_lists)
+    self.assertEqual(vocabulary, ['a', 'b', 'c'])
+    self.assertEqual(vocabulary,
+                     sorted(vectorizer.vocabulary_,
+                            key=vectorizer.vocabulary_.get))
+    self.assertEqual((matrix != expected_matrix).nnz, 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,163 @@
+"""Module for timing and memory instrumentation of the classification pipeline stages."""
+import contextlib
+import cProfile
+import json
+import resource
+import sys
+import time
+import tracemalloc
+
+
+def peak_rss_bytes(who=resource.RUSAGE_SELF):
+  """Returns the peak resident set size of the process so far in bytes.
+
+  Args:
+    who: resource.RUSAGE_SELF, or resource.RUSAGE_CHILDREN for the largest of the
+      terminated child processes, i.e. pool workers
+  """
+  peak_rss = resource.getrusage(who).ru_maxrss
+  # bytes on macOS, kilobytes everywhere else
+  return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+class PipelineMetrics:
+  """Recorder of the wall and CPU time, throughput and memory of every pipeline stage.
+
+  Stages are timed with the stage context manager. If trace_memory is set, tracemalloc
+  traces the Python allocations of every stage, which slows the run down noticeably, so it
+  is off by default. The peak RSS is always reported since it is free to read. If
+  profile_path is set, the whole run is profiled with cProfile and the stats dumped there.
+  """
+
+  def __init__(self, trace_memory=False, profile_path=None):
+    """Initializes an empty report.
+
+    Args:
+      trace_memory: bool whether to trace the allocations of every stage with tracemalloc
+
+      profile_path: optional str path the cProfile stats of the run are dumped to
+    """
+    self.trace_memory = trace_memory
+    self.profile_path = profile_path
+    self.profiler = None
+    # List[dict] metrics of every finished stage in order
+    self.stages = []
+    # List[dict] fit and score times of every k of the sweep
+    self.k_sweep = []
+    # Dict[str, dict] hit and miss statistics of every cache of the run by name
+    self.caches = {}
+    # dict number of features of the clustered errors, and their collisions when hashed
+    self.vectorizer = None
+
+  def start(self):
+    """Starts the memory tracing and profiling of the run, if configured."""
+    if self.trace_memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+    if self.profile_path:
+      self.profiler = cProfile.Profile()
+      self.profiler.enable()
+
+  def stop(self):
+    """Stops the memory tracing and dumps the profile of the run, if configured."""
+    if self.profiler is not None:
+      self.profiler.disable()
+      self.profiler.dump_stats(self.profile_path)
+      self.profiler = None
+    if self.trace_memory and tracemalloc.is_tracing():
+      tracemalloc.stop()
+
+  @contextlib.contextmanager
+  def stage(self, name, rows):
+    """Times the stage run inside the context.
+
+    Args:
+      name: str name of the stage in the report
+
+      rows: int number of rows processed by the stage, for the throughput
+
+    Yields:
+      dict metrics of the stage, whose 'rows' can be set inside the context when the number
+        of rows is only known once the stage ran
+    """
+    metrics = {'stage': name, 'rows': rows}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+      if hasattr(tracemalloc, 'reset_peak'):
+        # before Python 3.9 the peak is the peak since tracing started
+        tracemalloc.reset_peak()
+      start_traced, _ = tracemalloc.get_traced_memory()
+    start_peak_rss = peak_rss_bytes()
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    yield metrics
+    wall_seconds = time.perf_counter() - start
+    peak_rss = peak_rss_bytes()
+    metrics.update({
+        'wall_seconds': wall_seconds,
+        'cpu_seconds': time.process_time() - start_cpu,
+        'rows_per_second':
+            metrics['rows'] / wall_seconds if wall_seconds > 0 else 0.0,
+        'peak_rss_bytes': peak_rss,
+        'peak_rss_delta_bytes': peak_rss - start_peak_rss,
+    })
+    if tracing:
+      traced, traced_peak = tracemalloc.get_traced_memory()
+      metrics['traced_delta_bytes'] = traced - start_traced
+      metrics['traced_peak_delta_bytes'] = traced_peak - start_traced
+    self.stages.append(metrics)
+
+  def record_k_sweep(self, sweep_results):
+    """Records the fit and score times of every k of a sweep.
+
+    Args:
+      sweep_results: List[KResult] of the sweep of the KMeansClusterer
+    """
+    self.k_sweep = [{
+        'k': result.k,
+        'fit_seconds': result.fit_seconds,
+        'score_seconds': result.score_seconds,
+    } for result in sweep_results]
+
+  def record_cache(self, name, stats):
+    """Records the statistics of a cache of the run.
+
+    Args:
+      name: str name of the cache in the report
+
+      stats: dict statistics of the cache, i.e. LineCache.stats, nothing is recorded if None
+    """
+    if stats is not None:
+      self.caches[name] = stats
+
+  def record_vectorizer(self, stats):
+    """Records the features of the vectorized errors.
+
+    Args:
+      stats: dict vectorizer_stats of the KMeansClusterer, i.e. the n_features and the
+        collision_rate of hashed features
+    """
+    self.vectorizer = stats
+
+  def report(self):
+    """Returns the metrics report.
+
+    Returns:
+      dict of the 'stages' metrics in order, the per k 'k_sweep' times, the statistics of
+        the 'caches', the 'vectorizer' features and the 'total' wall and CPU seconds of the
+        stages
+    """
+    return {
+        'stages': self.stages,
+        'k_sweep': self.k_sweep,
+        'caches': self.caches,
+        'vectorizer': self.vectorizer,
+        'total': {
+            'wall_seconds': sum(stage['wall_seconds'] for stage in self.stages),
+            'cpu_seconds': sum(stage['cpu_seconds'] for stage in self.stages),
+        },
+    }
+
+  def write(self, path):
+    """Writes the metrics report to path as JSON."""
+    with open(path, 'w') as report_file:
+      json.dump(self.report(), report_file, indent=2)
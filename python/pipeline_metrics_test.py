@@ -0,0 +1,80 @@
+"""Unittest module for the PipelineMetrics."""
+import collections
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from pipeline_metrics import PipelineMetrics
+
+# Stand-in of the KResult of a sweep
+FakeKResult = collections.namedtuple('FakeKResult',
+                                     ['k', 'fit_seconds', 'score_seconds'])
+
+
+class PipelineMetricsTest(unittest.TestCase):
+  """Unittest class for PipelineMetrics."""
+
+  def setUp(self):
+    """Set up of a temporary directory for the report and profile."""
+    self.directory = tempfile.TemporaryDirectory()
+    super(PipelineMetricsTest, self).setUp()
+
+  def tearDown(self):
+    self.directory.cleanup()
+    super(PipelineMetricsTest, self).tearDown()
+
+  def test_stages(self):
+    """Tests that every stage is reported in order with its throughput."""
+    metrics = PipelineMetrics()
+    with metrics.stage('first', 10):
+      sum(range(10000))
+    with metrics.stage('second', 0) as stage:
+      stage['rows'] = 5
+    metrics.record_k_sweep([FakeKResult(2, 0.5, 0.25)])
+    metrics.record_cache('lines', {'hits': 3, 'misses': 1})
+    metrics.record_cache('disabled', None)
+    metrics.record_vectorizer({'n_features': 8, 'collision_rate': 0.25})
+    report = metrics.report()
+    self.assertEqual([stage['stage'] for stage in report['stages']],
+                     ['first', 'second'])
+    self.assertEqual(report['stages'][1]['rows'], 5)
+    for stage in report['stages']:
+      self.assertGreaterEqual(stage['wall_seconds'], 0)
+      self.assertGreaterEqual(stage['cpu_seconds'], 0)
+      self.assertGreater(stage['peak_rss_bytes'], 0)
+      self.assertNotIn('traced_delta_bytes', stage)
+    self.assertEqual(report['k_sweep'], [{
+        'k': 2,
+        'fit_seconds': 0.5,
+        'score_seconds': 0.25
+    }])
+    self.assertEqual(report['caches'], {'lines': {'hits': 3, 'misses': 1}})
+    self.assertEqual(report['vectorizer'], {
+        'n_features': 8,
+        'collision_rate': 0.25
+    })
+
+  def test_trace_memory_and_profile(self):
+    """Tests the tracemalloc deltas, the JSON report and the cProfile dump."""
+    profile_path = os.path.join(self.directory.name, 'run.prof')
+    metrics = PipelineMetrics(trace_memory=True, profile_path=profile_path)
+    metrics.start()
+    with metrics.stage('allocate', 1):
+      block = [0] * 100000
+    metrics.stop()
+    del block
+    self.assertGreater(metrics.stages[0]['traced_delta_bytes'], 100000)
+    self.assertGreaterEqual(metrics.stages[0]['traced_peak_delta_bytes'],
+                            metrics.stages[0]['traced_delta_bytes'])
+    self.assertGreater(pstats.Stats(profile_path).total_calls, 0)
+
+    report_path = os.path.join(self.directory.name, 'metrics.json')
+    metrics.write(report_path)
+    with open(report_path) as report_file:
+      self.assertEqual(json.load(report_file), metrics.report())
+
+
+if __name__ == "__main__":
+  unittest.main()
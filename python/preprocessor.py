@@ -1,15 +1,157 @@
 """Module for general preprocessing of the available data before further Clustering."""
+import collections
 import collections.abc
-import re
+import sys
+
+from column_flattener import flatten_informative_columns
+from compiled_config import CompiledConfig
+import pandas as pd
+from parsed_trace import ParsedTrace
+
+# line caches of this process by config fingerprint, shared by every Preprocessor of a config
+_LINE_CACHES = {}
+
+
+class LineCache:
+  """Bounded least recently used cache of the keep or drop decision of every line.
+
+  Traces share most of their lines, i.e. the same stack frames appear in millions of rows,
+  so every distinct line only goes through the line regexes once. Entries map a line to
+  whether it is kept, and are evicted in least recently used order once their estimated
+  size exceeds max_bytes. The word regexes still run over the kept lines of every row
+  joined together, since they may match across lines.
+  """
+  # rough per entry overhead of the ordered dict bookkeeping
+  _ENTRY_OVERHEAD_BYTES = 100
+
+  def __init__(self, max_bytes):
+    """Initializes an empty cache.
+
+    Args:
+      max_bytes: int estimated memory cap of the cached lines
+    """
+    self.max_bytes = max_bytes
+    self.entries = collections.OrderedDict()
+    self.current_bytes = 0
+    self.hits = 0
+    self.misses = 0
+
+  def lookup(self, line, keeps_line):
+    """Returns whether a line is kept, deciding and caching it if it is not cached.
+
+    Args:
+      line: str line of a trace
+
+      keeps_line: function mapping a line to whether it is kept
+
+    Returns:
+      bool whether line is kept
+    """
+    kept = self.entries.get(line)
+    if kept is not None:
+      self.hits += 1
+      self.entries.move_to_end(line)
+      return kept
+    self.misses += 1
+    kept = keeps_line(line)
+    self.put(line, kept)
+    return kept
+
+  def put(self, line, kept):
+    """Stores the decision of a line, evicting the least recently used entries if needed.
+
+    Args:
+      line: str line of a trace
+
+      kept: bool whether line is kept
+    """
+    size = self.entry_size(line)
+    # a single entry larger than the whole cache is never stored
+    if size > self.max_bytes or line in self.entries:
+      return
+    self.entries[line] = kept
+    self.current_bytes += size
+    while self.current_bytes > self.max_bytes:
+      evicted_line, _ = self.entries.popitem(last=False)
+      self.current_bytes -= self.entry_size(evicted_line)
+
+  def entry_size(self, line):
+    """Estimates the memory held by one cache entry.
+
+    Args:
+      line: str cached line
+
+    Returns:
+      int estimated size in bytes
+    """
+    return self._ENTRY_OVERHEAD_BYTES + sys.getsizeof(line)
+
+  def stats(self):
+    """Returns the hit and miss counters and the memory use of the cache.
+
+    Returns:
+      dict of hits, misses, hit_rate, entries, bytes and max_bytes
+    """
+    lookups = self.hits + self.misses
+    return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'hit_rate': self.hits / lookups if lookups else 0.0,
+        'entries': len(self.entries),
+        'bytes': self.current_bytes,
+        'max_bytes': self.max_bytes,
+    }
+
+
+def merge_line_cache_stats(stats_list):
+  """Sums the statistics of the line caches of several processes.
+
+  Args:
+    stats_list: iterable of the LineCache.stats of every process
+
+  Returns:
+    dict of the summed hits, misses, entries, bytes and max_bytes and the overall
+      hit_rate, None if stats_list is empty
+  """
+  stats_list = list(stats_list)
+  if not stats_list:
+    return None
+  merged = {
+      key: sum(stats[key] for stats in stats_list)
+      for key in ('hits', 'misses', 'entries', 'bytes', 'max_bytes')
+  }
+  lookups = merged['hits'] + merged['misses']
+  merged['hit_rate'] = merged['hits'] / lookups if lookups else 0.0
+  return merged
+
+
+def line_cache_of(config):
+  """Returns the line cache shared by the Preprocessors of a config.
+
+  Args:
+    config: config_pb2 proto specified by the configuration file or its CompiledConfig
+
+  Returns:
+    LineCache of the config in this process, None if line_cache_max_bytes disables it
+  """
+  compiled_config = CompiledConfig.of(config)
+  max_bytes = (
+      compiled_config.config.clusterer.tokenizer.preprocessor.line_cache_max_bytes)
+  if max_bytes <= 0:
+    return None
+  return _LINE_CACHES.setdefault(compiled_config.fingerprint,
+                                 LineCache(max_bytes))
 
 
 class Preprocessor:
   """Class for preprocessing input data.
 
   This data will then be used in the future by tokenizer, and clusterer.
+  If line_cache_max_bytes is configured, the decisions of repeated lines are served from
+  the LineCache of the config instead of running the line regexes again.
   """
 
-  def __init__(self, df, config, output_column_name):
+  def __init__(self, df, config, output_column_name, parsed_output_column_name=None):
     """Initializes necessary information for preprocessor.
 
     Preconditions:
@@ -20,18 +162,31 @@ class Preprocessor:
         column, an errorMessage column and optionally a remoteException
         column
 
-      config: config_pb2 proto specified by the configuration file
+      config: config_pb2 proto specified by the configuration file or its CompiledConfig
 
       output_column_name: str of internal output_column_name to propagate the results of the
         Preprocessor to our Tokenizer and Classifier.
         Note, this column is used exclusively internally and should be passed in from Classifier
+
+      parsed_output_column_name: optional str of internal column name to store the
+        ParsedTrace of every row in, so later stages never parse the text again.
+        Note, this column is used exclusively internally and should be passed in from Classifier
     """
+    compiled_config = CompiledConfig.of(config)
+    config = compiled_config.config
     self.df = df
     self.informative_columns = config.informative_column
     self.ignore_regexes = config.clusterer.tokenizer.preprocessor.ignore_line_regex_matcher
     self.search_regexes = config.clusterer.tokenizer.preprocessor.search_line_regex_matcher
     self.ignore_word_regexes = config.clusterer.tokenizer.preprocessor.ignore_word_regex_matcher
+    # compiled once per config rather than on every call, i.e. every row
+    self.compiled_ignore_regexes = compiled_config.ignore_line_regexes
+    self.compiled_search_regexes = compiled_config.search_line_regexes
+    self.compiled_ignore_word_regexes = compiled_config.ignore_word_regexes
+    self.line_cache = line_cache_of(compiled_config)
     self.output_column_name = output_column_name
+    self.parsed_output_column_name = parsed_output_column_name
+    self.columnar = config.execution.columnar
 
   def filter_lines(self, input_lines):
     """Searches the input_lines for matching regular expressions.
@@ -45,8 +200,7 @@ class Preprocessor:
     Returns:
       List[str] not matching to the regular expressions as found in ignore_regexes
     """
-    regex_expressions = [re.compile(regex) for regex in self.ignore_regexes]
-    for expr in regex_expressions:
+    for expr in self.compiled_ignore_regexes:
       input_lines = [st for st in input_lines if not expr.search(st)]
     return input_lines
 
@@ -63,10 +217,7 @@ class Preprocessor:
     Returns:
       str same as input except with all occurrences of matching ignore word regex matches removed
     """
-    regex_expressions = [
-        re.compile(regex) for regex in self.ignore_word_regexes
-    ]
-    for expr in regex_expressions:
+    for expr in self.compiled_ignore_word_regexes:
       input_string = expr.sub('', input_string)
     return input_string
 
@@ -82,19 +233,68 @@ class Preprocessor:
       List[str] filtered such that each string contains all of the
         regular expression matches as found in search_regexes
     """
-    regex_expressions = [re.compile(regex) for regex in self.search_regexes]
-    for expr in regex_expressions:
+    for expr in self.compiled_search_regexes:
       input_lines = list(filter(expr.search, input_lines))
     return input_lines
 
+  def keeps_line(self, line):
+    """Decides whether a single line is kept like filter_lines and search_lines do.
+
+    Args:
+      line: str line of a trace
+
+    Returns:
+      bool False if the line matches an ignore line regex or misses a search line regex
+    """
+    for expr in self.compiled_ignore_regexes:
+      if expr.search(line):
+        return False
+    for expr in self.compiled_search_regexes:
+      if not expr.search(line):
+        return False
+    return True
+
+  def process_lines(self, input_lines):
+    """Filters the lines of a row, consulting the line cache if enabled.
+
+    Args:
+      input_lines: List[str] lines of a row
+
+    Returns:
+      ParsedTrace of the kept lines joined with new lines, with the ignore word regex
+        matches removed from the joined text
+    """
+    if self.line_cache is None:
+      kept_lines = [line for line in input_lines if self.keeps_line(line)]
+    else:
+      kept_lines = [
+          line for line in input_lines
+          if self.line_cache.lookup(line, self.keeps_line)
+      ]
+    return ParsedTrace.from_text(self.filter_words('\n'.join(kept_lines)))
+
+  def line_cache_stats(self):
+    """Returns the line cache statistics, None if the cache is disabled."""
+    if self.line_cache is None:
+      return None
+    return self.line_cache.stats()
+
   def process_dataframe(self):
     """Processes the dataframe creating a new column containing all information.
 
+    Note: every line is kept or dropped on its own by keeps_line, so repeated lines can be
+    served from the line cache, while the word regexes run over the joined kept lines.
+
     On Return:
       Creates a new column with all the available information as found in the informative
-        columns concatenated with new lines.
+        columns concatenated with new lines, and if parsed_output_column_name is set, a
+        column holding the ParsedTrace of that information.
     """
-    col = []
+    if self.columnar:
+      self.process_dataframe_columnar()
+      return
+
+    parsed_col = []
 
     for _, row in self.df.iterrows():
       messages = []
@@ -106,13 +306,61 @@ class Preprocessor:
             if isinstance(sub_message, str):
               messages.append(sub_message)
 
-      joined_line_information = '\n'.join(messages).splitlines()
-      joined_line_information = self.filter_lines(joined_line_information)
-      joined_line_information = self.search_lines(joined_line_information)
-      output_joined_string = '\n'.join(joined_line_information)
-      output_joined_string = self.filter_words(output_joined_string)
-      col.append(output_joined_string)
+      parsed_col.append(
+          self.process_lines('\n'.join(messages).splitlines()))
+
+    self.store_parsed_traces(parsed_col)
+
+  def store_parsed_traces(self, parsed_col):
+    """Stores the processed information of every row into the internal columns.
 
+    Args:
+      parsed_col: List[ParsedTrace] holding the processed information of every row
+    """
     # We store the result into a column that only the tokenizer will use
     # This column should not be outputted in the final table
-    self.df[self.output_column_name] = col
+    self.df[self.output_column_name] = [
+        parsed_trace.text for parsed_trace in parsed_col
+    ]
+    if self.parsed_output_column_name:
+      self.df[self.parsed_output_column_name] = parsed_col
+
+  def store_texts(self, texts):
+    """Stores the processed text of every row into the internal column without parsing it.
+
+    Note: the parsed output column is left unset, later stages parse the texts they need.
+
+    Args:
+      texts: List[str] processed information of every row, i.e. preprocessed by workers
+    """
+    self.df[self.output_column_name] = texts
+
+  def process_dataframe_columnar(self):
+    """Columnar variant of process_dataframe producing an identical output column.
+
+    The informative columns are flattened once, every line of every row is exploded into
+    a single column, and each line regex runs once over that whole column. The kept lines
+    are then joined back per row before the word filters run over the joined column.
+
+    On Return:
+      Creates a new column with all the available information as found in the informative
+        columns concatenated with new lines, and if parsed_output_column_name is set, a
+        column holding the ParsedTrace of that information.
+    """
+    messages = flatten_informative_columns(self.df, self.informative_columns,
+                                           collections.abc.Iterable)
+    # positional index, the dataframe index may hold duplicates
+    lines = pd.Series(
+        ['\n'.join(row_messages).splitlines() for row_messages in messages],
+        dtype=object).explode()
+    # rows without any line explode into a single NaN entry
+    keep = lines.notna()
+    for regex in self.ignore_regexes:
+      keep &= ~lines.str.contains(regex, regex=True, na=False)
+    for regex in self.search_regexes:
+      keep &= lines.str.contains(regex, regex=True, na=False)
+    joined = lines[keep].groupby(level=0).agg('\n'.join).reindex(
+        range(len(messages)), fill_value='')
+    for regex in self.ignore_word_regexes:
+      joined = joined.str.replace(regex, '', regex=True)
+    self.store_parsed_traces([ParsedTrace.from_text(text) for text in joined])
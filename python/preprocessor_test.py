@@ -95,6 +95,91 @@ class PreprocessorTest(unittest.TestCase):
         "This line should be kept since it has an error that is USEFUL_INFORMATION"
     )
 
+  def test_process_dataframe_parsed(self):
+    """Tests that the ParsedTrace column holds the same information as the text column."""
+    preprocessor_simple = Preprocessor(self.simple_dataframe, self.config,
+                                       '_INFO_', '_PARSED_')
+    preprocessor_simple.process_dataframe()
+    for text, parsed_trace in zip(preprocessor_simple.df['_INFO_'],
+                                  preprocessor_simple.df['_PARSED_']):
+      self.assertEqual(parsed_trace.text, text)
+
+  def test_process_dataframe_columnar(self):
+    """Tests that the columnar mode produces the same column as the row-wise mode."""
+    columnar_config = config_pb2.Config()
+    columnar_config.CopyFrom(self.config)
+    columnar_config.execution.columnar = True
+    for dataframe in [self.simple_dataframe, self.empty_dataframe]:
+      preprocessor_rows = Preprocessor(dataframe.copy(), self.config, '_INFO_')
+      preprocessor_rows.process_dataframe()
+      preprocessor_columnar = Preprocessor(dataframe.copy(), columnar_config,
+                                           '_INFO_')
+      preprocessor_columnar.process_dataframe()
+      self.assertEqual(list(preprocessor_columnar.df['_INFO_']),
+                       list(preprocessor_rows.df['_INFO_']))
+
+  def test_line_cache(self):
+    """Tests that cached line decisions give the same column and count repeated lines."""
+    cache_config = config_pb2.Config()
+    cache_config.CopyFrom(self.config)
+    cache_config.clusterer.tokenizer.preprocessor.line_cache_max_bytes = 1 << 20
+    preprocessor_rows = Preprocessor(self.simple_dataframe.copy(), self.config,
+                                     '_INFO_')
+    preprocessor_rows.process_dataframe()
+    self.assertIsNone(preprocessor_rows.line_cache_stats())
+    preprocessor_cached = Preprocessor(self.simple_dataframe.copy(),
+                                       cache_config, '_INFO_')
+    preprocessor_cached.process_dataframe()
+    self.assertEqual(list(preprocessor_cached.df['_INFO_']),
+                     list(preprocessor_rows.df['_INFO_']))
+
+    # a second preprocessor of the config shares the cache, every line is a hit
+    first_stats = preprocessor_cached.line_cache_stats()
+    Preprocessor(self.simple_dataframe.copy(), cache_config,
+                 '_INFO_').process_dataframe()
+    stats = preprocessor_cached.line_cache_stats()
+    self.assertEqual(stats['misses'], first_stats['misses'])
+    self.assertEqual(stats['hits'] - first_stats['hits'],
+                     first_stats['hits'] + first_stats['misses'])
+    self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+
+    # kept and dropped lines are all cached, words are filtered from the joined lines
+    lines = [
+        'an error with USEFUL_INFORMATION testIgnoreWord',
+        'an error with USEFUL_INFORMATION and chicken', 'no information'
+    ]
+    self.assertEqual(
+        preprocessor_cached.process_lines(lines + lines).lines,
+        ['an error with USEFUL_INFORMATION '] * 2)
+
+  def test_process_lines_filters_words_across_lines(self):
+    """Tests that the word regexes run over the joined kept lines of a row."""
+    word_config = config_pb2.Config()
+    word_config.CopyFrom(self.config)
+    word_config.clusterer.tokenizer.preprocessor.ignore_word_regex_matcher.append(
+        r'first error\nsecond')
+    preprocessor = Preprocessor(self.empty_dataframe, word_config, '_INFO_')
+    parsed_trace = preprocessor.process_lines([
+        'USEFUL_INFORMATION in the first error',
+        'second error with USEFUL_INFORMATION'
+    ])
+    self.assertEqual(parsed_trace.text,
+                     'USEFUL_INFORMATION in the  error with USEFUL_INFORMATION')
+
+  def test_line_cache_eviction(self):
+    """Tests that the line cache stays under its memory cap."""
+    cache_config = config_pb2.Config()
+    cache_config.CopyFrom(self.config)
+    cache_config.clusterer.tokenizer.preprocessor.line_cache_max_bytes = 600
+    preprocessor = Preprocessor(self.empty_dataframe, cache_config, '_INFO_')
+    lines = [
+        'error {} is USEFUL_INFORMATION'.format(index) for index in range(20)
+    ]
+    self.assertEqual(preprocessor.process_lines(lines).lines, lines)
+    stats = preprocessor.line_cache_stats()
+    self.assertLessEqual(stats['bytes'], 600)
+    self.assertLess(stats['entries'], 20)
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,234 @@
+"""Benchmark timing every pipeline stage on synthetic traces at increasing scales.
+
+For every size, synthetic traces are generated and run through the Preprocessor,
+ErrorCodeMatcher, KMeansClusterer and Summarizer, each timed as a stage of the
+PipelineMetrics. The report can be saved as a baseline, and later runs are compared against
+it so every performance change is measurable, along with its effect on the chosen number of
+clusters and their agreement with the true clusters of the traces.
+"""
+import json
+import sys
+
+from error_code_matcher import ErrorCodeMatcher
+from k_means_clusterer import KMeansClusterer
+import pandas as pd
+from pipeline_metrics import PipelineMetrics
+from preprocessor import line_cache_of
+from preprocessor import Preprocessor
+import proto.config_pb2 as config_pb2
+import proto.server_error_reason_pb2 as server_error_reason_pb2
+import proto.storage_error_reason_pb2 as storage_error_reason_pb2
+from sklearn.metrics import adjusted_rand_score
+from summarizer import Summarizer
+from synthetic_traces import EYE3_TAG
+from synthetic_traces import generate_traces
+from synthetic_traces import TRUE_CLUSTER_COLUMN
+
+from absl import app
+from absl import flags
+from google.protobuf import text_format
+
+FLAGS = flags.FLAGS
+flags.DEFINE_list('sizes', ['10000', '100000', '1000000'],
+                  'numbers of synthetic rows to run the pipeline on')
+flags.DEFINE_integer('true_clusters', 8,
+                     'number of clusters the traces are generated from')
+flags.DEFINE_float('duplicate_ratio', 0.5,
+                   'probability of a trace repeating a previous trace exactly')
+flags.DEFINE_integer('seed', 0, 'seed of the trace generator')
+flags.DEFINE_string(
+    'config', None,
+    'configuration file path, a config mirroring config_example.textproto if not given')
+flags.DEFINE_bool('trace_memory', False,
+                  'reports the tracemalloc allocation deltas of every stage')
+flags.DEFINE_string('output_path', None,
+                    'JSON file path the report is written to')
+flags.DEFINE_string('baseline_path', None,
+                    'JSON report of a previous run to compare the stage times to')
+flags.DEFINE_float(
+    'tolerance', 0.2,
+    'relative slowdown of a stage over the baseline reported as a regression')
+flags.DEFINE_float(
+    'quality_tolerance', 0.05,
+    'drop of the adjusted rand index to the true clusters below the baseline reported '
+    'as a regression')
+
+# traces scored by the SAMPLED_SILHOUETTE scorer of the default config, the exact
+# silhouette is quadratic in the number of traces and can not finish on the larger sizes
+_SCORER_SAMPLE_SIZE = 10000
+
+# internal column names shared by the stages
+_INTERNAL_COLUMN_NAME = '_internal_preprocessor_output_col_'
+_INTERNAL_PARSED_COLUMN_NAME = '_internal_parsed_trace_col_'
+
+
+def default_config():
+  """Builds a config mirroring config_example.textproto.
+
+  Returns:
+    config_pb2 proto
+  """
+  config = config_pb2.Config()
+  config.informative_column.extend(
+      ['exception', 'remoteException', 'errorMessage'])
+  config.error_code_matcher.ignore_server_error_reason.extend([
+      server_error_reason_pb2.SERVER_ERROR_REASON_UNKNOWN,
+      server_error_reason_pb2.SERVER_UNEXPECTED_EXCEPTION
+  ])
+  config.error_code_matcher.ignore_storage_error_reason.append(
+      storage_error_reason_pb2.STORAGE_ERROR_REASON_UNKNOWN)
+  config.error_code_matcher.output_column_name = 'ErrorCode'
+  tokenizer = config.clusterer.tokenizer
+  tokenizer.preprocessor.ignore_line_regex_matcher.append('Suppressed')
+  tokenizer.preprocessor.ignore_word_regex_matcher.append(EYE3_TAG)
+  tokenizer.preprocessor.line_cache_max_bytes = 67108864
+  tokenizer.mode = config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE
+  tokenizer.token_min_length = 1
+  tokenizer.split_on.extend(['=', r'\[', r'\]'])
+  tokenizer.punctuation.extend([':', '\n', '/', '\t'])
+  tokenizer.token_cache_max_bytes = 268435456
+  config.clusterer.deduplicate = True
+  config.clusterer.min_cluster = 2
+  config.clusterer.max_cluster = 20
+  config.clusterer.output_column_name = 'ClusterCode'
+  config.clusterer.scorer.method = config_pb2.ClusterScorer.Method.SAMPLED_SILHOUETTE
+  config.clusterer.scorer.sample_size = _SCORER_SAMPLE_SIZE
+  config.summarizer.n_messages = 20
+  config.summarizer.n_class_lines_to_show = 20
+  return config
+
+
+def run_pipeline(num_rows, config):
+  """Runs every stage on synthetic traces.
+
+  Args:
+    num_rows: int number of synthetic rows
+
+    config: config_pb2 proto the stages run with
+
+  Returns:
+    dict report of the PipelineMetrics of the run, with the 'chosen_k' of the clusterer
+      and the 'true_ari' adjusted rand index of its clusters to the true clusters
+  """
+  metrics = PipelineMetrics(FLAGS.trace_memory)
+  metrics.start()
+  try:
+    matcher = ErrorCodeMatcher(pd.DataFrame(), config)
+    with metrics.stage('generate', num_rows):
+      df = generate_traces(num_rows, FLAGS.true_clusters, FLAGS.duplicate_ratio,
+                           matcher.informative_errors, FLAGS.seed)
+    with metrics.stage('preprocessor', num_rows):
+      Preprocessor(df, config, _INTERNAL_COLUMN_NAME,
+                   _INTERNAL_PARSED_COLUMN_NAME).process_dataframe()
+    with metrics.stage('error_code_matcher', num_rows):
+      matcher.df = df
+      matcher.match_informative_errors()
+    with metrics.stage('k_means_clusterer', num_rows):
+      clusterer = KMeansClusterer(df, config)
+      clusterer.cluster_errors()
+    metrics.record_k_sweep(clusterer.sweep_results)
+    metrics.record_vectorizer(clusterer.vectorizer_stats)
+    with metrics.stage('summarizer', num_rows):
+      Summarizer(df, config, clusterer.features).generate_summary()
+  finally:
+    metrics.stop()
+  line_cache = line_cache_of(config)
+  if line_cache is not None:
+    metrics.record_cache('preprocessor_lines', line_cache.stats())
+  report = metrics.report()
+  report['chosen_k'] = df.attrs[KMeansClusterer.SWEEP_SUMMARY_ATTR]['ChosenK']
+  report['true_ari'] = adjusted_rand_score(
+      df[TRUE_CLUSTER_COLUMN], df[config.clusterer.output_column_name])
+  return report
+
+
+def compare_to_baseline(reports, baseline, tolerance, quality_tolerance):
+  """Compares the stage times and the clustering quality of the reports to the baseline.
+
+  The traces of a size are the same in both runs for the same seed, so a different chosen k
+  or a lower adjusted rand index to the true clusters means the change affected quality.
+
+  Args:
+    reports: Dict[str, dict] report of every size of this run
+
+    baseline: Dict[str, dict] reports of every size of the baseline run
+
+    tolerance: float relative slowdown reported as a regression
+
+    quality_tolerance: float drop of the adjusted rand index reported as a regression
+
+  Returns:
+    tuple of (lines, regressions) List[str] of the comparison of every stage and of the
+      quality of every size run in both, and List[str] of the stages slower than the
+      baseline by more than tolerance and of the sizes whose quality changed
+  """
+  lines, regressions = [], []
+  for size, report in reports.items():
+    if size not in baseline:
+      continue
+    line = '{:>8} {:<20} {:>10} -> {:<10}'.format(size, 'chosen k',
+                                                  baseline[size]['chosen_k'],
+                                                  report['chosen_k'])
+    lines.append(line)
+    if report['chosen_k'] != baseline[size]['chosen_k']:
+      regressions.append(line)
+    if 'true_ari' in baseline[size]:
+      line = '{:>8} {:<20} {:10.3f} -> {:<10.3f}'.format(
+          size, 'true ari', baseline[size]['true_ari'], report['true_ari'])
+      lines.append(line)
+      if report['true_ari'] < baseline[size]['true_ari'] - quality_tolerance:
+        regressions.append(line)
+    baseline_seconds = {
+        stage['stage']: stage['wall_seconds']
+        for stage in baseline[size]['stages']
+    }
+    for stage in report['stages']:
+      if stage['stage'] not in baseline_seconds:
+        continue
+      before = baseline_seconds[stage['stage']]
+      ratio = stage['wall_seconds'] / before if before > 0 else 1.0
+      line = '{:>8} {:<20} {:9.3f}s -> {:9.3f}s ({:+.0%})'.format(
+          size, stage['stage'], before, stage['wall_seconds'], ratio - 1)
+      lines.append(line)
+      if ratio > 1 + tolerance:
+        regressions.append(line)
+  return lines, regressions
+
+
+def main(argv):
+  del argv  # Unused.
+  config = default_config()
+  if FLAGS.config:
+    with open(FLAGS.config) as config_file:
+      config = text_format.Parse(config_file.read(), config_pb2.Config())
+
+  reports = {}
+  for size in FLAGS.sizes:
+    reports[size] = run_pipeline(int(size), config)
+    for stage in reports[size]['stages']:
+      print('{:>8} {:<20} {:9.3f}s wall {:9.3f}s cpu {:12.0f} rows/s'.format(
+          size, stage['stage'], stage['wall_seconds'], stage['cpu_seconds'],
+          stage['rows_per_second']))
+    print('{:>8} chosen k: {} true ari: {:.3f}'.format(
+        size, reports[size]['chosen_k'], reports[size]['true_ari']))
+
+  if FLAGS.output_path:
+    with open(FLAGS.output_path, 'w') as output_file:
+      json.dump(reports, output_file, indent=2)
+
+  if FLAGS.baseline_path:
+    with open(FLAGS.baseline_path) as baseline_file:
+      baseline = json.load(baseline_file)
+    lines, regressions = compare_to_baseline(reports, baseline,
+                                             FLAGS.tolerance,
+                                             FLAGS.quality_tolerance)
+    print('\n'.join(['baseline comparison:'] + lines))
+    if regressions:
+      print('\n'.join(['regressions:'] + regressions),
+            file=sys.stderr)
+      return 1
+  return 0
+
+
+if __name__ == '__main__':
+  app.run(main)
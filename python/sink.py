@@ -0,0 +1,112 @@
+"""Module for the output sinks the summary is written to."""
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# summary attrs key of the columns holding lists, see Summarizer
+LIST_COLUMNS_ATTR = 'list_columns'
+
+
+def list_column_array(lists):
+  """Converts a column of lists into an Arrow list array.
+
+  Lists of scalars keep the type Arrow infers for them. Elements that are themselves lists
+  or objects, i.e. the messages of a repeated input column, can not be nested in a repeated
+  field and are JSON encoded.
+
+  Args:
+    lists: List[List] lists of every row
+
+  Returns:
+    pyarrow.ListArray of the lists
+  """
+  try:
+    array = pa.array(lists)
+  except (pa.ArrowInvalid, pa.ArrowTypeError):
+    # mixed element types
+    array = None
+  if array is None or pa.types.is_nested(array.type.value_type):
+    array = pa.array([[
+        element if isinstance(element, str) else json.dumps(element)
+        for element in elements
+    ] for elements in lists], pa.list_(pa.string()))
+  if pa.types.is_null(array.type.value_type):
+    # only empty lists, repeated fields still need an element type
+    array = array.cast(pa.list_(pa.string()))
+  return array
+
+
+class Sink:
+  """Base class of the output sinks, writing the summary as a typed Arrow table.
+
+  The list columns of the summary become native list (REPEATED) columns. Subclasses
+  implement write_table.
+  """
+
+  def to_arrow_table(self, summary):
+    """Converts the summary into an Arrow table with native list columns.
+
+    Args:
+      summary: pandas dataframe generated by the Summarizer
+
+    Returns:
+      pyarrow.Table of the summary
+    """
+    list_columns = set(summary.attrs.get(LIST_COLUMNS_ATTR, []))
+    arrays = [
+        list_column_array(summary[column].tolist()) if column in list_columns
+        else pa.array(summary[column].tolist()) for column in summary.columns
+    ]
+    return pa.Table.from_arrays(arrays,
+                                names=[str(column) for column in summary.columns])
+
+  def write_table(self, table):
+    """Writes the Arrow table of the summary."""
+    raise NotImplementedError
+
+  def write(self, summary):
+    """Writes the summary.
+
+    Args:
+      summary: pandas dataframe generated by the Summarizer
+    """
+    self.write_table(self.to_arrow_table(summary))
+
+
+class LocalFileSink(Sink):
+  """Sink writing the summary to a local file for offline use.
+
+  The format follows the extension of the path: '.parquet', '.arrow' (Arrow IPC / Feather
+  v2) or '.jsonl' (one JSON object per line).
+  """
+  WRITERS = {
+      '.parquet': pq.write_table,
+      '.arrow': feather.write_feather,
+  }
+
+  def __init__(self, path):
+    """Initializes the sink.
+
+    Args:
+      path: str path of the output file
+
+    Raises:
+      ValueError: if the extension of the path is not a supported format
+    """
+    self.path = path
+    self.extension = os.path.splitext(path)[1]
+    if self.extension not in self.WRITERS and self.extension != '.jsonl':
+      raise ValueError('Unsupported output file extension {}'.format(
+          self.extension))
+
+  def write_table(self, table):
+    if self.extension == '.jsonl':
+      columns = table.to_pydict()
+      with open(self.path, 'w') as output_file:
+        for values in zip(*columns.values()):
+          output_file.write(json.dumps(dict(zip(columns, values))) + '\n')
+      return
+    self.WRITERS[self.extension](table, self.path)
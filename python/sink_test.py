@@ -0,0 +1,87 @@
+"""Unittest module for the output sinks."""
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+import proto.config_pb2 as config_pb2
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from sink import list_column_array
+from sink import LocalFileSink
+from summarizer import Summarizer
+
+
+class SinkTest(unittest.TestCase):
+  """Unittest class for the sinks."""
+
+  def setUp(self):
+    """Set up of a summary of a dataframe with a repeated column."""
+    config = config_pb2.Config()
+    config.error_code_matcher.output_column_name = 'ERROR_CODE'
+    config.clusterer.output_column_name = 'CLUSTER_CODE'
+    config.summarizer.n_messages = 5
+    config.summarizer.n_class_lines_to_show = 5
+    dataframe = pd.read_json('testdata/summarizer/multi_cluster.json',
+                             orient='columns')
+    self.summary = Summarizer(dataframe, config).generate_summary()
+    self.directory = tempfile.TemporaryDirectory()
+    super(SinkTest, self).setUp()
+
+  def tearDown(self):
+    self.directory.cleanup()
+    super(SinkTest, self).tearDown()
+
+  def test_list_column_array(self):
+    """Tests the element types of list columns."""
+    self.assertEqual(
+        list_column_array([['a', 'b'], []]).to_pylist(), [['a', 'b'], []])
+    self.assertEqual(list_column_array([[1, 2]]).type, pa.list_(pa.int64()))
+    # lists of lists can not be repeated fields, their elements are JSON encoded
+    self.assertEqual(
+        list_column_array([[['a'], []]]).to_pylist(), [['["a"]', '[]']])
+    self.assertEqual(list_column_array([[], []]).type, pa.list_(pa.string()))
+
+  def test_list_columns(self):
+    """Tests that the list columns of the summary become list columns."""
+    table = LocalFileSink('summary.parquet').to_arrow_table(self.summary)
+    self.assertEqual(table.num_rows, len(self.summary))
+    for column in self.summary.attrs[Summarizer.LIST_COLUMNS_ATTR]:
+      self.assertTrue(pa.types.is_list(table.schema.field(column).type))
+      self.assertEqual(table.column(column).to_pylist(), [
+          list_column_array([value]).to_pylist()[0]
+          for value in self.summary[column]
+      ])
+    self.assertTrue(pa.types.is_integer(table.schema.field('Size').type))
+    self.assertTrue(pa.types.is_string(table.schema.field('Text').type))
+
+  def test_local_file_sink(self):
+    """Tests that every local format holds the same table."""
+    expected_table = LocalFileSink('summary.parquet').to_arrow_table(
+        self.summary)
+    readers = {
+        '.parquet': pq.read_table,
+        '.arrow': feather.read_table,
+    }
+    for extension, reader in readers.items():
+      path = os.path.join(self.directory.name, 'summary' + extension)
+      LocalFileSink(path).write(self.summary)
+      self.assertTrue(reader(path).equals(expected_table))
+
+    path = os.path.join(self.directory.name, 'summary.jsonl')
+    LocalFileSink(path).write(self.summary)
+    with open(path) as jsonl_file:
+      rows = [json.loads(line) for line in jsonl_file]
+    self.assertEqual(rows, [
+        dict(zip(expected_table.column_names, values))
+        for values in zip(*expected_table.to_pydict().values())
+    ])
+
+    with self.assertRaises(ValueError):
+      LocalFileSink(os.path.join(self.directory.name, 'summary.csv'))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,233 @@
+"""Module for the input sources the classification reads its rows from."""
+from error_code_matcher import ErrorCodeMatcher
+from incremental_clusterer import after_watermark
+import numpy as np
+import pandas as pd
+from preprocessor import Preprocessor
+import proto.source_config_pb2 as source_config_pb2
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Number of rows per batch of the JSONL source when the config does not set one
+DEFAULT_BATCH_SIZE = 10000
+
+
+class Source:
+  """Base class of the input sources, reading the projected rows one batch at a time.
+
+  Only the informative columns, the summary columns and the watermark column of incremental
+  runs are read. The Preprocessor and ErrorCodeMatcher run on every batch as it arrives, so
+  only the processed rows of those columns are accumulated. If watermark is set, only the
+  rows after it are kept. Subclasses implement iterate_raw_batches.
+  """
+  # internal column names shared with the KMeansClusterer and Summarizer
+  INTERNAL_COLUMN_NAME = '_internal_preprocessor_output_col_'
+  INTERNAL_PARSED_COLUMN_NAME = '_internal_parsed_trace_col_'
+
+  def __init__(self, config, summary_columns):
+    """Initializes the columns to read.
+
+    Args:
+      config: config_pb2 proto specified by the configuration file
+
+      summary_columns: List[str] columns passed through to the summary besides the
+        informative columns
+    """
+    self.config = config
+    self.columns = list(config.informative_column)
+    self.watermark_column = config.clusterer.incremental.watermark_column
+    for column in list(summary_columns) + [self.watermark_column]:
+      if column and column not in self.columns:
+        self.columns.append(column)
+    self.match_error_codes = config.HasField('error_code_matcher')
+    # JSON scalar watermark of incremental runs, every row is read if None
+    self.watermark = None
+
+  def check_columns(self, available_columns, source_name):
+    """Checks that every requested column is available.
+
+    Args:
+      available_columns: List[str] columns of the source
+
+      source_name: str name of the source used in the error message
+
+    Raises:
+      ValueError: if a requested column is not available
+    """
+    missing_columns = set(self.columns) - set(available_columns)
+    if missing_columns:
+      raise ValueError('Columns {} are not in {}'.format(
+          sorted(missing_columns), source_name))
+
+  def iterate_raw_batches(self):
+    """Yields a pandas dataframe of the requested columns for every batch of rows."""
+    raise NotImplementedError
+
+  def process_batch(self, batch):
+    """Runs the row independent stages on one batch of rows.
+
+    Repeated columns decoded by Arrow hold numpy arrays, they are converted to the lists
+    the stages expect.
+
+    Args:
+      batch: pandas dataframe of one batch of the requested columns
+
+    Returns:
+      pandas dataframe of the batch with the preprocessed (and error code) columns added
+    """
+    for column in self.config.informative_column:
+      values = batch[column].tolist()
+      if any(isinstance(value, np.ndarray) for value in values):
+        batch[column] = [
+            value.tolist() if isinstance(value, np.ndarray) else value
+            for value in values
+        ]
+    Preprocessor(batch, self.config, self.INTERNAL_COLUMN_NAME,
+                 self.INTERNAL_PARSED_COLUMN_NAME).process_dataframe()
+    if self.match_error_codes:
+      ErrorCodeMatcher(batch, self.config).match_informative_errors()
+    return batch
+
+  def iterate_batches(self):
+    """Streams the processed batches of the source.
+
+    Yields:
+      pandas dataframe of every processed batch in source order
+    """
+    for batch in self.iterate_raw_batches():
+      if self.watermark is not None:
+        batch = batch[after_watermark(batch[self.watermark_column],
+                                      self.watermark)].reset_index(drop=True)
+        if batch.empty:
+          continue
+      yield self.process_batch(batch)
+
+  def read(self):
+    """Reads and processes the whole source.
+
+    Returns:
+      pandas dataframe of the requested columns, preprocessed and error code matched, ready
+        for the KMeansClusterer
+    """
+    batches = list(self.iterate_batches())
+    if not batches:
+      # an empty source still yields the expected columns
+      return self.process_batch(pd.DataFrame(columns=self.columns))
+    return pd.concat(batches, ignore_index=True)
+
+
+class ParquetSource(Source):
+  """Source reading a memory-mapped Parquet file one row group at a time."""
+
+  def __init__(self, path, config, summary_columns):
+    """Initializes the source.
+
+    Args:
+      path: str path of the Parquet file
+
+      config: config_pb2 proto specified by the configuration file
+
+      summary_columns: List[str] columns passed through to the summary
+    """
+    super(ParquetSource, self).__init__(config, summary_columns)
+    self.path = path
+
+  def iterate_raw_batches(self):
+    parquet_file = pq.ParquetFile(self.path, memory_map=True)
+    self.check_columns(parquet_file.schema_arrow.names, self.path)
+    for row_group in range(parquet_file.num_row_groups):
+      yield parquet_file.read_row_group(row_group,
+                                        columns=self.columns).to_pandas()
+
+
+class ArrowIpcSource(Source):
+  """Source reading a memory-mapped Arrow IPC (Feather v2) file one record batch at a time.
+
+  The record batches are views of the mapped file, only the requested columns of a batch
+  are ever converted to pandas.
+  """
+
+  def __init__(self, path, config, summary_columns):
+    """Initializes the source.
+
+    Args:
+      path: str path of the Arrow IPC file
+
+      config: config_pb2 proto specified by the configuration file
+
+      summary_columns: List[str] columns passed through to the summary
+    """
+    super(ArrowIpcSource, self).__init__(config, summary_columns)
+    self.path = path
+
+  def iterate_raw_batches(self):
+    with pa.memory_map(self.path, 'r') as mapped_file:
+      reader = pa.ipc.open_file(mapped_file)
+      self.check_columns(reader.schema.names, self.path)
+      column_indices = [
+          reader.schema.get_field_index(column) for column in self.columns
+      ]
+      for batch_index in range(reader.num_record_batches):
+        record_batch = reader.get_batch(batch_index)
+        yield pa.RecordBatch.from_arrays(
+            [record_batch.column(index) for index in column_indices],
+            names=self.columns).to_pandas()
+
+
+class JsonlSource(Source):
+  """Source reading a file of one JSON object per line in batches of rows.
+
+  JSON has no schema and rows may leave out null fields, so columns missing from a batch
+  are read as nulls.
+  """
+
+  def __init__(self, path, config, summary_columns, batch_size):
+    """Initializes the source.
+
+    Args:
+      path: str path of the JSONL file
+
+      config: config_pb2 proto specified by the configuration file
+
+      summary_columns: List[str] columns passed through to the summary
+
+      batch_size: int number of rows per batch, DEFAULT_BATCH_SIZE if not positive
+    """
+    super(JsonlSource, self).__init__(config, summary_columns)
+    self.path = path
+    self.batch_size = batch_size if batch_size > 0 else DEFAULT_BATCH_SIZE
+
+  def iterate_raw_batches(self):
+    reader = pd.read_json(self.path,
+                          orient='records',
+                          lines=True,
+                          chunksize=self.batch_size,
+                          dtype=False)
+    try:
+      for chunk in reader:
+        yield chunk.reindex(columns=self.columns).reset_index(drop=True)
+    finally:
+      reader.close()
+
+
+def create_local_source(source_config, config):
+  """Creates the local file source chosen by the source configuration.
+
+  Args:
+    source_config: source_config_pb2 proto with a PARQUET, ARROW_IPC or JSONL format
+
+    config: config_pb2 proto specified by the configuration file
+
+  Returns:
+    Source reading the configured file
+  """
+  source_format = source_config.format
+  summary_columns = list(source_config.summary_column)
+  if source_format == source_config_pb2.SourceConfig.Format.PARQUET:
+    return ParquetSource(source_config.path, config, summary_columns)
+  if source_format == source_config_pb2.SourceConfig.Format.ARROW_IPC:
+    return ArrowIpcSource(source_config.path, config, summary_columns)
+  if source_format == source_config_pb2.SourceConfig.Format.JSONL:
+    return JsonlSource(source_config.path, config, summary_columns,
+                       source_config.batch_size)
+  raise NotImplementedError('No valid local source format in configuration file')
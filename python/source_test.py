@@ -0,0 +1,108 @@
+"""Unittest module for the local input sources."""
+import os
+import tempfile
+import unittest
+
+from error_code_matcher import ErrorCodeMatcher
+import pandas as pd
+from preprocessor import Preprocessor
+import proto.config_pb2 as config_pb2
+import proto.source_config_pb2 as source_config_pb2
+import pyarrow as pa
+import pyarrow.parquet as pq
+from source import create_local_source
+from source import Source
+
+
+class SourceTest(unittest.TestCase):
+  """Unittest class for the local sources."""
+
+  def setUp(self):
+    """Set up of a table holding an extra unused column and its expected processing."""
+    self.config = config_pb2.Config()
+    self.config.informative_column.extend(
+        ['exception', 'remoteException', 'errorMessage'])
+    self.config.error_code_matcher.output_column_name = 'ERRCODE'
+
+    self.table = pd.read_json('testdata/error_code_matcher/simple_data.json',
+                              orient='columns')
+    self.table['unused'] = 'x' * 100
+    self.expected_df = self.table.drop(columns=['unused'])
+    Preprocessor(self.expected_df, self.config, Source.INTERNAL_COLUMN_NAME,
+                 Source.INTERNAL_PARSED_COLUMN_NAME).process_dataframe()
+    ErrorCodeMatcher(self.expected_df, self.config).match_informative_errors()
+
+    self.directory = tempfile.TemporaryDirectory()
+    self.source_config = source_config_pb2.SourceConfig()
+    self.source_config.summary_column.append('name')
+    super(SourceTest, self).setUp()
+
+  def tearDown(self):
+    self.directory.cleanup()
+    super(SourceTest, self).tearDown()
+
+  def assert_read_as_expected(self, source_format, file_name):
+    """Asserts that the file written in the temporary directory reads as expected.
+
+    Args:
+      source_format: source_config_pb2.SourceConfig.Format of the file
+
+      file_name: str name of the file in the temporary directory
+    """
+    self.source_config.format = source_format
+    self.source_config.path = os.path.join(self.directory.name, file_name)
+    df = create_local_source(self.source_config, self.config).read()
+    # informative columns first, then the summary columns
+    self.assertEqual(list(df.columns), [
+        'exception', 'remoteException', 'errorMessage', 'name',
+        Source.INTERNAL_COLUMN_NAME, Source.INTERNAL_PARSED_COLUMN_NAME,
+        'ERRCODE'
+    ])
+    self.assertEqual(list(df['remoteException']),
+                     list(self.expected_df['remoteException']))
+    self.assertEqual(list(df[Source.INTERNAL_COLUMN_NAME]),
+                     list(self.expected_df[Source.INTERNAL_COLUMN_NAME]))
+    self.assertEqual(list(df['ERRCODE']), list(self.expected_df['ERRCODE']))
+
+  def test_parquet(self):
+    """Tests reading a Parquet file of several row groups."""
+    pq.write_table(pa.Table.from_pandas(self.table),
+                   os.path.join(self.directory.name, 'table.parquet'),
+                   row_group_size=2)
+    self.assert_read_as_expected(
+        source_config_pb2.SourceConfig.Format.PARQUET, 'table.parquet')
+
+  def test_arrow_ipc(self):
+    """Tests reading an Arrow IPC file of several record batches."""
+    table = pa.Table.from_pandas(self.table)
+    with pa.OSFile(os.path.join(self.directory.name, 'table.arrow'),
+                   'wb') as sink:
+      writer = pa.ipc.new_file(sink, table.schema)
+      for batch in table.to_batches(max_chunksize=2):
+        writer.write_batch(batch)
+      writer.close()
+    self.assert_read_as_expected(
+        source_config_pb2.SourceConfig.Format.ARROW_IPC, 'table.arrow')
+
+  def test_jsonl(self):
+    """Tests reading a JSONL file in batches."""
+    self.table.to_json(os.path.join(self.directory.name, 'table.jsonl'),
+                       orient='records',
+                       lines=True)
+    self.source_config.batch_size = 2
+    self.assert_read_as_expected(source_config_pb2.SourceConfig.Format.JSONL,
+                                 'table.jsonl')
+
+  def test_missing_column(self):
+    """Tests that requesting a column missing from the file fails early."""
+    pq.write_table(pa.Table.from_pandas(self.table),
+                   os.path.join(self.directory.name, 'table.parquet'))
+    self.source_config.summary_column.append('missing')
+    self.source_config.format = source_config_pb2.SourceConfig.Format.PARQUET
+    self.source_config.path = os.path.join(self.directory.name, 'table.parquet')
+    with self.assertRaises(ValueError):
+      create_local_source(self.source_config, self.config).read()
+
+
+if __name__ == "__main__":
+  unittest.main()
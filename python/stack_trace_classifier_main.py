@@ -1,78 +1,181 @@
 """Demo module for running classification algorithms and summarizer."""
+import json
+
+from big_query_reader import BigQueryReader
+from big_query_sink import BigQuerySink
+from classification_server import ClassificationServer
+from cluster_assigner import ClusterAssigner
+from compiled_config import CompiledConfig
 from error_code_matcher import ErrorCodeMatcher
+from incremental_clusterer import IncrementalClusterer
 from k_means_clusterer import KMeansClusterer
-import pandas_gbq
+from model_artifact import ModelArtifact
+from pipeline_metrics import PipelineMetrics
+from preprocessor import line_cache_of
 import proto.big_query_config_pb2 as big_query_config_pb2
-import proto.config_pb2 as config_pb2
+import proto.source_config_pb2 as source_config_pb2
+from sink import LocalFileSink
+from source import create_local_source
 from summarizer import Summarizer
 
 from absl import app
 from absl import flags
+from absl import logging
 from google.cloud import bigquery
 from google.protobuf import text_format
 
 
-def get_input_dataframe_table(project_id, dataset_id, input_table_id, client):
-  """Attempts to get an input dataframe utilizing the bigquery configurations.
+def run_classification_summary(df,
+                               classifier_config,
+                               match_error_codes=True,
+                               artifact=None,
+                               metrics=None):
+  """Runs the various classification algorithms outputting a summary dataframe.
 
   Args:
-    project_id: project id of the bigquery table we are reading from
+    df: pandas dataframe containing the error information we wish to classify and summarize
+
+    classifier_config: config_pb2 proto specified by the configuration file
 
-    dataset_id: dataset id of the bigquery table we are reading from
+    match_error_codes: bool whether to run the ErrorCodeMatcher, False when the rows were
+      already matched while read
 
-    input_table_id: table name of the bigquery table we are reading from
+    artifact: optional ModelArtifact whose clusters label the errors instead of clustering
+      them again
+
+    metrics: optional PipelineMetrics recording every stage
 
   Returns:
-    A dataframe read from the credentials and information provided in args.
+    tuple of (output_df, clustered_artifact) pandas dataframe that summarizes the information
+      obtained from the classification algorithms run on the input dataframe, and the
+      ModelArtifact of the clustering to be saved once the summary is written, None if the
+      errors were labelled with the clusters of artifact
   """
-  dataset_ref = bigquery.DatasetReference(project_id, dataset_id)
-  table_ref = dataset_ref.table(input_table_id)
-  table = client.get_table(table_ref)
-  return client.list_rows(table).to_dataframe()
+  if metrics is None:
+    metrics = PipelineMetrics()
+  # Running our classifiers
+  if match_error_codes:
+    with metrics.stage('error_code_matcher', len(df)):
+      error_code_matcher = ErrorCodeMatcher(df, classifier_config)
+      error_code_matcher.match_informative_errors()
+  cluster_features = None
+  clustered_artifact = None
+  if artifact is not None:
+    # assign-only mode, no sweep over k
+    with metrics.stage('cluster_assigner', len(df)):
+      cluster_assigner = ClusterAssigner(df, artifact)
+      cluster_assigner.assign_clusters()
+    metrics.record_cache('cluster_assigner_tokens',
+                         cluster_assigner.tokenizer.cache_stats())
+  else:
+    with metrics.stage('k_means_clusterer', len(df)):
+      k_means_classifier = KMeansClusterer(df, classifier_config)
+      clustered_artifact = k_means_classifier.cluster_errors()
+    metrics.record_k_sweep(k_means_classifier.sweep_results)
+    metrics.record_vectorizer(k_means_classifier.vectorizer_stats)
+    metrics.record_cache('k_means_clusterer_tokens',
+                         k_means_classifier.tokenizer.cache_stats())
+    if k_means_classifier.executor is not None:
+      metrics.record_cache('preprocessor_lines_workers',
+                           k_means_classifier.executor.line_cache_stats)
+    cluster_features = k_means_classifier.features
+
+  # Running the summarizer
+  with metrics.stage('summarizer', len(df)):
+    summarizer = Summarizer(df, classifier_config, cluster_features)
+    return summarizer.generate_summary(), clustered_artifact
 
 
-def output_dataframe_to_gbq(output_dataframe, project_id, dataset_id,
-                            output_table_id):
-  """Writes back to big query the results of the summarized dataframe, output_dataframe.
+def run_incremental_summary(df,
+                            artifact,
+                            match_error_codes=True,
+                            metrics=None):
+  """Folds the new errors into the clusters of a past run outputting their summary.
 
   Args:
-    output_dataframe: pandas dataframe we are writing to bigquery
+    df: pandas dataframe containing the errors after the watermark of the artifact
 
-    project_id: str project id of the bigquery table we are writing to
+    artifact: ModelArtifact saved by the last run, updated in place but not saved
 
-    dataset_id: str dataset id of the bigquery table we are writing to
+    match_error_codes: bool whether to run the ErrorCodeMatcher, False when the rows were
+      already matched while read
 
-    output_table_id: str output table name of the bigquery table we are writing to
+    metrics: optional PipelineMetrics recording every stage
 
-  On Return:
-    Writes the output dataframe to bigquery
+  Returns:
+    pandas dataframe that summarizes the new errors, with the size of every cluster so far,
+      None if the new errors drifted past the drift threshold and the whole table must be
+      clustered again
   """
-  pandas_gbq.to_gbq(output_dataframe,
-                    dataset_id + '.' + output_table_id,
-                    project_id=project_id)
+  if metrics is None:
+    metrics = PipelineMetrics()
+  with metrics.stage('incremental_clusterer', len(df)):
+    incremental_clusterer = IncrementalClusterer(df, artifact)
+  metrics.record_cache('incremental_clusterer_tokens',
+                       incremental_clusterer.tokenizer.cache_stats())
+  if incremental_clusterer.needs_refit():
+    return None
+  if match_error_codes:
+    with metrics.stage('error_code_matcher', len(df)):
+      error_code_matcher = ErrorCodeMatcher(df, artifact.config)
+      error_code_matcher.match_informative_errors()
+  with metrics.stage('incremental_update', len(df)):
+    incremental_clusterer.update_clusters()
 
+  with metrics.stage('summarizer', len(df)):
+    summarizer = Summarizer(df, artifact.config)
+    return incremental_clusterer.merge_summary_counts(
+        summarizer.generate_summary())
 
-def run_classification_summary(df, classifier_config):
-  """Runs the various classification algorithms outputting a summary dataframe.
+
+def classify_source(source, classifier_config, artifact, metrics):
+  """Reads the source and summarizes its errors, incrementally when a past run allows it.
 
   Args:
-    df: pandas dataframe containing the error information we wish to classify and summarize
+    source: Source of the errors
 
     classifier_config: config_pb2 proto specified by the configuration file
 
+    artifact: optional ModelArtifact whose clusters label the errors instead of clustering
+      them again
+
+    metrics: PipelineMetrics recording every stage
+
   Returns:
-    pandas dataframe that summarizes the information obtained from the classification algorithms
-      run on the input dataframe
+    tuple of (output_df, updated_artifact) pandas dataframe summarizing the errors, None if
+      an incremental run found no new errors, and the ModelArtifact an incremental run
+      updated or a clustering found, to be saved once the summary is written, None if
+      there is none
   """
-  # Running our classifiers
-  error_code_matcher = ErrorCodeMatcher(df, classifier_config)
-  error_code_matcher.match_informative_errors()
-  k_means_classifier = KMeansClusterer(df, classifier_config)
-  k_means_classifier.cluster_errors()
+  # incremental runs only read the rows after the watermark of the last run
+  incremental_artifact = None
+  if (artifact is None and
+      classifier_config.clusterer.incremental.watermark_column and
+      ModelArtifact.exists(classifier_config.clusterer.artifact_path)):
+    incremental_artifact = ModelArtifact.load(
+        classifier_config.clusterer.artifact_path)
+    source.watermark = incremental_artifact.watermark
+  # the source preprocesses and matches every batch as it reads it
+  with metrics.stage('source', 0) as source_stage:
+    df = source.read()
+    source_stage['rows'] = len(df)
 
-  # Running the summarizer
-  summarizer = Summarizer(df, classifier_config)
-  return summarizer.generate_summary()
+  if incremental_artifact is not None:
+    if df.empty:
+      # no new errors since the last run
+      return None, None
+    output_df = run_incremental_summary(df, incremental_artifact,
+                                        not source.match_error_codes, metrics)
+    if output_df is not None:
+      return output_df, incremental_artifact
+    # the clusters drifted, cluster the whole table again
+    source.watermark = None
+    with metrics.stage('source', 0) as source_stage:
+      df = source.read()
+      source_stage['rows'] = len(df)
+  return run_classification_summary(df, classifier_config,
+                                    not source.match_error_codes, artifact,
+                                    metrics)
 
 
 FLAGS = flags.FLAGS
@@ -84,37 +187,128 @@ flags.DEFINE_string(
     'big_query_config', None,
     'big query configuration file path to pass in expected to be in format of big_query_config.proto'
 )
+flags.DEFINE_string(
+    'source_config', None,
+    'input source configuration file path expected to be in format of source_config.proto, '
+    'reads the big query input table if not given')
+flags.DEFINE_string(
+    'output_path', None,
+    'local .parquet, .arrow or .jsonl file path the summary is written to instead of '
+    'the big query output table, required without --big_query_config')
+flags.DEFINE_string(
+    'model_artifact', None,
+    'model artifact directory saved by a previous run (see Clusterer.artifact_path), '
+    'labels the errors with its clusters instead of clustering them again, using the config '
+    'stored in the artifact')
+flags.DEFINE_integer(
+    'serve_port', None,
+    'serves the --model_artifact over HTTP on this localhost port instead of running a '
+    'batch: POST /classify takes a JSON object of informative columns, GET /stats '
+    'reports p50/p99 latency and throughput')
+flags.DEFINE_integer('max_batch_size', 64,
+                     'maximum number of served traces classified together')
+flags.DEFINE_float(
+    'max_batch_wait_ms', 5.0,
+    'maximum time a served trace waits for concurrent traces to batch with')
+flags.DEFINE_string(
+    'metrics_path', None,
+    'JSON file path the wall and CPU time, rows per second and memory of every pipeline '
+    'stage and the fit and score times of every k are written to')
+flags.DEFINE_bool(
+    'trace_memory', False,
+    'reports the tracemalloc allocation deltas of every stage in the metrics, slowing '
+    'the run down')
+flags.DEFINE_string('profile_path', None,
+                    'file path the cProfile stats of the run are dumped to')
 flags.mark_flag_as_required('config')
 # future flag arguments, i.e. plx workflow client, can go here
 
 
 def main(argv):
   # Read classifier configurations from proto file passed in
-  classifier_config_path = FLAGS.config
-  classifier_config = config_pb2.Config()
-  classifier_file = open(classifier_config_path, 'r')
-  classifier_config = text_format.Parse(classifier_file.read(),
-                                        classifier_config)
+  # compiled once, every stage built from an equal config shares the compilation
+  classifier_config = CompiledConfig.load(FLAGS.config).config
+
+  artifact = None
+  if FLAGS.model_artifact:
+    artifact = ModelArtifact.load(FLAGS.model_artifact)
+    # new errors must be preprocessed and tokenized like the clustered ones
+    classifier_config = artifact.config
 
+  if FLAGS.serve_port is not None:
+    if artifact is None:
+      raise app.UsageError('--serve_port requires --model_artifact')
+    server = ClassificationServer(('localhost', FLAGS.serve_port), artifact,
+                                  FLAGS.max_batch_size,
+                                  FLAGS.max_batch_wait_ms / 1000)
+    try:
+      server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      server.server_close()
+      logging.info('Served %s', json.dumps(server.latency_stats.stats()))
+    return
+
+  # the summary is written to a local file or to the big query output table
+  if not FLAGS.output_path and not FLAGS.big_query_config:
+    raise app.UsageError('--output_path or --big_query_config is required')
+
+  big_query_config = None
   if FLAGS.big_query_config:
-    # Personal Client, YMMV.
-    # In the future, change this to plx workflow client, or BQ service agent
-    client = bigquery.Client()
     # Read BQ configurations from proto file passed in
     big_query_config_path = FLAGS.big_query_config
     big_query_config = big_query_config_pb2.BigQueryConfig()
     big_query_file = open(big_query_config_path, 'r')
     big_query_config = text_format.Parse(big_query_file.read(),
                                          big_query_config)
+
+  # Read the input source configurations, the BigQuery input table by default
+  source_config = source_config_pb2.SourceConfig()
+  if FLAGS.source_config:
+    source_file = open(FLAGS.source_config, 'r')
+    source_config = text_format.Parse(source_file.read(), source_config)
+
+  client = None
+  if big_query_config is not None:
+    # Personal Client, YMMV.
+    # In the future, change this to plx workflow client, or BQ service agent
+    client = bigquery.Client()
+
+  if source_config.format == source_config_pb2.SourceConfig.Format.BIG_QUERY:
+    if big_query_config is None:
+      return
     # BigQuery Schematics
-    df = get_input_dataframe_table(big_query_config.project_id,
-                                   big_query_config.dataset_id,
-                                   big_query_config.input_table_id, client)
-
-    output_df = run_classification_summary(df, classifier_config)
-    output_dataframe_to_gbq(output_df, big_query_config.project_id,
-                            big_query_config.dataset_id,
-                            big_query_config.output_table_id)
+    # stream the needed columns, preprocessing and matching every page as it arrives
+    source = BigQueryReader(client, big_query_config, classifier_config)
+  else:
+    # local snapshot of the input, i.e. for offline re-classifications
+    source = create_local_source(source_config, classifier_config)
+
+  metrics = PipelineMetrics(FLAGS.trace_memory, FLAGS.profile_path)
+  metrics.start()
+  try:
+    output_df, updated_artifact = classify_source(source, classifier_config,
+                                                  artifact, metrics)
+    if output_df is None:
+      return
+    # the list columns of the summary are written as repeated fields
+    with metrics.stage('sink', len(output_df)):
+      if FLAGS.output_path:
+        LocalFileSink(FLAGS.output_path).write(output_df)
+      else:
+        BigQuerySink(client, big_query_config).write(output_df)
+    # the watermark only advances once the summary of the errors is written
+    if updated_artifact is not None and classifier_config.clusterer.artifact_path:
+      updated_artifact.save(classifier_config.clusterer.artifact_path)
+  finally:
+    metrics.stop()
+    # the line caches of the workers of a partitioned run are recorded with the clusterer
+    line_cache = line_cache_of(classifier_config)
+    if line_cache is not None:
+      metrics.record_cache('preprocessor_lines', line_cache.stats())
+    if FLAGS.metrics_path:
+      metrics.write(FLAGS.metrics_path)
 
 
 if __name__ == "__main__":
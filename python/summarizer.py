@@ -1,9 +1,9 @@
 """Module for summarization of the errors collected in the classification phase."""
-import re
-
+from compiled_config import CompiledConfig
 import numpy as np
 import pandas as pd
-
+from parsed_trace import ParsedTrace
+import scipy.sparse
 from tokenizer import Tokenizer
 
 
@@ -15,11 +15,21 @@ class Summarizer:
     'Size' : the size of the cluster group / error code group
     'ClassLines' : a filtered list of the class lines in this exception group
     'Text' : the non-class line information in this exception group
+    'TopTerms', 'TopFrames' : the highest weighted terms and stack frames of the cluster,
+      when the features of the clusterer are given
+    When the features of the clusterer are given, 'Text' and 'ClassLines' describe the
+    exemplar of every cluster, the document nearest to its centroid.
+    'ChosenK', 'KEvaluated', 'SweepStopReason' : how the clusterer sweep over k ended,
+      the same on every row, when the clusterer recorded it
     etc... : other input dataframe columns in list format denoting one error per item.
   """
   INTERNAL_COLUMN_NAME = '_internal_preprocessor_output_col_'
+  INTERNAL_PARSED_COLUMN_NAME = '_internal_parsed_trace_col_'
+  SWEEP_SUMMARY_ATTR = 'k_sweep_summary'
+  # summary attrs key of the columns holding lists of the first n messages
+  LIST_COLUMNS_ATTR = 'list_columns'
 
-  def __init__(self, df, config):
+  def __init__(self, df, config, cluster_features=None):
     """Initializes the needed data for summarizer.
 
       Preconditions:
@@ -28,8 +38,13 @@ class Summarizer:
       Args:
         df: pandas dataframe that has finished running the various classification algorithms
 
-        config: config_pb2 proto specified by the configuration file
+        config: config_pb2 proto specified by the configuration file or its CompiledConfig
+
+        cluster_features: optional ClusterFeatures of the KMeansClusterer that labelled df,
+          its exemplars represent the clusters and its term weights are reported
     """
+    compiled_config = CompiledConfig.of(config)
+    config = compiled_config.config
     self.df = df
     self.error_code_matcher_has_run = config.HasField('error_code_matcher')
     if self.error_code_matcher_has_run:
@@ -39,10 +54,13 @@ class Summarizer:
       self.clusterer_col = config.clusterer.output_column_name
     self.n_messages = config.summarizer.n_messages
     self.n_class_lines_to_show = config.summarizer.n_class_lines_to_show
-    self.tokenizer = Tokenizer(config)
+    self.n_top_terms = (config.summarizer.n_top_terms or
+                        self.n_class_lines_to_show)
+    self.tokenizer = Tokenizer(compiled_config)
+    self.cluster_features = cluster_features
 
-  def summarize_exception(self, exception_message_column):
-    """Extracts the useful information from the exception column.
+  def summarize_exception(self, representative_traces):
+    """Extracts the useful information from the representative trace of each group.
 
     Method that attempts to extract possibly useful information from input stack-trace messages
     All java class lines found in filters are explicitly excluded from the message.
@@ -50,8 +68,8 @@ class Summarizer:
     Whereas all non-java (presumably text information) is included in other_text_lines_col
 
     Args:
-      exception_message_column: pd series grouped column of exception information we are attempting
-      to extract a summary from
+      representative_traces: iterable of the ParsedTrace representing each group we are
+      attempting to extract a summary from
 
     Returns:
       tuple of (stack_lines_col, other_text_lines_col) :
@@ -62,23 +80,148 @@ class Summarizer:
     """
     stack_lines_col = []
     other_text_lines_col = []
-    for message_json in exception_message_column:
-      message_list = pd.read_json(message_json).values
-      # we arbitrarily choose the first message as the representative
-      exception_message = message_list[0][0]
+    for parsed_trace in representative_traces:
       stack_lines = self.tokenizer.stack_trace_line_tokenizer(
-          exception_message)[:self.n_class_lines_to_show]
-      other_text_lines = self.tokenizer.human_readable_tokenizer(
-          exception_message)
+          parsed_trace)[:self.n_class_lines_to_show]
+      other_text_lines = self.tokenizer.human_readable_tokenizer(parsed_trace)
       stack_lines_col.append('\n'.join(stack_lines))
       other_text_lines_col.append('\n'.join(other_text_lines))
     return stack_lines_col, other_text_lines_col
 
+  def uses_cluster_features(self, column):
+    """Returns whether the groups of column are the clusters of the cluster features."""
+    return (self.cluster_features is not None and self.clusterer_has_run and
+            column == self.clusterer_col)
+
+  def cluster_exemplars(self):
+    """Chooses the document nearest to its centroid in every cluster.
+
+    The distances were computed by the clusterer, so this is a single sort of the documents
+    by cluster and distance.
+
+    Returns:
+      pandas series of the document of the cluster features that is the exemplar of every
+        cluster, indexed by cluster code
+    """
+    features = self.cluster_features
+    order = np.lexsort((features.distances, features.labels))
+    sorted_labels = features.labels[order]
+    # the first document of every cluster in the sorted order is the nearest
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = sorted_labels[1:] != sorted_labels[:-1]
+    return pd.Series(order[is_first],
+                     index=[str(label) for label in sorted_labels[is_first]])
+
+  def frame_features(self):
+    """Returns the boolean mask of the features of the cluster features that are frames.
+
+    Frame-ness is recorded by the clusterer per feature, so a hashed feature named by a
+    colliding term is still a frame if a stack frame was hashed to it.
+    """
+    return self.cluster_features.is_frame
+
+  def ranked_tokens(self, row, is_frame, n_tokens):
+    """Splits the tokens of a row of feature weights into terms and frames by weight.
+
+    Args:
+      row: sparse matrix of shape (1, n_features) of the weight of every feature
+
+      is_frame: boolean numpy array, True for the features that are stack frames
+
+      n_tokens: int maximum number of terms and of frames to return
+
+    Returns:
+      tuple of (terms, frames) List[str] of the highest weighted terms and frames of the row,
+        highest weight first, ties in vocabulary order
+    """
+    vocabulary = self.cluster_features.vocabulary
+    order = np.lexsort((row.indices, -row.data))
+    tokens = row.indices[order]
+    return ([vocabulary[token] for token in tokens[~is_frame[tokens]][:n_tokens]],
+            [vocabulary[token] for token in tokens[is_frame[tokens]][:n_tokens]])
+
+  def top_weighted_tokens(self):
+    """Finds the highest weighted terms and stack frames of every cluster.
+
+    The weight of a token in a cluster is the sum of its normalized term frequency over the
+    rows of the cluster, i.e. the column sums of the feature matrix of the cluster.
+
+    Returns:
+      tuple of (top_terms, top_frames) pandas series of the List[str] of the n_top_terms
+        highest weighted terms and stack frames of every cluster, indexed by cluster code
+    """
+    features = self.cluster_features
+    n_clusters = len(features.centroids)
+    membership = scipy.sparse.csr_matrix(
+        (features.document_weights,
+         (features.labels, np.arange(len(features.labels)))),
+        shape=(n_clusters, len(features.labels)))
+    cluster_weights = (membership @ features.matrix).tocsr()
+    is_frame = self.frame_features()
+    top_terms, top_frames = [], []
+    for cluster in range(n_clusters):
+      terms, frames = self.ranked_tokens(cluster_weights.getrow(cluster),
+                                         is_frame, self.n_top_terms)
+      top_terms.append(terms)
+      top_frames.append(frames)
+    index = [str(cluster) for cluster in range(n_clusters)]
+    return pd.Series(top_terms, index=index), pd.Series(top_frames,
+                                                        index=index)
+
+  def representative_traces(self, column):
+    """Chooses the ParsedTrace representing each group of the classification column.
+
+    The clusters of the cluster features are represented by their exemplar, other groups by
+    their first message. The ParsedTrace built by the Preprocessor is reused when present,
+    otherwise the preprocessed text is parsed.
+
+    Args:
+      column: str the classification algorithm whose groups are represented
+
+    Returns:
+      pandas series of ParsedTrace indexed by group
+    """
+    trace_column = self.INTERNAL_PARSED_COLUMN_NAME
+    if trace_column not in self.df.columns:
+      trace_column = self.INTERNAL_COLUMN_NAME
+    if self.uses_cluster_features(column):
+      exemplars = self.cluster_exemplars()
+      exemplar_rows = self.cluster_features.document_rows[exemplars.values]
+      traces = pd.Series(self.df[trace_column].iloc[exemplar_rows].values,
+                         index=exemplars.index)
+    else:
+      traces = self.df.groupby(column)[trace_column].first()
+    if trace_column == self.INTERNAL_COLUMN_NAME:
+      traces = traces.map(ParsedTrace.from_text)
+    return traces
+
+  def first_messages(self, column, list_column, index):
+    """Lists the first non null values of a column in every group.
+
+    The rows of every group are numbered with cumcount in one vectorized pass, only the
+    lists themselves are built in Python.
+
+    Args:
+      column: str the classification algorithm whose groups are listed
+
+      list_column: str the column whose values are listed
+
+      index: pandas index of every group
+
+    Returns:
+      pandas series of the List of the first n_messages values of every group
+    """
+    values = self.df.loc[self.df[list_column].notna(), [column, list_column]]
+    values = values[values.groupby(column).cumcount() < self.n_messages]
+    lists = values.groupby(column)[list_column].agg(list).reindex(index)
+    # groups holding only nulls
+    return lists.map(lambda value: value if isinstance(value, list) else [])
+
   def summarize_classifier(self, column, cols_to_drop):
     """Summarizes the results from the given classification mode determined by column.
 
     Does not include the information stored in the columns specified in cols_to_drop in output
-    The summary includes the first n errors determined by n_messages (as an array since
+    The summary includes the first n errors determined by n_messages (as a native list since
     pandas does not inherently support repeated fields) as well as the number of errors in the
     cluster / error code group
 
@@ -89,18 +232,34 @@ class Summarizer:
       cols_to_drop: List[str] of columns to drop in the summary dataframe
 
     Returns:
-      pandas dataframe holding the information
+      pandas dataframe holding the information, the list columns are named in its attrs
+        under LIST_COLUMNS_ATTR
     """
-    error_counts = self.df[column].value_counts()
-    groups = self.df.groupby(column).agg(
-        lambda x: x[x.notna()].head(self.n_messages).to_json(orient='values'))
+    error_counts = self.df.groupby(column).size()
+    # parsed traces are only used for the representatives, never listed
+    list_columns = [
+        list_column for list_column in self.df.columns
+        if list_column not in cols_to_drop and list_column not in
+        (column, self.INTERNAL_PARSED_COLUMN_NAME)
+    ]
+    groups = pd.DataFrame({
+        list_column: self.first_messages(column, list_column,
+                                         error_counts.index)
+        for list_column in list_columns
+    }, index=error_counts.index)
     groups['Size'] = error_counts
     stack_lines_col, text_lines_col = self.summarize_exception(
-        groups[self.INTERNAL_COLUMN_NAME])
+        self.representative_traces(column).reindex(groups.index))
     groups['Text'] = text_lines_col
     groups['ClassLines'] = stack_lines_col
-    groups.drop(columns=cols_to_drop, inplace=True)
-    return groups.reset_index()
+    if self.uses_cluster_features(column):
+      top_terms, top_frames = self.top_weighted_tokens()
+      groups['TopTerms'] = top_terms.reindex(groups.index)
+      groups['TopFrames'] = top_frames.reindex(groups.index)
+      list_columns += ['TopTerms', 'TopFrames']
+    groups = groups.reset_index()
+    groups.attrs[self.LIST_COLUMNS_ATTR] = list_columns
+    return groups
 
   def reorganize_dataframe(self, dataframe, cols_to_reorganize):
     """Reorganizes the dataframe such that the columns to reorganize appear first.
@@ -139,10 +298,11 @@ class Summarizer:
         'Size' : the size of the cluster group / error code group
         'ClassLines' : a filtered list of the class lines in this exception group
         'Text' : the non-class line information in this exception group
+        'ChosenK', 'KEvaluated', 'SweepStopReason' : how the clusterer sweep over k ended
         etc... : other input dataframe columns in list format denoting one error per item.
 
-    Note: directly using a to_gbq on this dataframe will produce columns consisting of arrays
-    since pandas does not naturally support the repeated fields that GBQ does
+    Note: pandas does not naturally support the repeated fields that GBQ does, the Sinks
+    convert the list columns named in the attrs under LIST_COLUMNS_ATTR into repeated fields
     """
     # need to drop added columns in final summary table
     cols_to_drop = [self.INTERNAL_COLUMN_NAME]
@@ -157,9 +317,15 @@ class Summarizer:
       cluster_code_groups = self.summarize_classifier(self.clusterer_col,
                                                       cols_to_drop)
       cols_to_reorganize.add(self.clusterer_col)
+      # the sweep summary is recorded by the clusterer, runs without it are left as is
+      for name, value in self.df.attrs.get(self.SWEEP_SUMMARY_ATTR, {}).items():
+        cluster_code_groups[name] = value
 
     # need to reorganize the columns
     cols_to_reorganize.add('Size')
     cols_to_reorganize.add('Text')
     cols_to_reorganize.add('ClassLines')
-    return self.reorganize_dataframe(cluster_code_groups, cols_to_reorganize)
+    summary = self.reorganize_dataframe(cluster_code_groups, cols_to_reorganize)
+    summary.attrs[self.LIST_COLUMNS_ATTR] = cluster_code_groups.attrs[
+        self.LIST_COLUMNS_ATTR]
+    return summary
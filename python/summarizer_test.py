@@ -1,8 +1,10 @@
 """Unittest module for Summarizer."""
 import unittest
 
+from k_means_clusterer import KMeansClusterer
 import pandas as pd
 from summarizer import Summarizer
+from tokenizer import Tokenizer
 import proto.config_pb2 as config_pb2
 
 
@@ -54,6 +56,78 @@ class SummarizerTest(unittest.TestCase):
     self.assertEqual(len(output_df_multi_cluster), 2)
     self.assertIn(2, output_df_multi_cluster['Size'].values)
     self.assertIn(1, output_df_multi_cluster['Size'].values)
+    self.assertNotIn('ChosenK', output_df_multi_cluster.columns)
+
+  def test_generate_summary_lists(self):
+    """Tests that the first non null messages of every group are native lists."""
+    self.config.summarizer.n_messages = 1
+    output_df = Summarizer(self.multi_cluster_dataframe,
+                           self.config).generate_summary()
+    self.assertEqual(list(output_df['name']),
+                     [['RPC_ERROR_SERVER_ERROR'],
+                      ['STORAGE_STALE_LOCK_TIMESTAMP']])
+    self.assertEqual(list(output_df['ERROR_CODE']),
+                     [['STORAGE_STALE_LOCK_TIMESTAMP'], []])
+    self.assertEqual(list(output_df['remoteException']), [[[]], [[]]])
+    self.assertEqual(list(output_df['errorMessage']), [[], []])
+    self.assertIn('name', output_df.attrs[Summarizer.LIST_COLUMNS_ATTR])
+    self.assertNotIn(Summarizer.INTERNAL_COLUMN_NAME, output_df.columns)
+
+  def test_generate_summary_cluster_features(self):
+    """Tests the exemplars and top weighted terms of the clusterer features."""
+    # the clustered data holds no error codes
+    self.config.ClearField('error_code_matcher')
+    self.config.informative_column.extend(
+        ["exception", "remoteException", "errorMessage"])
+    self.config.clusterer.tokenizer.token_min_length = 2
+    self.config.clusterer.tokenizer.mode = config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE
+    self.config.clusterer.min_cluster = 2
+    self.config.clusterer.max_cluster = 5
+    self.config.summarizer.n_top_terms = 20
+    dataframe = pd.read_json('testdata/k_means_clusterer/simple_data.json',
+                             orient='columns')
+    clusterer = KMeansClusterer(dataframe, self.config)
+    clusterer.cluster_errors()
+    summarizer = Summarizer(dataframe, self.config, clusterer.features)
+    output_df = summarizer.generate_summary()
+    self.assertEqual(len(output_df), 2)
+    self.assertIn('TopTerms', output_df.attrs[Summarizer.LIST_COLUMNS_ATTR])
+    exemplars = summarizer.cluster_exemplars()
+    tokenizer = Tokenizer(self.config)
+    for _, row in output_df.iterrows():
+      self.assertTrue(row['TopTerms'])
+      self.assertEqual(row['TopFrames'], [])
+      exemplar_row = clusterer.features.document_rows[exemplars[str(
+          row['CLUSTER_CODE'])]]
+      trace = dataframe[Summarizer.INTERNAL_PARSED_COLUMN_NAME].iloc[exemplar_row]
+      # the exemplar keeps its own text, only the top terms are read from the weights
+      self.assertEqual(row['Text'],
+                       '\n'.join(tokenizer.human_readable_tokenizer(trace)))
+    top_terms = [set(terms) for terms in output_df['TopTerms']]
+    # one cluster per kind of error
+    self.assertEqual(sorted('subscription' in terms for terms in top_terms),
+                     [False, True])
+    self.assertEqual(sorted('java' in terms for terms in top_terms),
+                     [False, True])
+
+    self.config.summarizer.n_top_terms = 1
+    output_df = Summarizer(dataframe, self.config,
+                           clusterer.features).generate_summary()
+    self.assertEqual([len(terms) for terms in output_df['TopTerms']], [1, 1])
+
+  def test_generate_summary_sweep(self):
+    """Tests that the sweep summary recorded by the clusterer is reported."""
+    self.multi_cluster_dataframe.attrs[Summarizer.SWEEP_SUMMARY_ATTR] = {
+        'ChosenK': 2,
+        'KEvaluated': 3,
+        'SweepStopReason': 'NO_IMPROVEMENT',
+    }
+    output_df = Summarizer(self.multi_cluster_dataframe,
+                           self.config).generate_summary()
+    self.assertEqual(list(output_df['ChosenK']), [2, 2])
+    self.assertEqual(list(output_df['KEvaluated']), [3, 3])
+    self.assertEqual(list(output_df['SweepStopReason']),
+                     ['NO_IMPROVEMENT', 'NO_IMPROVEMENT'])
 
 
 if __name__ == "__main__":
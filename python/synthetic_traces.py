@@ -0,0 +1,201 @@
+"""Module for generating realistic synthetic Java stack traces from known clusters."""
+import random
+
+import pandas as pd
+
+# building blocks of the generated exceptions, frames and messages
+_EXCEPTION_CLASSES = [
+    'java.lang.IllegalStateException',
+    'java.lang.IllegalArgumentException',
+    'java.lang.NullPointerException',
+    'java.io.IOException',
+    'java.util.concurrent.TimeoutException',
+    'java.util.concurrent.ExecutionException',
+    'com.google.net.rpc3.RpcException',
+    'com.google.storage.StorageException',
+]
+_PACKAGES = [
+    'com.google.payments.billing', 'com.google.payments.subscription',
+    'com.google.moneta.purchaseorder', 'com.google.storage.spanner',
+    'com.google.net.rpc3.client', 'com.google.common.util.concurrent'
+]
+_CLASS_NOUNS = [
+    'Order', 'Subscription', 'Charge', 'Ledger', 'Account', 'Refund', 'Invoice',
+    'Payment', 'Instrument', 'Quota', 'Transaction', 'Session'
+]
+_CLASS_ROLES = [
+    'Handler', 'Action', 'Service', 'Transaction', 'Client', 'Validator',
+    'Processor', 'Resolver'
+]
+_METHODS = [
+    'run', 'handle', 'charge', 'apply', 'validate', 'lookup', 'commit', 'read',
+    'write', 'process', 'resolve', 'call'
+]
+_WORDS = [
+    'failed', 'could', 'not', 'charge', 'order', 'subscription', 'canceled',
+    'state', 'stale', 'lock', 'timestamp', 'deadline', 'exceeded', 'quota',
+    'instrument', 'declined', 'missing', 'ledger', 'entry', 'duplicate',
+    'refund', 'already', 'processed', 'invalid', 'currency', 'merchant',
+    'unavailable', 'backend', 'retry', 'exhausted', 'permission', 'denied',
+    'account', 'suspended', 'invoice', 'overdue', 'session', 'expired',
+    'transaction', 'aborted', 'conflict', 'version', 'mismatch', 'token',
+    'renewal', 'stopped', 'payment', 'pending'
+]
+# generic stack frames shared by every cluster
+_COMMON_FRAMES = [
+    'java.util.Optional.orElseThrow(Optional.java:290)',
+    'java.util.concurrent.FutureTask.run(FutureTask.java:264)',
+    'java.util.concurrent.ThreadPoolExecutor.runWorker(ThreadPoolExecutor.java:1128)',
+    'java.lang.Thread.run(Thread.java:834)',
+]
+# tag added by the logging pipeline, removed by the ignore word regex of the example config
+EYE3_TAG = 'eye3-ignored title'
+# column of the ground truth cluster of the synthetic traces
+TRUE_CLUSTER_COLUMN = 'trueCluster'
+
+
+class _ClusterTemplate:
+  """The shape shared by every trace of one true cluster."""
+
+  def __init__(self, rng, cluster):
+    """Draws the template of a cluster.
+
+    Args:
+      rng: random.Random drawing the template
+
+      cluster: int index of the cluster, part of its class names so clusters differ
+    """
+    self.blocks = []
+    # the top exception then a chain of 0 to 2 causes
+    for _ in range(1 + rng.choice([0, 0, 1, 1, 2])):
+      self.blocks.append(self.draw_block(rng, cluster))
+    self.suppressed = (self.draw_block(rng, cluster)
+                       if rng.random() < 0.3 else None)
+    self.remote = rng.random() < 0.5
+
+  def draw_block(self, rng, cluster):
+    """Draws one exception block.
+
+    Args:
+      rng: random.Random drawing the block
+
+      cluster: int index of the cluster
+
+    Returns:
+      tuple of (str exception class, List[str] message words, List[str] frames)
+    """
+    words = rng.sample(_WORDS, rng.randint(4, 8))
+    frames = []
+    for _ in range(rng.randint(3, 12)):
+      class_name = '{}.{}{}{}'.format(rng.choice(_PACKAGES),
+                                      rng.choice(_CLASS_NOUNS),
+                                      rng.choice(_CLASS_ROLES), cluster)
+      simple_name = class_name.rsplit('.', 1)[1]
+      frames.append('{}.{}({}.java:{})'.format(class_name,
+                                               rng.choice(_METHODS),
+                                               simple_name,
+                                               rng.randint(20, 2000)))
+    frames.extend(rng.sample(_COMMON_FRAMES, rng.randint(0, 2)))
+    return rng.choice(_EXCEPTION_CLASSES), words, frames
+
+
+def _render_block(rng, block, header_prefix, indent, tag):
+  """Renders an exception block with fresh variable parts.
+
+  Args:
+    rng: random.Random drawing the variable parts
+
+    block: tuple of the exception class, message words and frames of a _ClusterTemplate
+
+    header_prefix: str put before the exception class, i.e. 'Caused by: '
+
+    indent: str put before every line of the block
+
+    tag: bool whether the message carries the eye3 tag
+
+  Returns:
+    List[str] lines of the block
+  """
+  exception_class, words, frames = block
+  message = ' '.join(words)
+  if tag:
+    message = '{} {}'.format(EYE3_TAG, message)
+  # ids differ between occurrences of the same failure
+  message = '{} id={}'.format(message, rng.randrange(10**9))
+  lines = ['{}{}{}: {}'.format(indent, header_prefix, exception_class, message)]
+  lines.extend('{}\tat {}'.format(indent, frame) for frame in frames)
+  if header_prefix:
+    lines.append('{}\t... {} more'.format(indent, rng.randint(1, 40)))
+  return lines
+
+
+def generate_traces(num_rows,
+                    true_clusters=8,
+                    duplicate_ratio=0.5,
+                    error_names=(),
+                    seed=0):
+  """Generates a deterministic dataframe of Java stack traces from known clusters.
+
+  Every true cluster has a template of an exception with a cause chain, sometimes a
+  Suppressed block and remote exceptions. Every row renders the template of its cluster
+  with fresh ids, line counts and eye3 tags, or with probability duplicate_ratio repeats a
+  previous row of its cluster exactly.
+
+  Args:
+    num_rows: int number of rows
+
+    true_clusters: int number of clusters the rows are drawn from
+
+    duplicate_ratio: float probability of a row being an exact copy of a previous row of
+      its cluster
+
+    error_names: sequence of str error names embedded in some remote exceptions, i.e. the
+      informative errors of the ErrorCodeMatcher
+
+    seed: int seed, the same arguments always generate the same rows
+
+  Returns:
+    pandas dataframe of the exception, remoteException, errorMessage and name columns
+      and the 'trueCluster' index of every row
+  """
+  rng = random.Random(seed)
+  templates = [_ClusterTemplate(rng, cluster) for cluster in range(true_clusters)]
+  # last rendered row of every cluster, the source of its duplicates
+  last_rows = [None] * true_clusters
+  exceptions, remote_exceptions, error_messages, names, clusters = ([], [], [],
+                                                                   [], [])
+  for _ in range(num_rows):
+    cluster = rng.randrange(true_clusters)
+    if last_rows[cluster] is None or rng.random() >= duplicate_ratio:
+      template = templates[cluster]
+      tag = rng.random() < 0.2
+      lines = _render_block(rng, template.blocks[0], '', '', tag)
+      if template.suppressed is not None:
+        lines.extend(_render_block(rng, template.suppressed, 'Suppressed: ',
+                                   '\t', False))
+      for block in template.blocks[1:]:
+        lines.extend(_render_block(rng, block, 'Caused by: ', '', False))
+      remote = []
+      if template.remote:
+        remote.append('remote call failed: {}'.format(' '.join(
+            template.blocks[-1][1])))
+        if error_names and rng.random() < 0.3:
+          remote.append('remote failure code {}'.format(
+              rng.choice(error_names)))
+      error_message = (' '.join(template.blocks[0][1][:3])
+                       if rng.random() < 0.5 else None)
+      last_rows[cluster] = ('\n'.join(lines), remote, error_message,
+                            'SYNTHETIC_CLUSTER_{}'.format(cluster))
+    exception, remote, error_message, name = last_rows[cluster]
+    exceptions.append(exception)
+    remote_exceptions.append(list(remote))
+    error_messages.append(error_message)
+    names.append(name)
+    clusters.append(cluster)
+  return pd.DataFrame({
+      'exception': exceptions,
+      'remoteException': remote_exceptions,
+      'errorMessage': error_messages,
+      'name': names,
+      TRUE_CLUSTER_COLUMN: clusters,
+  })
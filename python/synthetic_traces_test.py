@@ -0,0 +1,48 @@
+"""Unittest module for the synthetic stack trace generator."""
+import unittest
+
+from parsed_trace import ParsedTrace
+from synthetic_traces import EYE3_TAG
+from synthetic_traces import generate_traces
+
+
+class SyntheticTracesTest(unittest.TestCase):
+  """Unittest class for generate_traces."""
+
+  def test_deterministic(self):
+    """Tests that the same seed generates the same rows."""
+    first = generate_traces(200, true_clusters=4, seed=3)
+    self.assertTrue(first.equals(generate_traces(200, true_clusters=4, seed=3)))
+    self.assertFalse(first.equals(generate_traces(200, true_clusters=4,
+                                                  seed=4)))
+
+  def test_shape(self):
+    """Tests the columns, clusters and trace structure of the rows."""
+    df = generate_traces(2000,
+                         true_clusters=5,
+                         duplicate_ratio=0.5,
+                         error_names=['SERVER_ERROR'],
+                         seed=0)
+    self.assertEqual(list(df.columns), [
+        'exception', 'remoteException', 'errorMessage', 'name', 'trueCluster'
+    ])
+    self.assertEqual(sorted(df['trueCluster'].unique()), list(range(5)))
+    exceptions = '\n'.join(df['exception'])
+    self.assertIn('Caused by: ', exceptions)
+    self.assertIn('\tSuppressed: ', exceptions)
+    self.assertIn(EYE3_TAG, exceptions)
+    self.assertTrue(ParsedTrace.from_text(df['exception'][0]).stack_frames)
+    self.assertTrue(
+        any('SERVER_ERROR' in message for messages in df['remoteException']
+            for message in messages))
+
+  def test_duplicate_ratio(self):
+    """Tests that the duplicate ratio controls the number of distinct traces."""
+    no_duplicates = generate_traces(1000, duplicate_ratio=0.0)
+    self.assertEqual(no_duplicates['exception'].nunique(), 1000)
+    duplicates = generate_traces(1000, duplicate_ratio=0.9)
+    self.assertLess(duplicates['exception'].nunique(), 300)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,182 @@
+"""Module for vectorizing tokens into a fixed number of hashed features."""
+import numpy as np
+import proto.config_pb2 as config_pb2
+import scipy.sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from tokenizer import is_stack_frame
+
+# number of features of the HASHING vectorizer if the config leaves it unset
+DEFAULT_N_HASHED_FEATURES = 1 << 18
+
+
+def token_hasher_of(config):
+  """Builds the TokenHasher of the configured vectorizer.
+
+  Args:
+    config: config_pb2 proto specified by the configuration file
+
+  Returns:
+    TokenHasher of n_hashed_features features, None if the vectorizer is not HASHING
+  """
+  if config.clusterer.vectorizer != config_pb2.Clusterer.VectorizerMode.HASHING:
+    return None
+  return TokenHasher(config.clusterer.n_hashed_features or
+                     DEFAULT_N_HASHED_FEATURES)
+
+
+class TokenHasher:
+  """Class mapping tokens to a fixed number of features by hashing them.
+
+  Unlike a vocabulary, the features of a token only depend on the token, so memory stays
+  fixed whatever the number of distinct tokens and chunks of documents can be hashed
+  independently then merged. The tokens are hashed by a sklearn HashingVectorizer. The
+  smallest token hashed to every feature, stack frames first, names the feature, features
+  that stack frames were hashed to are recorded as frames and features that distinct tokens
+  were hashed to are counted as collisions, all kept in memory bounded by n_features
+  whatever the order the documents or chunks are hashed in.
+  """
+
+  def __init__(self, n_features):
+    """Initializes a hasher that has not seen any token.
+
+    Args:
+      n_features: int number of features tokens are hashed to
+    """
+    self.n_features = n_features
+    # smallest token hashed to every used feature, stack frames first
+    self.representatives = {}
+    # features distinct tokens were hashed to
+    self.collided_features = set()
+    # features stack frames were hashed to
+    self.frame_features = set()
+    # documents vectorized at once, bounding the distinct tokens held until they are named
+    self.batch_size = 10000
+
+  def vectorizer(self, analyzer):
+    """Builds the HashingVectorizer of the features of this hasher.
+
+    Args:
+      analyzer: function mapping a document to its List[str] tokens
+
+    Returns:
+      HashingVectorizer counting the tokens of every document in their hashed feature
+    """
+    return HashingVectorizer(analyzer=analyzer,
+                             n_features=self.n_features,
+                             alternate_sign=False,
+                             norm=None,
+                             dtype=np.int64)
+
+  def features_of(self, tokens):
+    """Returns the features tokens are hashed to.
+
+    Args:
+      tokens: List[str] tokens
+
+    Returns:
+      array of the int feature in [0, n_features) of every token
+    """
+    if not tokens:
+      return np.array([], dtype=np.int64)
+    # every single token document has exactly one feature, in document order
+    return self.vectorizer(list).transform([token] for token in tokens).indices
+
+  def transform(self, documents, analyzer=list):
+    """Builds the term frequency matrix of documents over the hashed features.
+
+    Args:
+      documents: iterable of the documents
+
+      analyzer: function mapping a document to its List[str] tokens, documents are token
+        lists if not given
+
+    Returns:
+      sparse matrix of shape (n_documents, n_features) of the token counts of every feature
+    """
+    documents = list(documents)
+    # the hasher of sklearn refuses to vectorize no document
+    if not documents:
+      return scipy.sparse.csr_matrix((0, self.n_features), dtype=np.int64)
+    batch_tokens = set()
+
+    def analyze(document):
+      tokens = analyzer(document)
+      batch_tokens.update(tokens)
+      return tokens
+
+    vectorizer = self.vectorizer(analyze)
+    matrices = []
+    for start in range(0, len(documents), self.batch_size):
+      matrices.append(
+          vectorizer.transform(documents[start:start + self.batch_size]))
+      # only the distinct tokens of the batch are hashed again to name their features
+      tokens = list(batch_tokens)
+      for feature, token in zip(self.features_of(tokens).tolist(), tokens):
+        self.add(feature, token)
+      batch_tokens.clear()
+    if len(matrices) == 1:
+      return matrices[0]
+    return scipy.sparse.vstack(matrices, format='csr')
+
+  def add(self, feature, token):
+    """Records that a token was hashed to a feature.
+
+    Args:
+      feature: int feature token is hashed to
+
+      token: str token
+    """
+    is_frame = is_stack_frame(token)
+    if is_frame:
+      self.frame_features.add(feature)
+    representative = self.representatives.get(feature)
+    if representative is None:
+      self.representatives[feature] = token
+    elif representative != token:
+      self.collided_features.add(feature)
+      # a feature a stack frame was hashed to is named by a stack frame
+      if (not is_frame, token) < (not is_stack_frame(representative),
+                                  representative):
+        self.representatives[feature] = token
+
+  def merge(self, other):
+    """Merges the features seen by another hasher, i.e. the hasher of another chunk.
+
+    Args:
+      other: TokenHasher of the same n_features
+    """
+    self.collided_features.update(other.collided_features)
+    self.frame_features.update(other.frame_features)
+    for feature, token in other.representatives.items():
+      self.add(feature, token)
+
+  def used_features(self):
+    """Lists the features the tokens seen were hashed to.
+
+    Returns:
+      tuple of (features, vocabulary, is_frame) sorted array of the used features,
+        List[str] token naming every used feature and boolean array, True for the used
+        features that stack frames were hashed to
+    """
+    features = np.array(sorted(self.representatives), dtype=np.int64)
+    return (features,
+            [self.representatives[feature] for feature in features],
+            np.array([feature in self.frame_features for feature in features],
+                     dtype=bool))
+
+  def stats(self):
+    """Returns the number of used and collided features.
+
+    Returns:
+      dict of n_features, used_features, collided_features and collision_rate, the
+        fraction of the used features that distinct tokens were hashed to
+    """
+    used_features = len(self.representatives)
+    return {
+        'n_features': self.n_features,
+        'used_features': used_features,
+        'collided_features': len(self.collided_features),
+        'collision_rate':
+            len(self.collided_features) /
+            used_features if used_features else 0.0,
+    }
@@ -0,0 +1,109 @@
+"""Unittest module for the TokenHasher."""
+import unittest
+
+import proto.config_pb2 as config_pb2
+from token_hasher import DEFAULT_N_HASHED_FEATURES
+from token_hasher import token_hasher_of
+from token_hasher import TokenHasher
+
+
+class TokenHasherTest(unittest.TestCase):
+  """Unittest class for TokenHasher."""
+
+  def test_token_hasher_of(self):
+    """Tests that only the HASHING vectorizer builds a hasher."""
+    config = config_pb2.Config()
+    self.assertIsNone(token_hasher_of(config))
+    config.clusterer.vectorizer = config_pb2.Clusterer.VectorizerMode.HASHING
+    self.assertEqual(token_hasher_of(config).n_features,
+                     DEFAULT_N_HASHED_FEATURES)
+    config.clusterer.n_hashed_features = 64
+    self.assertEqual(token_hasher_of(config).n_features, 64)
+
+  def test_transform(self):
+    """Tests the counts of every document over the hashed features."""
+    token_hasher = TokenHasher(1 << 12)
+    matrix = token_hasher.transform([['error', 'state', 'error'], [],
+                                     ['state']])
+    error_feature, state_feature = token_hasher.features_of(['error', 'state'])
+    self.assertEqual(matrix.shape, (3, 1 << 12))
+    self.assertEqual(matrix[0, error_feature], 2)
+    self.assertEqual(matrix[0, state_feature], 1)
+    self.assertEqual(matrix.getrow(1).nnz, 0)
+    self.assertEqual(matrix[2, state_feature], 1)
+    # the features of a token never depend on the other tokens
+    self.assertEqual(
+        TokenHasher(1 << 12).features_of(['state'])[0], state_feature)
+    features, vocabulary, is_frame = token_hasher.used_features()
+    self.assertEqual(list(features), sorted([error_feature, state_feature]))
+    self.assertEqual(vocabulary[list(features).index(error_feature)], 'error')
+    self.assertFalse(is_frame.any())
+    self.assertEqual(token_hasher.stats()['collided_features'], 0)
+
+    # documents are tokenized by the analyzer
+    self.assertEqual(
+        (token_hasher.transform(['error state error', '', 'state'],
+                                str.split) != matrix).nnz, 0)
+    self.assertEqual(token_hasher.transform([]).shape, (0, 1 << 12))
+
+  def test_collisions(self):
+    """Tests that distinct tokens hashed to the same feature are reported."""
+    token_hasher = TokenHasher(1)
+    token_hasher.transform([['state', 'state'], ['error']])
+    features, vocabulary, _ = token_hasher.used_features()
+    self.assertEqual(list(features), [0])
+    # a feature is named by its smallest token
+    self.assertEqual(vocabulary, ['error'])
+    self.assertEqual(
+        token_hasher.stats(), {
+            'n_features': 1,
+            'used_features': 1,
+            'collided_features': 1,
+            'collision_rate': 1.0,
+        })
+    self.assertEqual(TokenHasher(8).stats()['collision_rate'], 0.0)
+
+  def test_frame_features(self):
+    """Tests that a feature a stack frame was hashed to stays a frame after collisions."""
+    token_hasher = TokenHasher(1)
+    token_hasher.transform([['zeta.Foo.bar'], ['alpha']])
+    _, vocabulary, is_frame = token_hasher.used_features()
+    # the feature is named by the frame although the term is smaller
+    self.assertEqual(vocabulary, ['zeta.Foo.bar'])
+    self.assertEqual(list(is_frame), [True])
+    chunk_hasher = TokenHasher(1)
+    chunk_hasher.transform([['alpha']])
+    chunk_hasher.merge(token_hasher)
+    self.assertEqual(chunk_hasher.used_features()[1], ['zeta.Foo.bar'])
+    self.assertEqual(list(chunk_hasher.used_features()[2]), [True])
+
+  def test_merge(self):
+    """Tests that hashing chunks on their own then merging equals hashing at once."""
+    token_lists = [['error', 'state'], ['quota', 'error'], ['lock', 'stale']]
+    whole_hasher = TokenHasher(4)
+    whole_matrix = whole_hasher.transform(token_lists)
+    merged_hasher = TokenHasher(4)
+    for start in range(len(token_lists)):
+      chunk_hasher = TokenHasher(4)
+      chunk_matrix = chunk_hasher.transform(token_lists[start:start + 1])
+      self.assertEqual((chunk_matrix != whole_matrix[start]).nnz, 0)
+      merged_hasher.merge(chunk_hasher)
+    features, vocabulary, _ = merged_hasher.used_features()
+    whole_features, whole_vocabulary, _ = whole_hasher.used_features()
+    self.assertEqual(list(features), list(whole_features))
+    self.assertEqual(vocabulary, whole_vocabulary)
+    self.assertEqual(merged_hasher.stats(), whole_hasher.stats())
+    self.assertLessEqual(len(merged_hasher.representatives), 4)
+
+    # documents vectorized in batches give the same matrix and features
+    batched_hasher = TokenHasher(4)
+    batched_hasher.batch_size = 2
+    self.assertEqual(
+        (batched_hasher.transform(token_lists) != whole_matrix).nnz, 0)
+    self.assertEqual(batched_hasher.representatives,
+                     whole_hasher.representatives)
+    self.assertEqual(batched_hasher.stats(), whole_hasher.stats())
+
+
+if __name__ == "__main__":
+  unittest.main()
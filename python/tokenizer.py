@@ -1,126 +1,355 @@
 """Module for the various Tokenizers usuable by Clusterer."""
+import collections
+import functools
 import re
-import string
+import sys
+
+from compiled_config import CompiledConfig
+from compiled_config import TOKENIZATION_METHOD_NAMES
+from parsed_trace import ParsedTrace
+
+
+def is_stack_frame(token):
+  """Returns whether a token is a stack frame rather than a human readable term.
+
+  Stack frames always hold a '.', i.e. 'com.google.Foo.bar', while the human readable
+  tokenizer drops every token holding one.
+  """
+  return '.' in token
+
+
+class TokenCache:
+  """Bounded least recently used cache of token lists keyed by the raw text.
+
+  Production failures are very repetitive, so the same preprocessed trace is often
+  tokenized thousands of times. Every Tokenizer owns its cache, so entries are keyed by
+  the tokenization mode and the text as given, a hit costing a single dictionary lookup
+  since strings cache their hash. Entries are evicted in least recently used order once
+  their estimated size, the text included, exceeds max_bytes.
+  """
+  # rough per entry overhead of the ordered dict bookkeeping
+  _ENTRY_OVERHEAD_BYTES = 100
+
+  def __init__(self, max_bytes):
+    """Initializes an empty cache.
+
+    Args:
+      max_bytes: int estimated memory cap of the cached tokens
+    """
+    self.max_bytes = max_bytes
+    self.entries = collections.OrderedDict()
+    self.current_bytes = 0
+    self.hits = 0
+    self.misses = 0
+
+  def key(self, mode, lowercase, text):
+    """Returns the cache key of a text tokenized in the given mode.
+
+    Args:
+      mode: str name of the tokenization mode
+
+      lowercase: bool whether the text is lowercased before being tokenized
+
+      text: str preprocessed text being tokenized, not lowercased nor parsed
+
+    Returns:
+      tuple of (mode, lowercase, text) identifying the tokens
+    """
+    return mode, lowercase, text
+
+  def get(self, key):
+    """Looks up the tokens stored under key, counting the hit or miss.
+
+    Args:
+      key: tuple returned by TokenCache.key
+
+    Returns:
+      Tuple[str] of cached tokens, None if key is not cached
+    """
+    tokens = self.entries.get(key)
+    if tokens is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self.entries.move_to_end(key)
+    return tokens
+
+  def put(self, key, tokens):
+    """Stores tokens under key, evicting the least recently used entries if needed.
+
+    Args:
+      key: tuple returned by TokenCache.key
+
+      tokens: Tuple[str] tokens to cache
+    """
+    size = self.entry_size(key, tokens)
+    # a single entry larger than the whole cache is never stored
+    if size > self.max_bytes or key in self.entries:
+      return
+    self.entries[key] = tokens
+    self.current_bytes += size
+    while self.current_bytes > self.max_bytes:
+      evicted_key, evicted_tokens = self.entries.popitem(last=False)
+      self.current_bytes -= self.entry_size(evicted_key, evicted_tokens)
+
+  def entry_size(self, key, tokens):
+    """Estimates the memory held by one cache entry.
+
+    Args:
+      key: tuple cache key
+
+      tokens: Tuple[str] cached tokens
+
+    Returns:
+      int estimated size in bytes
+    """
+    # the mode is shared by every entry, the text is held alive by the entry
+    return (self._ENTRY_OVERHEAD_BYTES + sys.getsizeof(key) +
+            sys.getsizeof(key[-1]) + sys.getsizeof(tokens) +
+            sum(sys.getsizeof(token) for token in tokens))
+
+  def stats(self):
+    """Returns the hit and miss counters and the memory use of the cache.
+
+    Returns:
+      dict of hits, misses, hit_rate, entries, bytes and max_bytes
+    """
+    lookups = self.hits + self.misses
+    return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'hit_rate': self.hits / lookups if lookups else 0.0,
+        'entries': len(self.entries),
+        'bytes': self.current_bytes,
+        'max_bytes': self.max_bytes,
+    }
 
 
 class Tokenizer:
-  """Class for our general suite of string tokenizers for our Clusterer."""
-  _JAVA_CLASS_LINE_PREFIX = r'\s+at'
+  """Class for our general suite of string tokenizers for our Clusterer.
+
+  Every tokenizer accepts either a raw string or a ParsedTrace, in which case the
+  already split lines and stack frames are reused instead of parsing the text again.
+  If token_cache_max_bytes is configured, tokens of repeated texts are served from a
+  TokenCache instead of being tokenized again.
+  """
+
+  # Tokens made only of numerical hex values are removed
+  # WARNING this regex actually matches to certain words like 'be' since
+  # 'be' is indeed a hex value
+  _NUMERICS_REGEX = re.compile(r'[0-9a-f|:|\.|\[|\]]+')
 
   def __init__(self, config):
     """Initializes the information needed by Tokenizer.
 
     Args:
-      config: config_pb2 proto specified by the configuration file
+      config: config_pb2 proto specified by the configuration file or its CompiledConfig
     """
+    compiled_config = CompiledConfig.of(config)
+    config = compiled_config.config
     self.min_token_len = config.clusterer.tokenizer.token_min_length
     # Additional splitting only makes sense on human readable mode
     self.split_ons = config.clusterer.tokenizer.split_on
     self.punctuations = config.clusterer.tokenizer.punctuation
-    self.ignore_tokens = [
-        token.lower()
-        for token in config.clusterer.tokenizer.ignore_token_matcher
-    ]
+    self.ignore_tokens = compiled_config.ignore_tokens
+    # compiled once per config for the single pass of human_readable_tokens
+    self.split_regexes = compiled_config.split_regexes
+    self.strip_characters = compiled_config.strip_characters
+    self.ignore_token_set = compiled_config.ignore_token_set
+    self.token_cache = None
+    if config.clusterer.tokenizer.token_cache_max_bytes > 0:
+      self.token_cache = TokenCache(
+          config.clusterer.tokenizer.token_cache_max_bytes)
 
-  def human_readable_tokenizer(self, input_string):
+  def tokenize(self, mode, input_string, tokenization_method, lowercase=False):
+    """Runs tokenization_method on input_string, consulting the token cache if enabled.
+
+    The cache is looked up before input_string is parsed or lowercased.
+
+    Args:
+      mode: str name of the tokenization mode, part of the cache key
+
+      input_string: str or ParsedTrace we are attempting to tokenize
+
+      tokenization_method: function mapping a ParsedTrace to its List[str] tokens
+
+      lowercase: bool whether the trace is lowercased before being tokenized
+
+    Returns:
+      List[str] tokens of input_string
+    """
+    key = None
+    if self.token_cache is not None:
+      if isinstance(input_string, ParsedTrace):
+        text = input_string.text
+      else:
+        # in case input is stored in a different format in dataframe
+        text = str(input_string)
+      key = self.token_cache.key(mode, lowercase, text)
+      tokens = self.token_cache.get(key)
+      if tokens is not None:
+        return list(tokens)
+    parsed_trace = ParsedTrace.of(input_string)
+    if lowercase:
+      parsed_trace = parsed_trace.lowercased()
+    tokens = tokenization_method(parsed_trace)
+    if key is not None:
+      self.token_cache.put(key, tuple(tokens))
+    return tokens
+
+  def tokenization_method(self, mode):
+    """Returns the tokenizer of the given tokenization mode, lowercasing its input first.
+
+    The clusterer vectorizes documents with this tokenizer, so documents are lowercased
+    before being tokenized like the default preprocessing of CountVectorizer did, i.e.
+    uppercase hex values are still numerical and ignored tokens match case insensitively.
+    The lowercase trace is derived from the single parse of the document.
+
+    Args:
+      mode: config_pb2.Tokenizer.TokenizerMode specified by the configuration file
+
+    Returns:
+      function mapping a str or ParsedTrace to its List[str] tokens
+
+    Raises:
+      NotImplementedError: if mode is not a valid tokenization mode
+    """
+    method_name = TOKENIZATION_METHOD_NAMES.get(mode)
+    # if no valid tokenization mode is chosen, error
+    if method_name is None:
+      raise NotImplementedError(
+          'No valid tokenization mode in configuration file')
+    return functools.partial(getattr(self, method_name), lowercase=True)
+
+  def cache_stats(self):
+    """Returns the token cache statistics, None if the cache is disabled."""
+    if self.token_cache is None:
+      return None
+    return self.token_cache.stats()
+
+  def human_readable_tokenizer(self, input_string, lowercase=False):
     """Tokenization method for parsing the input_string into a human readable list of strings.
 
     Args:
-      input_string: str we are attempting to tokenize
+      input_string: str or ParsedTrace we are attempting to tokenize
+
+      lowercase: bool whether input_string is lowercased before being tokenized
 
     Returns:
       List[str], each string representing a human readable token
     """
-    # in case input is stored in a different format in dataframe
-    input_string = str(input_string)
-    # filtering all all java class lines out
-    input_string_lines = input_string.splitlines()
-    input_strings_filtered = [
-        s for s in input_string_lines
-        if not re.search(self._JAVA_CLASS_LINE_PREFIX, s)
-    ]
-    input_string = '\n'.join(input_strings_filtered)
+    return self.tokenize('human_readable', input_string,
+                         self.human_readable_tokens, lowercase)
+
+  def human_readable_tokens(self, parsed_trace):
+    """Uncached implementation of human_readable_tokenizer.
+
+    Args:
+      parsed_trace: ParsedTrace we are attempting to tokenize
+
+    Returns:
+      List[str], each string representing a human readable token
+    """
+    # java class lines are already filtered out by the parse
+    # every word goes through split, filter, strip, lowercase and ignore in one pass
+    split_regexes = self.split_regexes
+    strip_characters = self.strip_characters
+    numerics_fullmatch = self._NUMERICS_REGEX.fullmatch
+    min_token_len = self.min_token_len
+    ignore_token_set = self.ignore_token_set
+    tokens = []
     # Base split on new line and spaces
-    tokens = input_string.split()
-    # Split for every other defined additional splitter
-    for split_on in self.split_ons:
-      # pylint: disable=cell-var-from-loop
-      tokens = sum(map(lambda w: re.split(split_on, w), tokens), [])
-    # Remove all lines that contain '.' (extraneous class info)
-    # Examples include embedded class 'com.google.net.rpc3.RpcException:'
-    tokens = [w for w in tokens if not re.search(r'\.', w)]
-    # Remove all lines that contain ';' (extraneous debug info)
-    # Examples include 9;StartTimeMs which many exceptions have embedded
-    tokens = [w for w in tokens if not re.search(';', w)]
-    # Removing trailing and leading punctuation
-    punctuation = string.punctuation + ''.join(self.punctuations)
-    tokens = list(map(lambda w: w.strip(punctuation), tokens))
-    # Removing all numerical hex values
-    # WARNING this regex actually matches to certain words like 'be' since
-    # 'be' is indeed a hex value
-    numerics_regex = r'[0-9a-f|:|\.|\[|\]]+'
-    # pylint: disable=cell-var-from-loop
-    tokens = [w for w in tokens if not re.fullmatch(numerics_regex, w)]
-    # Remove 1 word characters
-    tokens = [w for w in tokens if len(w) >= self.min_token_len]
-    # Remove empty strings
-    tokens = [w for w in tokens if w]
-    # lowercase all words for consistency
-    tokens = list(map(lambda w: w.lower(), tokens))
-    # filter out undesired tokens
-    filtered_tokens = []
-    for token in tokens:
-      if token not in self.ignore_tokens:
-        filtered_tokens.append(token)
-    return filtered_tokens
+    for line in parsed_trace.human_readable_lines:
+      for word in line.split():
+        pieces = [word]
+        # Split for every other defined additional splitter, in order
+        for split_regex in split_regexes:
+          pieces = [
+              piece for token in pieces for piece in split_regex.split(token)
+          ]
+        for token in pieces:
+          # Remove tokens that contain '.' (extraneous class info) or ';' (extraneous
+          # debug info), i.e. 'com.google.net.rpc3.RpcException:' or '9;StartTimeMs'
+          if '.' in token or ';' in token:
+            continue
+          # Removing trailing and leading punctuation
+          token = token.strip(strip_characters)
+          # Remove empty, too short and numerical tokens
+          if (not token or len(token) < min_token_len or
+              numerics_fullmatch(token)):
+            continue
+          # lowercase all words for consistency, then filter out undesired tokens
+          token = token.lower()
+          if token not in ignore_token_set:
+            tokens.append(token)
+    return tokens
 
-  def stack_trace_line_tokenizer(self, input_string):
+  def stack_trace_line_tokenizer(self, input_string, lowercase=False):
     """Tokenization method for parsing the input_string into a list of stack trace strings.
 
     Note, each token representing a line in the stack trace.
 
     Args:
-      input_string: str we are attempting to tokenize
+      input_string: str or ParsedTrace we are attempting to tokenize
+
+      lowercase: bool whether input_string is lowercased before being tokenized
 
     Returns:
       List[str], each string representing a stack trace class line
     """
-    # in case input is stored in a different format in dataframe
-    input_string = str(input_string)
-    input_string_lines = input_string.splitlines()
-    # search for stack trace lines, i.e those that begin with '\tat'
-    stack_lines = []
-    for line in input_string_lines:
-      prefix_search = re.search(self._JAVA_CLASS_LINE_PREFIX, line)
-      if prefix_search:
-        # we only care about the "class" or anything after the
-        # \tat and before line number
-        stack_lines.append(line[prefix_search.end() + 1:line.index('(')])
+    return self.tokenize('stack_trace_line', input_string,
+                         self.stack_trace_line_tokens, lowercase)
+
+  def stack_trace_line_tokens(self, parsed_trace):
+    """Uncached implementation of stack_trace_line_tokenizer.
+
+    Args:
+      parsed_trace: ParsedTrace we are attempting to tokenize
 
+    Returns:
+      List[str], each string representing a stack trace class line
+    """
+    # stack trace lines, i.e those that begin with '\tat', are found by the parse
     # filter out minimum length tokens
     stack_lines = [
-        line for line in stack_lines if len(line) >= self.min_token_len
+        frame.name
+        for frame in parsed_trace.stack_frames
+        if len(frame.name) >= self.min_token_len
     ]
 
     filtered_lines = []
     # filter out undesired tokens
     for line in stack_lines:
-      if line not in self.ignore_tokens:
+      if line not in self.ignore_token_set:
         filtered_lines.append(line)
 
     return filtered_lines
 
-  def combined_tokenizer(self, input_string):
+  def combined_tokenizer(self, input_string, lowercase=False):
     """Tokenization method for parsing input_string into list of tokens.
 
     Tokens are either human readable strings as generated from human_readable_tokenizer,
     or stack trace lines generated by stack_trace_line_tokenizer.
 
     Args:
-      input_string: str we are attempting to tokenize
+      input_string: str or ParsedTrace we are attempting to tokenize
+
+      lowercase: bool whether input_string is lowercased before being tokenized
+
+    Returns:
+      List[str] tokens, each token representing either a human readable word or a stack line
+    """
+    return self.tokenize('combined', input_string, self.combined_tokens,
+                         lowercase)
+
+  def combined_tokens(self, parsed_trace):
+    """Uncached implementation of combined_tokenizer.
+
+    Args:
+      parsed_trace: ParsedTrace we are attempting to tokenize
 
     Returns:
       List[str] tokens, each token representing either a human readable word or a stack line
     """
-    return self.human_readable_tokenizer(
-        input_string) + self.stack_trace_line_tokenizer(input_string)
+    return self.human_readable_tokens(
+        parsed_trace) + self.stack_trace_line_tokens(parsed_trace)
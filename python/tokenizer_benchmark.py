@@ -0,0 +1,107 @@
+"""Benchmark comparing the single pass human readable tokenizer against the original passes."""
+import re
+import string
+import timeit
+
+from parsed_trace import ParsedTrace
+import proto.config_pb2 as config_pb2
+from synthetic_traces import generate_traces
+from tokenizer import Tokenizer
+
+from absl import app
+from absl import flags
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer('num_traces', 2000, 'number of synthetic traces to tokenize')
+flags.DEFINE_integer('trace_copies', 10,
+                     'number of times every trace is repeated into one long trace')
+flags.DEFINE_integer('repeats', 3, 'number of timed repetitions, the best is reported')
+flags.DEFINE_integer('seed', 0, 'seed of the trace generator')
+
+
+def legacy_human_readable_tokens(tokenizer, parsed_trace):
+  """Reference implementation of the original list-per-step tokenization.
+
+  Args:
+    tokenizer: Tokenizer holding the split_ons, punctuations, min_token_len and
+      ignore_tokens settings
+
+    parsed_trace: ParsedTrace to tokenize
+
+  Returns:
+    List[str] of human readable tokens
+  """
+  tokens = [
+      token for line in parsed_trace.human_readable_lines
+      for token in line.split()
+  ]
+  for split_on in tokenizer.split_ons:
+    # pylint: disable=cell-var-from-loop
+    tokens = sum(map(lambda w: re.split(split_on, w), tokens), [])
+  tokens = [w for w in tokens if not re.search(r'\.', w)]
+  tokens = [w for w in tokens if not re.search(';', w)]
+  punctuation = string.punctuation + ''.join(tokenizer.punctuations)
+  tokens = list(map(lambda w: w.strip(punctuation), tokens))
+  numerics_regex = r'[0-9a-f|:|\.|\[|\]]+'
+  tokens = [w for w in tokens if not re.fullmatch(numerics_regex, w)]
+  tokens = [w for w in tokens if len(w) >= tokenizer.min_token_len]
+  tokens = [w for w in tokens if w]
+  tokens = list(map(lambda w: w.lower(), tokens))
+  return [token for token in tokens if token not in tokenizer.ignore_tokens]
+
+
+def main(argv):
+  del argv  # Unused.
+  config = config_pb2.Config()
+  tokenizer_config = config.clusterer.tokenizer
+  tokenizer_config.mode = config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE
+  tokenizer_config.token_min_length = 1
+  tokenizer_config.split_on.extend(['=', r'\[', r'\]'])
+  tokenizer_config.punctuation.extend([':', '\n', '/', '\t'])
+  tokenizer_config.ignore_token_matcher.extend(['failed', 'id'])
+  tokenizer = Tokenizer(config)
+
+  df = generate_traces(FLAGS.num_traces, duplicate_ratio=0.0, seed=FLAGS.seed)
+  # long traces stress the per-word work rather than the per-trace overhead
+  parsed_traces = [
+      ParsedTrace.from_text('\n'.join([exception] * FLAGS.trace_copies))
+      for exception in df['exception']
+  ]
+
+  legacy_output = [
+      legacy_human_readable_tokens(tokenizer, parsed_trace)
+      for parsed_trace in parsed_traces
+  ]
+  if legacy_output != [
+      tokenizer.human_readable_tokens(parsed_trace)
+      for parsed_trace in parsed_traces
+  ]:
+    raise AssertionError('single pass tokens differ from the legacy passes')
+
+  legacy_time = min(
+      timeit.repeat(lambda: [
+          legacy_human_readable_tokens(tokenizer, parsed_trace)
+          for parsed_trace in parsed_traces
+      ],
+                    number=1,
+                    repeat=FLAGS.repeats))
+  single_pass_time = min(
+      timeit.repeat(lambda: [
+          tokenizer.human_readable_tokens(parsed_trace)
+          for parsed_trace in parsed_traces
+      ],
+                    number=1,
+                    repeat=FLAGS.repeats))
+  num_lines = sum(
+      len(parsed_trace.human_readable_lines) for parsed_trace in parsed_traces)
+  print('traces: {}, human readable lines: {}'.format(len(parsed_traces),
+                                                      num_lines))
+  print('legacy passes: {:.3f}s ({:.0f} lines/s)'.format(
+      legacy_time, num_lines / legacy_time))
+  print('single pass:   {:.3f}s ({:.0f} lines/s)'.format(
+      single_pass_time, num_lines / single_pass_time))
+  print('speedup: {:.1f}x'.format(legacy_time / single_pass_time))
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -30,6 +30,11 @@ class TokenizerTest(unittest.TestCase):
     ignore_test_config.clusterer.tokenizer.ignore_token_matcher.extend(
         ['uselessInfo'])
     self.ignore_test_config = Tokenizer(ignore_test_config)
+
+    # configuration with a token cache
+    self.cache_config = config_pb2.Config()
+    self.cache_config.CopyFrom(human_readable_config)
+    self.cache_config.clusterer.tokenizer.token_cache_max_bytes = 1 << 20
     super(TokenizerTest, self).setUp()
 
   def test_human_readable_tokenizer(self):
@@ -90,6 +95,64 @@ class TokenizerTest(unittest.TestCase):
         self.ignore_test_config.human_readable_tokenizer(sample_string),
         sample_tokens)
 
+  def test_tokenization_method_lowercases(self):
+    """Tests that documents are lowercased before numerical and ignored tokens are removed."""
+    tokenization_method = self.human_readable_tokenizer.tokenization_method(
+        config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE)
+    self.assertEqual(
+        tokenization_method('Failed DEADBEEF deadbeef Bad ABC abc'),
+        ['failed'])
+
+    stack_trace_config = config_pb2.Config()
+    stack_trace_config.clusterer.tokenizer.mode = config_pb2.Tokenizer.TokenizerMode.STACK_TRACE_LINES
+    stack_trace_config.clusterer.tokenizer.ignore_token_matcher.extend(
+        ['com.google.Foo.ignoredFrame'])
+    tokenization_method = Tokenizer(stack_trace_config).tokenization_method(
+        config_pb2.Tokenizer.TokenizerMode.STACK_TRACE_LINES)
+    sample_stack_trace = ('Exception\n'
+                          '\tat com.google.Foo.ignoredFrame(Foo.java:1)\n'
+                          '\tat com.google.Foo.usefulFrame(Foo.java:2)')
+    self.assertEqual(tokenization_method(sample_stack_trace),
+                     ['com.google.foo.usefulframe'])
+
+  def test_token_cache(self):
+    """Test suite for the token cache hit and miss counting and eviction."""
+    cached_tokenizer = Tokenizer(self.cache_config)
+    self.assertIsNone(self.human_readable_tokenizer.cache_stats())
+    simple_string = 'subscription id 11444512 failed because it was cancelled'
+    tokens = self.human_readable_tokenizer.human_readable_tokenizer(
+        simple_string)
+    for _ in range(3):
+      self.assertEqual(cached_tokenizer.human_readable_tokenizer(simple_string),
+                       tokens)
+    # different modes of the same text are cached separately
+    cached_tokenizer.stack_trace_line_tokenizer(simple_string)
+    stats = cached_tokenizer.cache_stats()
+    self.assertEqual(stats['hits'], 2)
+    self.assertEqual(stats['misses'], 2)
+    self.assertEqual(stats['entries'], 2)
+
+    # lowercased texts are cached separately, keyed by the text as given
+    tokenization_method = cached_tokenizer.tokenization_method(
+        config_pb2.Tokenizer.TokenizerMode.HUMAN_READABLE)
+    for _ in range(2):
+      self.assertEqual(tokenization_method('Failed DEADBEEF'), ['failed'])
+    self.assertEqual(
+        cached_tokenizer.human_readable_tokenizer('Failed DEADBEEF'),
+        ['failed', 'deadbeef'])
+    stats = cached_tokenizer.cache_stats()
+    self.assertEqual(stats['hits'], 3)
+    self.assertEqual(stats['entries'], 4)
+
+    # a tiny cache only holds the most recent entry
+    self.cache_config.clusterer.tokenizer.token_cache_max_bytes = 600
+    small_tokenizer = Tokenizer(self.cache_config)
+    small_tokenizer.human_readable_tokenizer('first failure message')
+    small_tokenizer.human_readable_tokenizer('second failure message')
+    stats = small_tokenizer.cache_stats()
+    self.assertEqual(stats['entries'], 1)
+    self.assertLessEqual(stats['bytes'], 600)
+
 
 if __name__ == "__main__":
   unittest.main()